@@ -7,17 +7,41 @@ from braket.task_result import (
     TaskMetadata,
 )
 from collections import Counter
-import requests
+from AutomatskiKomencoClient import AutomatskiKomencoClient
 import numpy as np
 import uuid
-import datetime
 
+
+class AutomatskiKomencoBraketResult(GateModelQuantumTaskResult):
+    """
+    A GateModelQuantumTaskResult built from the server's counts.
+
+    measurement_counts and measurement_probabilities are filled in straight away. The per-shot
+    measurements array (shots x measured qubits) is only built, with np.repeat over the
+    distinct rows, the first time it is read, so deserializing does not depend on the number
+    of shots.
+    """
+
+    def __init__(self, rows, shots, **kwargs):
+        self.rows = rows
+        self.shots = shots
+        super().__init__(measurements=None, **kwargs)
+
+    @property
+    def measurements(self):
+        if self._measurements is None and self.rows is not None:
+            self._measurements = np.repeat(self.rows, self.shots, axis=0)
+        return self._measurements
+
+    @measurements.setter
+    def measurements(self, measurements):
+        self._measurements = measurements
+
+
+class AutomatskiKomencoBraket(AutomatskiKomencoClient):
     
-class AutomatskiKomencoBraket:
-    
-    def __init__(self, host, port):
-        self.host = host
-        self.port = port
+    def __init__(self, host, port, **kwargs):
+        super().__init__(host, port, **kwargs)
         self.gateMap = {}
         
         self.gateMap["cu1"]="cp"
@@ -36,32 +60,8 @@ class AutomatskiKomencoBraket:
         self.indexToQubits = {}
         self.count = 0
         
-    def run(self, circuit, repetitions=1000, topK=20):
-        tstart = datetime.datetime.now()
-        
-        body = self.serialize_circuit(circuit, topK)
+    def build_result(self, body, struct, repetitions, execution_time):
         measured_qubits = body['measurements']
-        response = requests.post(f'http://{self.host}:{self.port}/api/komenco', json=body)
-        response.close() #bug fix - too many connections open
-        struct = response.json()
-        
-        tend = datetime.datetime.now()
-        execution_time = (tend - tstart).microseconds
-        print(f"Time Taken {(tend - tstart)}")
-        
-        cannotProceed = None
-        try:
-            if struct["error"] :
-                print(struct["error"])
-                cannotProceed = True
-                raise Exception(struct["error"])
-        except Exception as e:
-            if cannotProceed:
-                raise e            
-            pass 
-        
-        
-        
         return self.deserialize_result(struct, measured_qubits, repetitions, execution_time)
 
     def serialize_circuit(self, circuit, topK):
@@ -74,7 +74,6 @@ class AutomatskiKomencoBraket:
         for instruction in circuit.instructions:
             gate = instruction.operator.name.lower() #the server uses lowercase gate names 
 
-            print(gate) 
             #we need to map some gate naming conventions to make sure there are no errors
             if gate in self.gateMap:
                 gate = self.gateMap[gate]
@@ -95,13 +94,6 @@ class AutomatskiKomencoBraket:
             else:
                 operations.append({"gate": gate, "params": params, "qubits": qubits})
         
-        print("Executing Quantum Circuit With...")
-        print(f"{num_qubits} Qubits And ...")
-        print(f"{len(operations)} Gates")
-        
-        if len(measurements) == 0:
-            raise(Exception("There are no measurements done at the end of the circuit."))        
-                
         return { "num_qubits": num_qubits, "operations": operations, "measurements": measurements, "topK": topK}    
 
     @staticmethod
@@ -111,19 +103,15 @@ class AutomatskiKomencoBraket:
         # Build counts and probabilities
         counts = Counter()
         probabilities = {}
-        measurements = []
 
         for key_original, value in measurements_strings.items():
             count = round(value * repetitions)
             counts[key_original] = count
             probabilities[key_original] = value
 
-        # Convert measurements to numpy array
-        for key, count in counts.items():
-            bitstring = [int(bit) for bit in key]
-            measurements.extend([bitstring] * count)
-        
-        measurements_array = np.array(measurements)
+        # One row per distinct bitstring, expanded to one per shot only when measurements is read
+        rows = np.array([[int(bit) for bit in key] for key in counts])
+        shots = np.array(list(counts.values()), dtype=np.int64)
 
         # Create TaskMetadata
         task_metadata = TaskMetadata(
@@ -138,12 +126,13 @@ class AutomatskiKomencoBraket:
         )
 
         # Create GateModelQuantumTaskResult
-        result = GateModelQuantumTaskResult(
+        result = AutomatskiKomencoBraketResult(
+            rows,
+            shots,
             task_metadata=task_metadata,
             additional_metadata=None,
             result_types=[],
             values=[],
-            measurements=measurements_array,
             measured_qubits=measured_qubits,
             measurement_counts=counts,
             measurement_probabilities=probabilities,
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# defaults for the in-memory tier
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = None
+
+
+class AutomatskiKomencoCache:
+    """
+    An opt-in result cache for the Komenco clients.
+
+    Server responses are keyed by a canonical hash of the serialized circuit (which carries
+    topK) and the backend url, so byte-identical submissions to the same backend skip the
+    round trip. The in-memory tier is an LRU bounded by maxsize, entries expire after ttl
+    seconds (None keeps them until evicted). With a path the responses are also kept in a
+    sqlite file that outlives the process, e.g. across notebook re-runs.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.diskHits = 0
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires REAL, struct TEXT)")
+            self.db.commit()
+
+    @staticmethod
+    def key(body, backend):
+        canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(f"{backend}\n{canonical}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, struct = entry
+                if expires is None or expires > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return struct
+                del self.entries[key]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT expires, struct FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    expires, data = row
+                    if expires is None or expires > now:
+                        struct = json.loads(data)
+                        self.remember(key, expires, struct)
+                        self.hits += 1
+                        self.diskHits += 1
+                        return struct
+                    self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self.db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key, struct):
+        expires = None if self.ttl is None else time.time() + self.ttl
+        with self.lock:
+            self.remember(key, expires, struct)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, expires, json.dumps(struct)))
+                self.db.commit()
+
+    def remember(self, key, expires, struct):
+        self.entries[key] = (expires, struct)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.diskHits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries),
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.diskHits = 0
+            if self.db is not None:
+                self.db.execute("DELETE FROM results")
+                self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
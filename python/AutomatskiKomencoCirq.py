@@ -1,15 +1,99 @@
-import requests
+from AutomatskiKomencoClient import AutomatskiKomencoClient
 import cirq
 import numpy as np
-import uuid
-import datetime
+import pandas as pd
+import collections
 
+
+class AutomatskiKomencoCirqResult(cirq.Result):
+    """
+    A cirq.Result backed by the histogram the server returns.
+
+    Only the distinct measured rows and how often each occurred are kept, i.e. at most topK
+    rows however many repetitions were asked for. histogram(), repetitions and counts() are
+    answered from them directly; the per-shot arrays behind measurements, records and data
+    are only built (once) when one of them is first used. With shuffle the shots come out in
+    a random order instead of grouped by outcome.
+    """
+
+    def __init__(self, rows, counts, key="result", params=None, shuffle=False, seed=None):
+        keep = counts > 0
+        self.rows = rows[keep]
+        self.shots = counts[keep]
+        self.key = key
+        self.shuffle = shuffle
+        self.seed = seed
+        self._params = params if params is not None else cirq.ParamResolver({})
+        self._order = None
+        self._measurements = None
+        self._data = None
+
+    @property
+    def params(self):
+        return self._params
+
+    @property
+    def repetitions(self):
+        return int(self.shots.sum())
+
+    def order(self):
+        # the row of every shot, shuffled once if asked for so that measurements and data agree
+        if self._order is None:
+            self._order = np.repeat(np.arange(len(self.rows)), self.shots)
+            if self.shuffle:
+                np.random.default_rng(self.seed).shuffle(self._order)
+        return self._order
+
+    @property
+    def measurements(self):
+        if self._measurements is None:
+            self._measurements = {self.key: self.rows[self.order()]}
+        return self._measurements
+
+    @property
+    def records(self):
+        return {key: data[:, np.newaxis, :] for key, data in self.measurements.items()}
+
+    @property
+    def data(self):
+        if self._data is None:
+            # one integer per distinct row, then one per shot, without the per-shot bit arrays
+            values = self.dataframe_from_measurements({self.key: self.rows})[self.key].to_numpy()
+            self._data = pd.DataFrame({self.key: values[self.order()]}, dtype=values.dtype)
+        return self._data
+
+    def counts(self):
+        """
+        Returns:
+            {bitstring: count} in the order of the server's bitstrings (last measured qubit first).
+        """
+        return {"".join(str(bit) for bit in row[::-1]): int(count) for row, count in zip(self.rows, self.shots)}
+
+    def multi_measurement_histogram(self, *, keys, fold_func=None):
+        keys = [str(key) for key in keys]
+        if keys != [self.key]:
+            if fold_func is None:
+                return super().multi_measurement_histogram(keys=keys)
+            return super().multi_measurement_histogram(keys=keys, fold_func=fold_func)
+        if fold_func is None:
+            fold_func = lambda sample: tuple(cirq.big_endian_bits_to_int(bits) for bits in sample)
+        histogram = collections.Counter()
+        for row, count in zip(self.rows, self.shots):
+            histogram[fold_func((row,))] += int(count)
+        return histogram
+
+    def __repr__(self):
+        return f"AutomatskiKomencoCirqResult(key={self.key!r}, counts={self.counts()!r})"
+
+    def __str__(self):
+        return str(cirq.ResultDict(params=self.params, measurements=self.measurements))
+
+
+class AutomatskiKomencoCirq(AutomatskiKomencoClient):
     
-class AutomatskiKomencoCirq:
-    
-    def __init__(self, host, port):
-        self.host = host
-        self.port = port
+    def __init__(self, host, port, shuffle=False, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self.shuffle = shuffle
         self.gateMap = {}
         
         self.gateMap["cu1"]="cp"
@@ -24,32 +108,8 @@ class AutomatskiKomencoCirq:
         self.gateMap["ccxp"] = "ccnotp"
         
         
-    def run(self, circuit, repetitions=1000, topK=20):
-        tstart = datetime.datetime.now()
-        
-        body = self.serialize_circuit(circuit, topK)
-        response = requests.post(f'http://{self.host}:{self.port}/api/komenco', json=body)
-        response.close() #bug fix - too many connections open
-        struct = response.json()
-        
-        tend = datetime.datetime.now()
-        execution_time = (tend - tstart).microseconds
-        print(f"Time Taken {(tend - tstart)}")
-        
-        cannotProceed = None
-        try:
-            if struct["error"] :
-                print(struct["error"])
-                cannotProceed = True
-                raise Exception(struct["error"])
-        except Exception as e:
-            if cannotProceed:
-                raise e            
-            pass 
-        
-        
-        
-        return self.deserialize_result(struct, repetitions, execution_time)
+    def build_result(self, body, struct, repetitions, execution_time):
+        return self.deserialize_result(struct, repetitions, execution_time, self.shuffle)
 
     def serialize_circuit(self, circuit, topK):
         # Get all qubits in the circuit and assign a custom index to each
@@ -95,38 +155,17 @@ class AutomatskiKomencoCirq:
                 else:
                     operations.append({"gate": gate, "params": params, "qubits": qubits})        
 
-        print("Executing Quantum Circuit With...")
-        print(f"{num_qubits} Qubits And ...")
-        print(f"{len(operations)} Gates")
-        
-        if len(measurements) == 0:
-            raise(Exception("There are no measurements done at the end of the circuit."))        
-                
         return { "num_qubits": num_qubits, "operations": operations, "measurements": measurements, "topK": topK}    
 
     @staticmethod
-    def deserialize_result(response_data, repetitions, execution_time):
+    def deserialize_result(response_data, repetitions, execution_time, shuffle=False):
         measurementsStrings = response_data['measurements']
-        # Initialize an empty list to collect measurement outcomes
-        measurement_results = []
-
-        # For each measurement string and its probability
-        for bitstring, prob in measurementsStrings.items():
-            # Calculate how many times this bitstring should appear
-            num_occurrences = int(prob * repetitions)
-            
-            # Convert the bitstring (e.g., '00', '11') into an array of 0s and 1s
-            bit_array = np.array([int(bit) for bit in bitstring[::-1]], dtype=np.int32)
-            
-            # Append the bitstring multiple times based on its probability
-            measurement_results.extend([bit_array] * num_occurrences)
-        
-        # Convert the list of measurement results into a numpy array
-        measurement_results = np.array(measurement_results)
 
-        # Create the result dictionary expected by cirq.ResultDict
-        result_dict = {'result': measurement_results}
+        # One row per distinct bitstring (first measured qubit first) and how often it occurs,
+        # the repetitions x n array is only built if the per-shot measurements are asked for
+        bitstrings = list(measurementsStrings.keys())
+        width = len(bitstrings[0]) if bitstrings else 0
+        rows = np.array([[int(bit) for bit in bitstring[::-1]] for bitstring in bitstrings], dtype=np.int32).reshape(-1, width)
+        counts = np.array([int(prob * repetitions) for prob in measurementsStrings.values()], dtype=np.int64)
 
-        # Create a cirq.ResultDict from the result_dict
-        return cirq.ResultDict(params=cirq.ParamResolver({}), measurements=result_dict)
- 
\ No newline at end of file
+        return AutomatskiKomencoCirqResult(rows, counts, key='result', shuffle=shuffle)
@@ -0,0 +1,298 @@
+from AutomatskiKomencoTransport import get_transport
+from AutomatskiKomencoCache import AutomatskiKomencoCache
+from AutomatskiKomencoOptimize import optimize_circuit
+from AutomatskiKomencoWire import compression_encoding
+from AutomatskiKomencoInstrumentation import PhaseTimings, Phase, global_sinks
+from AutomatskiKomencoExpectation import parse_observables, pauli_table, qubitwise_groups, measurement_body, distribution_expectations, ALL_OUTCOMES_QUBITS
+import numpy as np
+import asyncio
+import time
+
+# what an engine may report next to the measurements, attached to the result under the same name
+ENGINE_STATS = ["mps"]
+
+
+class AutomatskiKomencoClient:
+    """
+    The request/response cycle shared by all the Komenco clients.
+
+    Subclasses provide serialize_circuit(circuit, topK) and
+    build_result(body, struct, repetitions, execution_time), everything that talks to the
+    server (run, run_async, run_many, expectation) lives here.
+
+    Nothing is printed. Every result carries the PhaseTimings of its run as result.timings
+    (result["timings"] for the dict results) and the sinks (see AutomatskiKomencoInstrumentation)
+    are told about every circuit, optimization and run.
+    """
+
+    def __init__(self, host, port, transport=None, cache=None, optimize=False, binary=False, compress=None, sinks=None):
+        self.host = host
+        self.port = port
+        # connections are pooled and kept alive per host:port across all the clients
+        self.transport = transport if transport is not None else get_transport(host, port)
+        # binary=True sends circuits in the compact wire format where the server supports it,
+        # the transport is shared so this holds for every client of host:port
+        if binary:
+            self.transport.binary = True
+        # compress="gzip", "zstd" or True compresses large request bodies, also per host:port
+        if compress:
+            self.transport.compress = compression_encoding(compress)
+        # cache=True uses a default in-memory AutomatskiKomencoCache
+        self.cache = AutomatskiKomencoCache() if cache is True else (cache or None)
+        # prune, fuse and cancel gates of every serialized circuit before it is sent
+        self.optimize = optimize
+        # callables sink(event, data) for this client only, add_sink() reports every client
+        self.sinks = list(sinks) if sinks else []
+        # run_async stays within the pool of the shared transport unless asked for more
+        self.max_concurrency = self.transport.pool_size
+        self.semaphore = None
+        self.semaphoreLoop = None
+
+    def run(self, circuit, repetitions=1000, topK=20):
+        timings = PhaseTimings()
+        tstart = time.perf_counter_ns()
+
+        with Phase(timings, "serialize"):
+            body = self.prepare(circuit, topK)
+            outgoing = self.outgoing(body)
+        struct = self.post(outgoing, timings)
+
+        self.check_error(struct)
+
+        return self.finish([body], [struct], repetitions, timings, tstart)[0]
+
+    def run_batch(self, circuits, repetitions=1000, topK=20):
+        """
+        Run many circuits in a single request to /api/komenco/batch.
+
+        Every circuit is serialized exactly as run() would, the results come back in the same
+        order. If the server has no batch endpoint the batch is split into single requests.
+        """
+        timings = PhaseTimings()
+        tstart = time.perf_counter_ns()
+
+        with Phase(timings, "serialize"):
+            bodies = [self.prepare(circuit, topK) for circuit in circuits]
+            outgoing = [self.outgoing(body) for body in bodies]
+        structs = self.post_batch(outgoing, timings)
+
+        for struct in structs:
+            self.check_error(struct)
+
+        # the results share the timings of the whole batch
+        return self.finish(bodies, structs, repetitions, timings, tstart)
+
+    async def run_async(self, circuit, repetitions=1000, topK=20, semaphore=None):
+        """
+        Run a circuit without blocking the event loop.
+
+        At most max_concurrency circuits (or as many as the given semaphore allows) are in
+        flight at once, so it is safe to asyncio.gather hundreds of these.
+        """
+        if semaphore is None:
+            semaphore = self.get_semaphore()
+
+        async with semaphore:
+            timings = PhaseTimings()
+            tstart = time.perf_counter_ns()
+
+            with Phase(timings, "serialize"):
+                body = self.prepare(circuit, topK)
+                outgoing = self.outgoing(body)
+            struct = await self.post_async(outgoing, timings)
+
+        self.check_error(struct)
+
+        return self.finish([body], [struct], repetitions, timings, tstart)[0]
+
+    async def run_many_async(self, circuits, repetitions=1000, topK=20, concurrency=None):
+        # only this call is limited, the shared transport is left as it is
+        if concurrency is None:
+            concurrency = self.max_concurrency
+
+        semaphore = asyncio.Semaphore(concurrency)
+        # gather keeps the results in submission order
+        return await asyncio.gather(
+            *[self.run_async(circuit, repetitions, topK, semaphore) for circuit in circuits])
+
+    def run_many(self, circuits, repetitions=1000, topK=20, concurrency=None):
+        """
+        Run many circuits concurrently and return their results in submission order.
+
+        At most concurrency circuits are in flight, and never more than the pool_size of the
+        transport, which every client of host:port shares. transport.grow() enlarges it.
+
+        This is the synchronous facade over run_many_async, it cannot be called from inside
+        a running event loop (e.g. a notebook cell), await run_many_async there instead.
+        """
+        return asyncio.run(self.run_many_async(circuits, repetitions, topK, concurrency))
+
+    def expectation(self, circuit, observables, topK=None):
+        """
+        The expectation values of weighted sums of Pauli strings in the state the circuit prepares.
+
+        The distinct Pauli strings of all the observables are split into qubit-wise commuting
+        groups, each group is measured once by the circuit followed by its basis change and all
+        the groups go in one run_batch request. The values are the probability weighted parities
+        of the returned outcomes, no counts are rounded. With an in-process engine that can
+        compute them exactly (the StatevectorEngine of AutomatskiKomencoLocalTransport) nothing
+        is sampled, the statevector is simulated once and every string is evaluated on it.
+
+        Args:
+            circuit: A circuit of this client or a serialized payload, its measurements are ignored
+            observables: A single observable or a list of them. An observable is a Pauli label
+                like "XZI" (the rightmost letter acting on qubit 0), a (label, coefficient) pair,
+                a {label: coefficient} dict or a qiskit SparsePauliOp, inside a list also a list
+                of (label, coefficient) pairs
+            topK: How many outcomes of every group come back, all of them by default. Groups
+                then measure at most ALL_OUTCOMES_QUBITS (12) qubits, a single Pauli string on
+                more qubits needs an explicit topK. With fewer outcomes the values are
+                normalized by the probability that came back
+
+        Returns:
+            The (real) expectation value of a single observable, or an array with one per observable.
+        """
+        timings = PhaseTimings()
+        tstart = time.perf_counter_ns()
+
+        with Phase(timings, "serialize"):
+            body = self.prepare(circuit, topK or 20, measured=False)
+            terms, single = parse_observables(observables)
+            paulis, coefficients = pauli_table(terms, body["num_qubits"])
+        values = np.ones(len(paulis) + 1)
+
+        engine = getattr(self.transport, "engine", None)
+        bodies = []
+        if len(paulis) and hasattr(engine, "expectation"):
+            with Phase(timings, "server"):
+                values[:-1] = engine.expectation(body, paulis)
+        elif len(paulis):
+            # all the outcomes of a group come back by default, so its width is capped then
+            groups = qubitwise_groups(paulis, ALL_OUTCOMES_QUBITS if topK is None else None)
+            with Phase(timings, "serialize"):
+                bodies = [measurement_body(body, basis, topK) for basis, members in groups]
+                outgoing = [self.outgoing(groupBody) for groupBody in bodies]
+            structs = self.post_batch(outgoing, timings)
+
+            for struct in structs:
+                self.check_error(struct)
+
+            with Phase(timings, "deserialize"):
+                for (basis, members), groupBody, struct in zip(groups, bodies, structs):
+                    values[members] = distribution_expectations(struct["measurements"], groupBody["measurements"], [paulis[i] for i in members])
+
+        results = (coefficients @ values).real
+        timings.elapsed_ns = time.perf_counter_ns() - tstart
+        self.emit("timings", {"timings": timings, "circuits": len(bodies)})
+        return float(results[0]) if single else results
+
+    def finish(self, bodies, structs, repetitions, timings, tstart):
+        # builds the results, attaches the timings to them and reports the run
+        results = []
+        with Phase(timings, "deserialize"):
+            for body, struct in zip(bodies, structs):
+                execution_time = (time.perf_counter_ns() - tstart) / 1e9
+                result = self.attach(self.build_result(body, struct, repetitions, execution_time), "timings", timings)
+                for name in ENGINE_STATS:
+                    if name in struct:
+                        self.attach(result, name, struct[name])
+                results.append(result)
+        timings.elapsed_ns = time.perf_counter_ns() - tstart
+        self.emit("timings", {"timings": timings, "circuits": len(bodies)})
+        return results
+
+    @staticmethod
+    def attach(result, name, value):
+        if isinstance(result, dict):
+            result[name] = value
+        else:
+            setattr(result, name, value)
+        return result
+
+    def emit(self, event, data):
+        for sink in self.sinks:
+            sink(event, data)
+        for sink in global_sinks():
+            sink(event, data)
+
+    def post(self, body, timings=None):
+        key = self.cache_key(body)
+        struct = self.cache.get(key) if key else None
+        if struct is None:
+            struct = self.transport.post(body, timings)
+            self.remember(key, struct)
+        return struct
+
+    async def post_async(self, body, timings=None):
+        key = self.cache_key(body)
+        struct = self.cache.get(key) if key else None
+        if struct is None:
+            struct = await self.transport.post_async(body, timings)
+            self.remember(key, struct)
+        return struct
+
+    def post_batch(self, bodies, timings=None, batch=True):
+        # only the circuits that are not cached go to the server, batch=False sends one request per circuit
+        keys = [self.cache_key(body) for body in bodies]
+        structs = [self.cache.get(key) if key else None for key in keys]
+        missing = [i for i, struct in enumerate(structs) if struct is None]
+        if len(missing) == 0:
+            return structs
+
+        missingBodies = [bodies[i] for i in missing]
+        struct = self.transport.post_batch(missingBodies, timings) if batch else None
+        if struct is None:
+            missingStructs = self.transport.post_many(missingBodies, timings)
+        else:
+            self.check_error(struct)
+            missingStructs = struct["results"]
+            if len(missingStructs) != len(missingBodies):
+                raise(Exception(f"expected {len(missingBodies)} results from the batch but got {len(missingStructs)}"))
+
+        for i, struct in zip(missing, missingStructs):
+            structs[i] = struct
+            self.remember(keys[i], struct)
+        return structs
+
+    def cache_key(self, body):
+        if self.cache is None:
+            return None
+        return self.cache.key(body, self.transport.url)
+
+    def remember(self, key, struct):
+        # errors are never cached, the next submission tries again
+        if key and not struct.get("error"):
+            self.cache.put(key, struct)
+
+    def prepare(self, circuit, topK, measured=True):
+        # payloads that are already serialized (e.g. bound from a ParameterizedCircuit) go as is, with the topK asked for
+        if isinstance(circuit, dict):
+            if circuit.get("topK") != topK:
+                circuit = dict(circuit, topK=topK)
+            return circuit
+        body = self.serialize_circuit(circuit, topK)
+        if measured and len(body["measurements"]) == 0:
+            raise(Exception("There are no measurements done at the end of the circuit."))
+        self.emit("circuit", {"num_qubits": body["num_qubits"], "gates": len(body["operations"]), "measurements": len(body["measurements"])})
+        return body
+
+    def outgoing(self, body):
+        # what is actually sent, results are still built against the body as serialized
+        if not self.optimize:
+            return body
+        optimized, stats = optimize_circuit(body)
+        self.emit("optimized", stats)
+        return optimized
+
+    def get_semaphore(self):
+        # an asyncio.Semaphore belongs to one event loop, make a new one per loop
+        loop = asyncio.get_running_loop()
+        if self.semaphoreLoop is not loop:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.semaphoreLoop = loop
+        return self.semaphore
+
+    @staticmethod
+    def check_error(struct):
+        if "error" in struct and struct["error"]:
+            raise Exception(struct["error"])
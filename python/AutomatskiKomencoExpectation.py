@@ -0,0 +1,217 @@
+import numpy as np
+
+PAULIS = "IXYZ"
+
+# a group that measures more qubits than this needs an explicit topK, all its outcomes would be too many
+ALL_OUTCOMES_QUBITS = 12
+
+# the basis change that turns a measurement of X or Y into one of Z, Y = S X S^dagger
+BASIS_CHANGES = {
+    "X": [("h",)],
+    "Y": [("sdg",), ("h",)],
+    "Z": [],
+}
+
+
+def observable_terms(observable):
+    # the (label, coefficient) pairs of one observable
+    if isinstance(observable, str):
+        return [(observable, 1.0)]
+    if isinstance(observable, dict):
+        return list(observable.items())
+    if hasattr(observable, "to_list"):
+        # qiskit's SparsePauliOp
+        return [(label, coefficient) for label, coefficient in observable.to_list()]
+    if isinstance(observable, tuple) and len(observable) == 2 and isinstance(observable[0], str):
+        return [observable]
+    return [(label, coefficient) for label, coefficient in observable]
+
+
+def parse_observables(observables):
+    """
+    Args:
+        observables: A single observable or a list of them. An observable is a Pauli label like
+            "XZI", a (label, coefficient) pair, a {label: coefficient} dict or anything with a
+            to_list() of such pairs (qiskit's SparsePauliOp), inside a list also a list of pairs
+
+    Returns:
+        (terms, single) with the (label, coefficient) pairs of every observable and whether a
+        single observable was given.
+    """
+    if isinstance(observables, (str, dict)) or hasattr(observables, "to_list"):
+        return [observable_terms(observables)], True
+    if isinstance(observables, tuple) and len(observables) == 2 and isinstance(observables[0], str):
+        return [observable_terms(observables)], True
+    return [observable_terms(observable) for observable in observables], False
+
+
+def parse_pauli(label, num_qubits):
+    """
+    Returns:
+        The Pauli string as a tuple of (qubit, "X" | "Y" | "Z") pairs in increasing qubit order,
+        the rightmost character of label acting on qubit 0 like in the result bitstrings.
+    """
+    label = label.upper()
+    if len(label) > num_qubits:
+        raise(Exception(f"the Pauli string '{label}' is longer than the {num_qubits} qubits of the circuit"))
+    pauli = []
+    for qubit, letter in enumerate(reversed(label)):
+        if letter not in PAULIS:
+            raise(Exception(f"invalid Pauli string: '{label}', use the letters {PAULIS}"))
+        if letter != "I":
+            pauli.append((qubit, letter))
+    return tuple(pauli)
+
+
+def pauli_table(terms, num_qubits):
+    """
+    Returns:
+        (paulis, coefficients) with every distinct non-identity Pauli string of all the
+        observables and the (observables, paulis + 1) complex matrix of their coefficients,
+        the last column being the identity.
+    """
+    paulis = []
+    index = {}
+    entries = []
+    for row, observable in enumerate(terms):
+        for label, coefficient in observable:
+            pauli = parse_pauli(label, num_qubits)
+            if not pauli:
+                entries.append((row, -1, coefficient))
+                continue
+            if pauli not in index:
+                index[pauli] = len(paulis)
+                paulis.append(pauli)
+            entries.append((row, index[pauli], coefficient))
+
+    coefficients = np.zeros((len(terms), len(paulis) + 1), dtype=np.complex128)
+    for row, column, coefficient in entries:
+        coefficients[row, column] += coefficient
+    return paulis, coefficients
+
+
+def qubitwise_groups(paulis, max_qubits=None):
+    """
+    Splits the Pauli strings into groups that agree on every qubit they share, all the strings
+    of a group are measured by a single circuit. Greedy first fit, heaviest strings first.
+    With max_qubits a string only joins a group if the group then measures at most that many
+    qubits, a string wider than that is a group of its own.
+
+    Returns:
+        A list of (basis, members) with basis {qubit: letter} and the indices of the members.
+    """
+    groups = []
+    for i in sorted(range(len(paulis)), key=lambda i: -len(paulis[i])):
+        for basis, members in groups:
+            if all(basis.get(qubit, letter) == letter for qubit, letter in paulis[i]):
+                if max_qubits is not None and len(basis.keys() | {qubit for qubit, letter in paulis[i]}) > max_qubits:
+                    continue
+                basis.update(paulis[i])
+                members.append(i)
+                break
+        else:
+            groups.append((dict(paulis[i]), [i]))
+    return groups
+
+
+def measurement_body(body, basis, topK=None):
+    """
+    Returns:
+        A copy of the serialized circuit that rotates the qubits of basis into the Z basis and
+        measures them, in increasing qubit order. topK=None keeps every outcome, up to
+        ALL_OUTCOMES_QUBITS measured qubits.
+    """
+    measurements = sorted(basis)
+    if topK is None and len(measurements) > ALL_OUTCOMES_QUBITS:
+        raise(Exception(f"a group measures {len(measurements)} qubits, more than the {ALL_OUTCOMES_QUBITS} whose outcomes all come back by default, pass a topK"))
+    operations = list(body["operations"])
+    for qubit in measurements:
+        for gate, in BASIS_CHANGES[basis[qubit]]:
+            operations.append({"gate": gate, "params": [], "qubits": [qubit]})
+    if topK is None:
+        topK = 2 ** len(measurements)
+    return {"num_qubits": body["num_qubits"], "operations": operations, "measurements": measurements, "topK": topK}
+
+
+def pack_bits(bits):
+    # a (rows, width) 0/1 matrix as (rows, words) uint64, bit k of the packed row is column k
+    rows, width = bits.shape
+    packed = np.packbits(bits.astype(np.uint8), axis=1, bitorder="little")
+    padding = -packed.shape[1] % 8
+    if padding:
+        packed = np.concatenate([packed, np.zeros((rows, padding), dtype=np.uint8)], axis=1)
+    return np.ascontiguousarray(packed).view("<u8")
+
+
+def parity(words):
+    """
+    Returns:
+        The parity of the set bits of every integer in words, reduced over the last axis.
+    """
+    x = np.bitwise_xor.reduce(np.asarray(words, dtype=np.uint64), axis=-1)
+    for shift in (32, 16, 8, 4, 2, 1):
+        x ^= x >> np.uint64(shift)
+    return (x & np.uint64(1)).astype(np.int8)
+
+
+def distribution_expectations(measurements, measured, paulis):
+    """
+    The expectation values of Pauli strings that are diagonal in the measured basis.
+
+    Args:
+        measurements: The {bitstring: probability} of a result, bit k (from the right) being
+            the k-th measured qubit
+        measured: The measured qubits
+        paulis: Pauli strings (see parse_pauli) acting only on measured qubits
+
+    Returns:
+        An array with the probability weighted mean of (-1)^parity for every Pauli string,
+        normalized by the total probability that came back.
+    """
+    keys = list(measurements)
+    width = len(measured)
+    bits = (np.frombuffer("".join(keys).encode("ascii"), dtype=np.uint8) - ord("0")).reshape(-1, width)[:, ::-1]
+    probabilities = np.fromiter(measurements.values(), dtype=np.float64, count=len(keys))
+    total = probabilities.sum()
+    if total <= 0:
+        raise(Exception("a result without any measurements"))
+
+    position = {qubit: k for k, qubit in enumerate(measured)}
+    masks = np.zeros((len(paulis), width), dtype=np.uint8)
+    for i, pauli in enumerate(paulis):
+        masks[i, [position[qubit] for qubit, letter in pauli]] = 1
+
+    # (paulis, outcomes) parities of the packed outcomes masked by every string
+    parities = parity(pack_bits(bits)[None, :, :] & pack_bits(masks)[:, None, :])
+    return (1.0 - 2.0 * parities) @ probabilities / total
+
+
+def pauli_masks(pauli):
+    """
+    Returns:
+        (x, z) integer masks with bit q set when the string flips (X, Y) or phases (Z, Y) qubit q.
+    """
+    x = z = 0
+    for qubit, letter in pauli:
+        if letter in "XY":
+            x |= 1 << qubit
+        if letter in "YZ":
+            z |= 1 << qubit
+    return x, z
+
+
+def statevector_expectations(state, paulis):
+    """
+    Exact <psi|P|psi> from a statevector in which qubit q is bit q of the index.
+
+    P|i> = i^#Y (-1)^popcount(i & z) |i ^ x>, so every string costs one gather and one dot
+    product over the amplitudes.
+    """
+    index = np.arange(state.size, dtype=np.uint64)
+    values = np.empty(len(paulis))
+    for i, pauli in enumerate(paulis):
+        x, z = pauli_masks(pauli)
+        signs = 1.0 - 2.0 * parity((index & np.uint64(z))[:, None]) if z else 1.0
+        amplitude = np.vdot(state[index ^ np.uint64(x)] if x else state, signs * state)
+        values[i] = (1j ** bin(x & z).count("1") * amplitude).real
+    return values
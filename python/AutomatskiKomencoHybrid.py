@@ -0,0 +1,215 @@
+from AutomatskiKomencoNative import ParameterizedCircuit, Parameter
+from AutomatskiKomencoExpectation import distribution_expectations
+import numpy as np
+
+READOUTS = ["mode", "mean"]
+DISPATCHES = ["many", "batch"]
+
+# the "mean" readout measures at most this many qubits per circuit, so no result has more than 2 ** MEAN_QUBITS outcomes
+MEAN_QUBITS = 8
+
+# the parameter-shift rule for gates generated by a Pauli, e.g. rx(theta) = exp(-i theta X / 2)
+SHIFT = np.pi / 2
+
+
+def angle_encoding(num_qubits, gate="rx"):
+    """
+    Returns:
+        A ParameterizedCircuit with one gate(x_j) per qubit followed by measure_all, the
+        encoding used by the pytorch-quantum examples.
+    """
+    angles = [Parameter(f"x{j}") for j in range(num_qubits)]
+    circuit = ParameterizedCircuit(num_qubits)
+    for j in range(num_qubits):
+        getattr(circuit, gate)(angles[j], j)
+    circuit.measure_all()
+    return circuit
+
+
+def result_counts(result):
+    # the {bitstring: count} of a result of any of the Komenco clients
+    if isinstance(result, dict):
+        return result["result"]
+    if hasattr(result, "get_counts"):
+        return result.get_counts()
+    return dict(result.measurement_counts)
+
+
+def counts_arrays(results):
+    """
+    Flattens the counts of many results into arrays, without a Python loop per bitstring.
+
+    Returns:
+        bits: (bitstrings, width) uint8 with column j the j-th measured qubit (the bitstrings
+            reversed), counts: (bitstrings,) float64 and starts: (results,) the first row of
+            every result.
+    """
+    counts = [result_counts(result) for result in results]
+    lengths = np.fromiter(map(len, counts), dtype=np.intp, count=len(counts))
+    if len(counts) and lengths.min() == 0:
+        raise(Exception("a result without any measurements"))
+    keys = [key for measurements in counts for key in measurements]
+    width = len(keys[0]) if keys else 0
+    bits = (np.frombuffer("".join(keys).encode("ascii"), dtype=np.uint8) - ord("0")).reshape(-1, width)[:, ::-1]
+    values = np.fromiter((value for measurements in counts for value in measurements.values()), dtype=np.float64, count=len(keys))
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.intp)
+    return bits, values, starts
+
+
+def readout(results, method="mode"):
+    """
+    Turns the results into a (results, width) array with 1 for a measured 1 and -1 for a 0.
+
+    Args:
+        method: "mode" takes the most frequent bitstring of every result (the first one on a
+            tie), "mean" the count weighted mean over the bitstrings that came back. That is
+            only -<Z> of every qubit when the results hold all the outcomes, HybridRunner
+            computes its "mean" readout from the full distribution instead
+    """
+    bits, values, starts = counts_arrays(results)
+    signs = 2.0 * bits - 1.0
+    if method == "mode":
+        rows = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+        # by result, then by count descending, ties stay in their order
+        order = np.lexsort((-values, rows))
+        first = order[np.searchsorted(rows[order], np.arange(len(starts)))]
+        return signs[first]
+    if method == "mean":
+        totals = np.add.reduceat(values, starts)
+        return np.add.reduceat(signs * values[:, None], starts, axis=0) / np.where(totals > 0, totals, 1.0)[:, None]
+    raise(Exception(f"unknown readout: '{method}', use one of {READOUTS}"))
+
+
+def shifted_values(values, shift=SHIFT):
+    """
+    Returns:
+        The (2 * parameters * batch, parameters) matrix of every row of values with each
+        parameter shifted by +shift and then -shift, ordered (sign, parameter, row).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    batch, count = values.shape
+    shifts = np.concatenate([np.eye(count), -np.eye(count)]) * shift
+    return (values[None, :, :] + shifts[:, None, :]).reshape(2 * count * batch, count)
+
+
+def shift_jacobian(outputs, batch, count):
+    """
+    The parameter-shift derivative from the outputs of the shifted_values rows.
+
+    Returns:
+        The (batch, width, parameters) Jacobian, (f(x + shift e_p) - f(x - shift e_p)) / 2.
+    """
+    outputs = np.asarray(outputs).reshape(2, count, batch, -1)
+    return np.transpose((outputs[0] - outputs[1]) / 2, (1, 2, 0))
+
+
+class HybridRunner:
+    """
+    Runs a ParameterizedCircuit on Komenco for a whole matrix of parameter values at once.
+
+    Every row of values is bound with one bind_many call, the payloads are sent together
+    (run_many, or run_batch for a single /api/komenco/batch request) and the results are read
+    out into a (rows, measured qubits) array, see readout. The machine learning layers of
+    AutomatskiKomencoTorch and AutomatskiKomencoJax are built on it.
+
+    The "mean" readout is -<Z> of every measured qubit (1 for a certain 1, -1 for a certain 0).
+    It is computed from exact marginals: every row is sent as one circuit per MEAN_QUBITS of the
+    measured qubits, each measuring only those and asking for all their outcomes, and topK and
+    repetitions are not used. With the engine of an in-process transport (see
+    AutomatskiKomencoLocalTransport) it is computed directly. jacobian uses the parameter-shift rule, which gives
+    the exact derivative of that readout when every parameter drives a single Pauli rotation
+    (rx, ry, rz, ...) like in angle_encoding. "mode" is piecewise constant, it has no gradient.
+
+    Rows that are exactly equal are only run once, e.g. repeated inputs (all zero patches) or
+    a shifted row that coincides with another row of the same dispatch.
+    """
+
+    def __init__(self, circuit, client, readout="mode", repetitions=1000, topK=20, dispatch="many", concurrency=None):
+        if readout not in READOUTS:
+            raise(Exception(f"unknown readout: '{readout}', use one of {READOUTS}"))
+        if dispatch not in DISPATCHES:
+            raise(Exception(f"unknown dispatch: '{dispatch}', use one of {DISPATCHES}"))
+        self.circuit = circuit
+        self.client = client
+        self.readout = readout
+        self.repetitions = repetitions
+        self.topK = topK
+        self.dispatch = dispatch
+        self.concurrency = concurrency
+
+    @property
+    def num_parameters(self):
+        return len(self.circuit.parameters)
+
+    @property
+    def width(self):
+        # one output per measured qubit
+        return len(self.circuit.template(self.topK)[0]["measurements"])
+
+    def run(self, values):
+        """
+        Args:
+            values: A (rows, parameters) matrix
+
+        Returns:
+            The (rows, width) readout as float64.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.num_parameters)
+        if len(values) == 0:
+            return np.zeros((0, self.width))
+        unique, inverse = np.unique(values, axis=0, return_inverse=True)
+        if len(unique) < len(values):
+            return self.dispatch_rows(unique)[inverse.reshape(-1)]
+        return self.dispatch_rows(values)
+
+    def dispatch_rows(self, values):
+        if self.readout == "mean":
+            return self.mean_rows(values)
+        bodies = self.circuit.bind_many(values, topK=self.topK)
+        if self.dispatch == "batch":
+            results = self.client.run_batch(bodies, repetitions=self.repetitions, topK=self.topK)
+        else:
+            results = self.client.run_many(bodies, repetitions=self.repetitions, topK=self.topK, concurrency=self.concurrency)
+        return readout(results, self.readout)
+
+    def mean_rows(self, values):
+        # -<Z> of the measured qubits from exact marginals, not from rounded top-K counts
+        bodies = self.circuit.bind_many(values, topK=self.topK)
+        measured = bodies[0]["measurements"]
+        paulis = [((qubit, "Z"),) for qubit in measured]
+
+        engine = getattr(self.client.transport, "engine", None)
+        if hasattr(engine, "expectation"):
+            return -np.array([engine.expectation(body, paulis) for body in bodies]).real
+
+        # every circuit measures a group of qubits and gets all the outcomes of their marginal
+        groups = [measured[start:start + MEAN_QUBITS] for start in range(0, len(measured), MEAN_QUBITS)]
+        grouped = [dict(body, measurements=group, topK=2 ** len(group)) for body in bodies for group in groups]
+        outgoing = [self.client.outgoing(body) for body in grouped]
+        # through the client's cache either way, "many" as concurrent single requests on the transport's pool
+        structs = self.client.post_batch(outgoing, batch=self.dispatch == "batch")
+        for struct in structs:
+            self.client.check_error(struct)
+
+        outputs = np.empty((len(bodies), len(measured)))
+        for i, struct in enumerate(structs):
+            row, g = divmod(i, len(groups))
+            group = groups[g]
+            outputs[row, g * MEAN_QUBITS:g * MEAN_QUBITS + len(group)] = -distribution_expectations(struct["measurements"], group, [((qubit, "Z"),) for qubit in group])
+        return outputs
+
+    def jacobian(self, values, shift=SHIFT, with_outputs=False):
+        """
+        The parameter-shift Jacobian of run, all the 2 * parameters * rows shifted circuits
+        (and the unshifted ones with with_outputs) are sent in one dispatch.
+
+        Returns:
+            The (rows, width, parameters) Jacobian, or (outputs, Jacobian) with with_outputs.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.num_parameters)
+        batch, count = values.shape
+        shifted = shifted_values(values, shift)
+        if with_outputs:
+            outputs = self.run(np.concatenate([values, shifted]))
+            return outputs[:batch], shift_jacobian(outputs[batch:], batch, count)
+        return shift_jacobian(self.run(shifted), batch, count)
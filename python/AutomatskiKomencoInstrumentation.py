@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+import numpy as np
+
+# the phases of a run, in the order they happen
+PHASES = ["serialize", "connect", "send", "server", "receive", "deserialize"]
+
+logger = logging.getLogger("komenco")
+
+
+class PhaseTimings(dict):
+    """
+    How long each phase of a run took, {phase: nanoseconds} measured with perf_counter_ns.
+
+    serialize is the client building (and optimizing) the payload, connect opening a TCP
+    connection (0 when a pooled one is reused), send writing the request, server waiting for
+    the response headers, receive reading and decoding the response body and deserialize
+    building the result object. Phases that did not happen (e.g. everything between serialize
+    and deserialize on a cache hit) are missing. elapsed_ns is the wall time of the whole run,
+    for a batch the timings cover all its circuits.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.elapsed_ns = None
+
+    def add(self, phase, ns):
+        self[phase] = self.get(phase, 0) + ns
+
+    def merge(self, other):
+        for phase, ns in other.items():
+            self.add(phase, ns)
+
+    @property
+    def total_ns(self):
+        return self.elapsed_ns if self.elapsed_ns is not None else sum(self.values())
+
+    @property
+    def seconds(self):
+        return self.total_ns / 1e9
+
+    def milliseconds(self):
+        return {phase: self[phase] / 1e6 for phase in PHASES if phase in self}
+
+    def __repr__(self):
+        phases = ", ".join(f"{phase} {ms:.3f}ms" for phase, ms in self.milliseconds().items())
+        return f"PhaseTimings({phases}, total {self.total_ns / 1e6:.3f}ms)"
+
+
+class Phase:
+    """
+    Times a with block into timings[phase], does nothing if timings is None.
+    """
+
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.tstart = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timings is not None:
+            self.timings.add(self.phase, time.perf_counter_ns() - self.tstart)
+        return False
+
+
+# the events sent to the sinks and what comes with them:
+#   "circuit"   {"num_qubits", "gates", "measurements"} for every serialized circuit
+#   "optimized" the stats of optimize_circuit
+#   "timings"   {"timings": PhaseTimings, "circuits": how many circuits they cover}
+_sinks = []
+_sinksLock = threading.Lock()
+
+
+def add_sink(sink):
+    """
+    Send the events of every Komenco client to sink(event, data), see also the sinks= argument
+    of the clients. Nothing is reported by default.
+    """
+    with _sinksLock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with _sinksLock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def global_sinks():
+    return _sinks
+
+
+class PrintSink:
+    """
+    Prints what the clients used to print on every run.
+    """
+
+    def __call__(self, event, data):
+        if event == "circuit":
+            print("Executing Quantum Circuit With...")
+            print(f"{data['num_qubits']} Qubits And ...")
+            print(f"{data['gates']} Gates")
+        elif event == "optimized":
+            print(f"Optimized {data['qubits_before']} Qubits And {data['gates_before']} Gates "
+                  f"Down To {data['qubits_after']} Qubits And {data['gates_after']} Gates")
+        elif event == "timings":
+            print(f"Time Taken {data['timings'].seconds:.6f}s {data['timings']!r}")
+
+
+class LoggingSink:
+    """
+    Logs the events to the "komenco" logger (or the given one) at DEBUG.
+    """
+
+    def __init__(self, log=None, level=logging.DEBUG):
+        self.log = log if log is not None else logger
+        self.level = level
+
+    def __call__(self, event, data):
+        if self.log.isEnabledFor(self.level):
+            self.log.log(self.level, "%s %r", event, data)
+
+
+class MetricsSink:
+    """
+    Collects the phase timings of every run for percentiles, e.g. from a monitoring job.
+    """
+
+    def __init__(self):
+        self.samples = {phase: [] for phase in PHASES + ["total"]}
+        self.runs = 0
+        self.circuits = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, event, data):
+        if event != "timings":
+            return
+        timings = data["timings"]
+        with self.lock:
+            self.runs += 1
+            self.circuits += data["circuits"]
+            for phase in PHASES:
+                if phase in timings:
+                    self.samples[phase].append(timings[phase])
+            self.samples["total"].append(timings.total_ns)
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """
+        Returns:
+            {phase: {"p50": ms, "p95": ms, "p99": ms, "mean": ms, "count": n}} for the phases
+            that have samples.
+        """
+        with self.lock:
+            samples = {phase: np.array(values) / 1e6 for phase, values in self.samples.items() if values}
+        summary = {}
+        for phase, values in samples.items():
+            stats = {f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+            stats["mean"] = float(values.mean())
+            stats["count"] = len(values)
+            summary[phase] = stats
+        return summary
+
+    def reset(self):
+        with self.lock:
+            for values in self.samples.values():
+                values.clear()
+            self.runs = 0
+            self.circuits = 0
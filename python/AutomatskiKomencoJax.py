@@ -0,0 +1,68 @@
+from AutomatskiKomencoHybrid import HybridRunner, SHIFT
+import inspect
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+
+def host_callback(callback, result_shape_dtypes, *args):
+    # a pure_callback that is handed whole vmapped batches, newer jax replaced vectorized by vmap_method
+    if "vmap_method" in inspect.signature(jax.pure_callback).parameters:
+        return jax.pure_callback(callback, result_shape_dtypes, *args, vmap_method="broadcast_all")
+    return jax.pure_callback(callback, result_shape_dtypes, *args, vectorized=True)
+
+
+class QuantumLayer:
+    """
+    A JAX function that runs a ParameterizedCircuit on Komenco, usable inside jit, vmap and grad.
+
+    layer(x) takes the values of circuit.parameters in the last axis of x (any leading axes,
+    including the ones vmap adds, become one batch) and returns one value per measured qubit.
+    The circuits are run on the host through jax.pure_callback, which gets the whole batch at
+    once, so a jitted and vmapped batch is a single bind_many and a single dispatch (see
+    AutomatskiKomencoHybrid.HybridRunner).
+
+    The gradient is a custom_vjp using the parameter-shift rule: when differentiating, the
+    forward pass sends the circuits of the batch together with all their 2 * parameters shifted
+    copies in one dispatch and the backward pass only contracts the Jacobian. Use the "mean"
+    readout (the default here) for gradients, "mode" is piecewise constant.
+    """
+
+    def __init__(self, circuit, client, readout="mean", repetitions=1000, topK=20, dispatch="many", concurrency=None, shift=SHIFT):
+        self.runner = HybridRunner(circuit, client, readout, repetitions, topK, dispatch, concurrency)
+        self.shift = shift
+        self.apply = jax.custom_vjp(self.forward)
+        self.apply.defvjp(self.forward_with_jacobian, self.backward)
+
+    def __call__(self, x):
+        return self.apply(x)
+
+    def shapes(self, x):
+        if x.shape[-1] != self.runner.num_parameters:
+            raise(Exception(f"expected {self.runner.num_parameters} values in the last axis but got {x.shape[-1]}"))
+        width = self.runner.width
+        return (jax.ShapeDtypeStruct(x.shape[:-1] + (width,), x.dtype),
+                jax.ShapeDtypeStruct(x.shape[:-1] + (width, self.runner.num_parameters), x.dtype))
+
+    def outputs(self, x):
+        # runs on the host with a numpy array
+        x = np.asarray(x)
+        values = self.runner.run(x.reshape(-1, x.shape[-1]))
+        return values.reshape(x.shape[:-1] + (-1,)).astype(x.dtype)
+
+    def outputs_and_jacobian(self, x):
+        x = np.asarray(x)
+        values, jacobian = self.runner.jacobian(x.reshape(-1, x.shape[-1]), self.shift, with_outputs=True)
+        return (values.reshape(x.shape[:-1] + (-1,)).astype(x.dtype),
+                jacobian.reshape(x.shape[:-1] + jacobian.shape[1:]).astype(x.dtype))
+
+    def forward(self, x):
+        return host_callback(self.outputs, self.shapes(x)[0], x)
+
+    def forward_with_jacobian(self, x):
+        outputs, jacobian = host_callback(self.outputs_and_jacobian, self.shapes(x), x)
+        return outputs, jacobian
+
+    @staticmethod
+    def backward(jacobian, g):
+        return (jnp.einsum("...w,...wp->...p", g, jacobian),)
@@ -0,0 +1,450 @@
+from AutomatskiKomencoInstrumentation import Phase
+from AutomatskiKomencoExpectation import statevector_expectations
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import asyncio
+import os
+import threading
+
+# the widest circuit the statevector engine accepts, 2^28 amplitudes take 4 GiB
+DEFAULT_MAX_QUBITS = 28
+
+
+# gate matrices, for multi-qubit gates the first qubit of the operation is the most significant
+
+I = np.eye(2, dtype=np.complex128)
+X = np.array([[0, 1], [1, 0]], dtype=np.complex128)
+Y = np.array([[0, -1j], [1j, 0]], dtype=np.complex128)
+Z = np.array([[1, 0], [0, -1]], dtype=np.complex128)
+H = np.array([[1, 1], [1, -1]], dtype=np.complex128) / np.sqrt(2)
+S = np.diag([1, 1j]).astype(np.complex128)
+T = np.diag([1, np.exp(1j * np.pi / 4)]).astype(np.complex128)
+SX = np.array([[1 + 1j, 1 - 1j], [1 - 1j, 1 + 1j]], dtype=np.complex128) / 2
+SY = np.array([[1, -1], [1, 1]], dtype=np.complex128) * (1 + 1j) / 2
+SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=np.complex128)
+ISWAP = np.array([[1, 0, 0, 0], [0, 0, 1j, 0], [0, 1j, 0, 0], [0, 0, 0, 1]], dtype=np.complex128)
+
+
+def rx(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]], dtype=np.complex128)
+
+
+def ry(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=np.complex128)
+
+
+def rz(theta):
+    return np.diag([np.exp(-0.5j * theta), np.exp(0.5j * theta)])
+
+
+def phase(lam):
+    return np.diag([1, np.exp(1j * lam)]).astype(np.complex128)
+
+
+def u(theta, phi, lam):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -np.exp(1j * lam) * s],
+                     [np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c]], dtype=np.complex128)
+
+
+def r(theta, phi):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -1j * np.exp(-1j * phi) * s],
+                     [-1j * np.exp(1j * phi) * s, c]], dtype=np.complex128)
+
+
+def gpi(phi):
+    return np.array([[0, np.exp(-1j * phi)], [np.exp(1j * phi), 0]], dtype=np.complex128)
+
+
+def gpi2(phi):
+    return np.array([[1, -1j * np.exp(-1j * phi)], [-1j * np.exp(1j * phi), 1]], dtype=np.complex128) / np.sqrt(2)
+
+
+def power(pauli, t):
+    # pauli^t with eigenvalues 1 and e^(i pi t), as the cirq XPow/YPow/ZPow gates
+    return np.exp(0.5j * np.pi * t) * (np.cos(0.5 * np.pi * t) * I - 1j * np.sin(0.5 * np.pi * t) * pauli)
+
+
+def phased_power(pauli, t, phi):
+    return power(Z, phi) @ power(pauli, t) @ power(Z, -phi)
+
+
+def pair_rotation(pauli1, pauli2, theta):
+    return np.cos(theta / 2) * np.eye(4) - 1j * np.sin(theta / 2) * np.kron(pauli1, pauli2)
+
+
+def pair_power(pauli, t):
+    pp = np.kron(pauli, pauli)
+    return (np.eye(4) + pp) / 2 + np.exp(1j * np.pi * t) * (np.eye(4) - pp) / 2
+
+
+def controlled(U, controls=1):
+    dim = U.shape[0]
+    full = np.eye(dim << controls, dtype=np.complex128)
+    full[-dim:, -dim:] = U
+    return full
+
+
+CX = controlled(X)
+XC = np.kron(I, np.array([[1, 0], [0, 0]])) + np.kron(X, np.array([[0, 0], [0, 1]]))
+DCX = XC @ CX
+ECR = pair_rotation(Z, X, -np.pi / 4) @ np.kron(X, I) @ pair_rotation(Z, X, np.pi / 4)
+CSWAP = controlled(SWAP)
+
+
+def param(gate, params, count):
+    if len(params) < count:
+        raise(Exception(f"gate: {gate} needs {count} params but got {len(params)}"))
+    return [float(p) for p in params[:count]]
+
+
+def cu(gate, params):
+    # cu1 with 4 params is what the native cu() emits, it is the full controlled-U with global phase gamma
+    if len(params) >= 4:
+        theta, phi, lam, gamma = param(gate, params, 4)
+        return np.exp(1j * gamma) * u(theta, phi, lam)
+    return phase(*param(gate, params, 1))
+
+
+# gate name -> (kind, params -> matrix)
+#   single:     a 2x2 matrix on the only qubit
+#   controlled: a 2x2 matrix on the last qubit, every other qubit is a control
+#   matrix:     a dense matrix on all the qubits of the operation
+GATES = {
+    "id": ("single", lambda g, p: I),
+    "x": ("single", lambda g, p: X),
+    "y": ("single", lambda g, p: Y),
+    "z": ("single", lambda g, p: Z),
+    "h": ("single", lambda g, p: H),
+    "s": ("single", lambda g, p: S),
+    "sdg": ("single", lambda g, p: S.conj().T),
+    "t": ("single", lambda g, p: T),
+    "tdg": ("single", lambda g, p: T.conj().T),
+    "sx": ("single", lambda g, p: SX),
+    "sxdg": ("single", lambda g, p: SX.conj().T),
+    "sqrt_x": ("single", lambda g, p: SX),
+    "sqrt_y": ("single", lambda g, p: SY),
+    "sqrt_z": ("single", lambda g, p: S),
+    "rx": ("single", lambda g, p: rx(*param(g, p, 1))),
+    "ry": ("single", lambda g, p: ry(*param(g, p, 1))),
+    "rz": ("single", lambda g, p: rz(*param(g, p, 1))),
+    "p": ("single", lambda g, p: phase(*param(g, p, 1))),
+    "u1": ("single", lambda g, p: phase(*param(g, p, 1))),
+    "u2": ("single", lambda g, p: u(np.pi / 2, *param(g, p, 2))),
+    "u3": ("single", lambda g, p: u(*param(g, p, 3))),
+    "u": ("single", lambda g, p: u(*param(g, p, 3))),
+    "r": ("single", lambda g, p: r(*param(g, p, 2))),
+    "gpi": ("single", lambda g, p: gpi(*param(g, p, 1))),
+    "gpi2": ("single", lambda g, p: gpi2(*param(g, p, 1))),
+    "xp": ("single", lambda g, p: power(X, *param(g, p, 1))),
+    "yp": ("single", lambda g, p: power(Y, *param(g, p, 1))),
+    "zp": ("single", lambda g, p: power(Z, *param(g, p, 1))),
+    "phased_xp": ("single", lambda g, p: phased_power(X, *param(g, p, 2))),
+    "phased_yp": ("single", lambda g, p: phased_power(Y, *param(g, p, 2))),
+    "phased_zp": ("single", lambda g, p: phased_power(Z, *param(g, p, 2))),
+
+    "cx": ("controlled", lambda g, p: X),
+    "cy": ("controlled", lambda g, p: Y),
+    "cz": ("controlled", lambda g, p: Z),
+    "ch": ("controlled", lambda g, p: H),
+    "cs": ("controlled", lambda g, p: S),
+    "csdg": ("controlled", lambda g, p: S.conj().T),
+    "csx": ("controlled", lambda g, p: SX),
+    "crx": ("controlled", lambda g, p: rx(*param(g, p, 1))),
+    "cry": ("controlled", lambda g, p: ry(*param(g, p, 1))),
+    "crz": ("controlled", lambda g, p: rz(*param(g, p, 1))),
+    # with a single angle a uniformly controlled rotation is the controlled rotation
+    "ucrx": ("controlled", lambda g, p: rx(*param(g, p, 1))),
+    "ucry": ("controlled", lambda g, p: ry(*param(g, p, 1))),
+    "ucrz": ("controlled", lambda g, p: rz(*param(g, p, 1))),
+    "cp": ("controlled", lambda g, p: phase(*param(g, p, 1))),
+    "cu1": ("controlled", cu),
+    "cu": ("controlled", cu),
+    "cu2": ("controlled", lambda g, p: u(np.pi / 2, *param(g, p, 2))),
+    "cu3": ("controlled", lambda g, p: u(*param(g, p, 3))),
+    "cr": ("controlled", lambda g, p: u(*param(g, p, 3))),
+    "cnotp": ("controlled", lambda g, p: power(X, *param(g, p, 1))),
+    "cyp": ("controlled", lambda g, p: power(Y, *param(g, p, 1))),
+    "czp": ("controlled", lambda g, p: power(Z, *param(g, p, 1))),
+    "ccx": ("controlled", lambda g, p: X),
+    "ccy": ("controlled", lambda g, p: Y),
+    "ccz": ("controlled", lambda g, p: Z),
+    "ccp": ("controlled", lambda g, p: phase(*param(g, p, 1))),
+    "ccnotp": ("controlled", lambda g, p: power(X, *param(g, p, 1))),
+    "ccyp": ("controlled", lambda g, p: power(Y, *param(g, p, 1))),
+    "cczp": ("controlled", lambda g, p: power(Z, *param(g, p, 1))),
+    "c3x": ("controlled", lambda g, p: X),
+    "c4x": ("controlled", lambda g, p: X),
+    "mcx": ("controlled", lambda g, p: X),
+    "mct": ("controlled", lambda g, p: X),
+    "mcz": ("controlled", lambda g, p: Z),
+    "mcp": ("controlled", lambda g, p: phase(*param(g, p, 1))),
+    "mcu1": ("controlled", lambda g, p: phase(*param(g, p, 1))),
+    "mcu2": ("controlled", lambda g, p: u(np.pi / 2, *param(g, p, 2))),
+    "mcu3": ("controlled", lambda g, p: u(*param(g, p, 3))),
+    "mcrx": ("controlled", lambda g, p: rx(*param(g, p, 1))),
+    "mcry": ("controlled", lambda g, p: ry(*param(g, p, 1))),
+    "mcrz": ("controlled", lambda g, p: rz(*param(g, p, 1))),
+
+    "swap": ("matrix", lambda g, p: SWAP),
+    "iswap": ("matrix", lambda g, p: ISWAP),
+    "dcx": ("matrix", lambda g, p: DCX),
+    "ecr": ("matrix", lambda g, p: ECR),
+    "rxx": ("matrix", lambda g, p: pair_rotation(X, X, *param(g, p, 1))),
+    "ryy": ("matrix", lambda g, p: pair_rotation(Y, Y, *param(g, p, 1))),
+    "rzz": ("matrix", lambda g, p: pair_rotation(Z, Z, *param(g, p, 1))),
+    "rzx": ("matrix", lambda g, p: pair_rotation(Z, X, *param(g, p, 1))),
+    "xxp": ("matrix", lambda g, p: pair_power(X, *param(g, p, 1))),
+    "yyp": ("matrix", lambda g, p: pair_power(Y, *param(g, p, 1))),
+    "zzp": ("matrix", lambda g, p: pair_power(Z, *param(g, p, 1))),
+    "cswap": ("matrix", lambda g, p: CSWAP),
+
+    "qft": ("qft", None),
+    "iqft": ("qft", None),
+}
+
+
+def gate_matrix(gate, params, num_qubits=1):
+    """
+    Returns:
+        The unitary of a single-qubit, controlled or dense gate as a full matrix over its
+        num_qubits qubits (first qubit most significant, the controls come first).
+        qft/iqft have no fixed size and are not supported.
+    """
+    if gate not in GATES or GATES[gate][0] == "qft":
+        raise(Exception(f"gate or operation: '{gate}' is not supported by the local engine"))
+    kind, build = GATES[gate]
+    if kind == "controlled":
+        return controlled(build(gate, params), num_qubits - 1)
+    return build(gate, params)
+
+
+def apply_on_axis(tensor, U, axis):
+    # applies the 2x2 U along axis of tensor in place
+    # length one slices keep a0 and a1 views even when nothing else is left of the tensor
+    index0 = [slice(None)] * tensor.ndim
+    index1 = [slice(None)] * tensor.ndim
+    index0[axis] = slice(0, 1)
+    index1[axis] = slice(1, 2)
+    a0 = tensor[tuple(index0)]
+    a1 = tensor[tuple(index1)]
+
+    if U[0, 1] == 0 and U[1, 0] == 0:
+        if U[0, 0] != 1:
+            a0 *= U[0, 0]
+        if U[1, 1] != 1:
+            a1 *= U[1, 1]
+    elif U[0, 0] == 0 and U[1, 1] == 0:
+        tmp = a0.copy()
+        np.multiply(a1, U[0, 1], out=a0)
+        np.multiply(tmp, U[1, 0], out=a1)
+    else:
+        tmp = a0.copy()
+        a0 *= U[0, 0]
+        a0 += U[0, 1] * a1
+        a1 *= U[1, 1]
+        a1 += U[1, 0] * tmp
+
+
+class StatevectorEngine:
+    """
+    An in-process simulator for /api/komenco payloads.
+
+    The state is a flat complex128 vector where qubit q is bit q of the index, viewed as a
+    reshaped tensor so that every gate updates only the amplitudes it touches. Single-qubit and
+    controlled gates are applied in place on strided views, the few dense two and three qubit
+    gates by a tensordot over their axes. No 2^n x 2^n matrix is ever built.
+    """
+
+    def __init__(self, max_qubits=DEFAULT_MAX_QUBITS):
+        self.max_qubits = max_qubits
+
+    def execute(self, body):
+        """
+        Args:
+            body: A serialized circuit as produced by serialize_circuit
+
+        Returns:
+            {"measurements": {bitstring: probability}} with the topK most likely outcomes of the
+            measured qubits, the first measured qubit being the rightmost bit.
+        """
+        measurements = body["measurements"]
+        if len(measurements) == 0:
+            raise(Exception("There are no measurements done at the end of the circuit."))
+
+        num_qubits = body["num_qubits"]
+        state = self.statevector(num_qubits, body["operations"])
+        return {"measurements": self.top_k(state, num_qubits, measurements, body.get("topK", 20))}
+
+    def expectation(self, body, paulis):
+        """
+        Args:
+            body: A serialized circuit, its measurements are ignored
+            paulis: Pauli strings as (qubit, letter) tuples, see AutomatskiKomencoExpectation
+
+        Returns:
+            The exact expectation value of every Pauli string in the state the circuit prepares.
+        """
+        state = self.statevector(body["num_qubits"], body["operations"])
+        return statevector_expectations(state, paulis)
+
+    def statevector(self, num_qubits, operations):
+        if num_qubits > self.max_qubits:
+            raise(Exception(f"{num_qubits} qubits is more than the {self.max_qubits} the local statevector engine supports"))
+
+        state = np.zeros(2 ** num_qubits, dtype=np.complex128)
+        state[0] = 1.0
+        for operation in operations:
+            self.apply(state, num_qubits, operation["gate"], operation["params"], operation["qubits"])
+        return state
+
+    def apply(self, state, num_qubits, gate, params, qubits):
+        if gate not in GATES:
+            raise(Exception(f"gate or operation: '{gate}' is not supported by the local engine"))
+        for qubit in qubits:
+            if qubit < 0 or qubit >= num_qubits:
+                raise(Exception(f"invalid qubit: {qubit}"))
+
+        kind, build = GATES[gate]
+        if kind == "single":
+            q = qubits[0]
+            view = state.reshape(2 ** (num_qubits - 1 - q), 2, 2 ** q)
+            apply_on_axis(view, gate_matrix(gate, params), 1)
+        elif kind == "controlled":
+            tensor = state.reshape((2,) * num_qubits)
+            index = [slice(None)] * num_qubits
+            for control in qubits[:-1]:
+                index[num_qubits - 1 - control] = 1
+            # the controls are fixed to 1, what is left is a view where the target keeps its axis
+            target = num_qubits - 1 - qubits[-1]
+            axis = target - sum(1 for control in qubits[:-1] if num_qubits - 1 - control < target)
+            apply_on_axis(tensor[tuple(index)], build(gate, params), axis)
+        elif kind == "matrix":
+            self.apply_matrix(state, num_qubits, gate_matrix(gate, params, len(qubits)), qubits)
+        else:
+            self.apply_qft(state, num_qubits, qubits, gate == "iqft")
+
+    @staticmethod
+    def apply_matrix(state, num_qubits, U, qubits):
+        k = len(qubits)
+        tensor = state.reshape((2,) * num_qubits)
+        axes = [num_qubits - 1 - q for q in qubits]
+        result = np.tensordot(U.reshape((2,) * (2 * k)), tensor, axes=(list(range(k, 2 * k)), axes))
+        state[:] = np.moveaxis(result, list(range(k)), axes).reshape(-1)
+
+    @staticmethod
+    def apply_qft(state, num_qubits, qubits, inverse):
+        # qubits[0] is the least significant bit of the register the transform acts on
+        k = len(qubits)
+        tensor = state.reshape((2,) * num_qubits)
+        axes = [num_qubits - 1 - q for q in reversed(qubits)]
+        moved = np.moveaxis(tensor, axes, list(range(num_qubits - k, num_qubits)))
+        shape = moved.shape
+        flat = moved.reshape(-1, 2 ** k)
+        # QFT|j> = sum_k e^(2 pi i jk / N)|k> / sqrt(N), which is numpy's normalized inverse FFT
+        flat = np.fft.fft(flat, axis=1, norm="ortho") if inverse else np.fft.ifft(flat, axis=1, norm="ortho")
+        state[:] = np.moveaxis(flat.reshape(shape), list(range(num_qubits - k, num_qubits)), axes).reshape(-1)
+
+    @staticmethod
+    def probabilities(state, num_qubits, measurements):
+        """
+        Returns:
+            The marginal distribution of the measured qubits as an array indexed by the
+            outcome, bit k of the index being measurements[k].
+        """
+        probs = (state.real ** 2 + state.imag ** 2).reshape((2,) * num_qubits)
+
+        measured = []
+        for qubit in measurements:
+            if qubit not in measured:
+                measured.append(qubit)
+        others = tuple(num_qubits - 1 - q for q in range(num_qubits) if q not in measured)
+        marginal = probs.sum(axis=others) if others else probs
+
+        # remaining axes are in decreasing qubit order, reorder them to the measurement order
+        remaining = sorted(measured, reverse=True)
+        if len(measured) != len(measurements):
+            return StatevectorEngine.expand_duplicates(marginal, remaining, measurements)
+        order = [remaining.index(qubit) for qubit in reversed(measurements)]
+        return marginal.transpose(order).reshape(-1)
+
+    @staticmethod
+    def expand_duplicates(marginal, remaining, measurements):
+        # a qubit measured twice gives the same bit in both places
+        outcomes = np.zeros(2 ** len(measurements))
+        for index in np.ndindex(marginal.shape):
+            bits = dict(zip(remaining, index))
+            outcome = sum(bits[qubit] << k for k, qubit in enumerate(measurements))
+            outcomes[outcome] += marginal[index]
+        return outcomes
+
+    @staticmethod
+    def top_k(state, num_qubits, measurements, topK):
+        probs = StatevectorEngine.probabilities(state, num_qubits, measurements)
+        count = min(topK, probs.size)
+        top = np.argpartition(-probs, count - 1)[:count] if count < probs.size else np.arange(probs.size)
+        top = top[np.argsort(-probs[top], kind="stable")]
+
+        width = len(measurements)
+        result = {}
+        for outcome in top.tolist():
+            p = float(probs[outcome])
+            if p <= 1e-15:
+                break
+            result[format(outcome, f"0{width}b")] = p
+        return result
+
+
+class AutomatskiKomencoLocalTransport:
+    """
+    A drop-in replacement for AutomatskiKomencoTransport that runs the circuits in-process.
+
+    Pass it as transport= to any of the Komenco clients, e.g.
+    AutomatskiKomencoNative(host=None, port=None, transport=AutomatskiKomencoLocalTransport()).
+    Engine errors come back as {"error": ...} like they do from the server.
+    """
+
+    def __init__(self, engine=None, workers=None):
+        self.engine = engine if engine is not None else StatevectorEngine()
+        self.url = f"local://{type(self.engine).__name__}"
+        self.pool_size = workers or os.cpu_count() or 1
+        self.batch_supported = True
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def post(self, body, timings=None):
+        # there is no connection, the whole simulation is the server phase
+        try:
+            with Phase(timings, "server"):
+                return self.engine.execute(body)
+        except Exception as e:
+            return {"error": str(e)}
+
+    def post_batch(self, bodies, timings=None):
+        return {"results": [self.post(body, timings) for body in bodies]}
+
+    def post_many(self, bodies, timings=None):
+        return [self.post(body, timings) for body in bodies]
+
+    async def post_async(self, body, timings=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.get_executor(), self.post, body, timings)
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="komenco-local")
+            return self.executor
+
+    def grow(self, pool_size):
+        # simulations are CPU bound, more workers than cores would not help
+        pass
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
@@ -0,0 +1,186 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from AutomatskiKomencoWire import CONTENT_TYPE, decode_circuit, encode_result, decode_batch, encode_results
+from AutomatskiKomencoWire import zstandard, compression_level, compress, decompress
+import json
+import threading
+import time
+
+
+class KomencoRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that clients can keep their connections alive
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length)
+        self.server.transfer(len(data))
+
+        encoding = self.headers.get("Content-Encoding", "identity")
+        if encoding != "identity":
+            if not self.server.compression:
+                self.send_error(415)
+                return
+            try:
+                data = decompress(data, encoding)
+            except Exception:
+                self.send_error(415)
+                return
+
+        single = self.path == "/api/komenco"
+        if not single and not (self.path == "/api/komenco/batch" and self.server.batch):
+            self.send_error(404)
+            return
+
+        binary = self.headers.get("Content-Type", "").startswith(CONTENT_TYPE)
+        if binary:
+            if not self.server.binary:
+                self.send_error(415)
+                return
+            try:
+                bodies = [decode_circuit(data)[0]] if single else decode_batch(data)
+            except Exception:
+                self.send_error(400)
+                return
+        else:
+            bodies = [json.loads(data)] if single else json.loads(data)["circuits"]
+
+        tstart = time.perf_counter()
+        structs = [self.server.execute(body) for body in bodies]
+        # reported in a Server-Timing header so clients can tell server time from network time
+        self.executeTime = time.perf_counter() - tstart
+
+        # answer in the binary format if the client asked in it and accepts it, errors go as JSON
+        if binary and CONTENT_TYPE in self.headers.get("Accept", ""):
+            encoded = encode_result(structs[0]) if single else encode_results(structs)
+            if encoded is not None:
+                self.reply_binary(encoded)
+                return
+
+        self.reply(structs[0] if single else {"results": structs})
+
+    def reply(self, struct):
+        self.send_body(json.dumps(struct).encode("utf-8"), "application/json")
+
+    def reply_binary(self, data):
+        self.send_body(data, CONTENT_TYPE)
+
+    def send_body(self, data, contentType):
+        # large responses are compressed with what the client accepts
+        accepted = [encoding.split(";")[0].strip() for encoding in self.headers.get("Accept-Encoding", "").split(",")]
+        encoding = None
+        if self.server.compression:
+            if "zstd" in accepted and zstandard is not None:
+                encoding = "zstd"
+            elif "gzip" in accepted:
+                encoding = "gzip"
+        level = compression_level(encoding, len(data)) if encoding else None
+
+        self.send_response(200)
+        self.send_header("Content-Type", contentType)
+        if level is not None:
+            data = compress(data, encoding, level)
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Server-Timing", f"execute;dur={self.executeTime * 1e3:.3f}")
+        self.end_headers()
+        self.server.transfer(len(data))
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AutomatskiKomencoLocalServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the /api/komenco endpoint.
+
+    It speaks the same protocol as the remote server so the clients can be exercised and
+    benchmarked offline. Given an engine (e.g. StatevectorEngine) it really runs the circuits,
+    without one it does not simulate anything: every measured qubit reads 0 with probability 1.
+    latency (in seconds) is added to every request to mimic server work.
+    With batch=False the /api/komenco/batch endpoint answers 404, like a server that
+    predates batch support. It understands the AutomatskiKomencoWire binary format unless
+    binary=False, in which case binary requests are answered 415. Compressed requests
+    (gzip, or zstd with zstandard installed) are taken and large responses compressed unless
+    compression=False. bandwidth (bytes per second) adds the time the request and response
+    bodies would take on a link that slow.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, batch=True, engine=None, binary=True, compression=True, bandwidth=None):
+        super().__init__((host, port), KomencoRequestHandler)
+        self.host = host
+        self.port = self.server_address[1]
+        self.latency = latency
+        self.batch = batch
+        self.binary = binary
+        self.compression = compression
+        self.bandwidth = bandwidth
+        self.engine = engine
+        self.requests = 0
+        self.thread = None
+
+    def execute(self, body):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.engine is not None:
+            try:
+                return self.engine.execute(body)
+            except Exception as e:
+                return {"error": str(e)}
+
+        measurements = body.get("measurements", [])
+        if len(measurements) == 0:
+            return {"error": "There are no measurements done at the end of the circuit."}
+
+        return {"measurements": {"0" * len(measurements): 1.0}}
+
+    def transfer(self, size):
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Komenco /api/komenco endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--no-batch", action="store_true", help="answer 404 on /api/komenco/batch")
+    parser.add_argument("--no-binary", action="store_true", help="answer 415 to requests in the binary wire format")
+    parser.add_argument("--no-compression", action="store_true", help="answer 415 to compressed requests and never compress responses")
+    parser.add_argument("--bandwidth", type=float, default=None, help="simulated link speed in bytes per second")
+    parser.add_argument("--simulate", action="store_true", help="run the circuits on the local statevector engine")
+    args = parser.parse_args()
+
+    engine = None
+    if args.simulate:
+        from AutomatskiKomencoLocal import StatevectorEngine
+        engine = StatevectorEngine()
+
+    server = AutomatskiKomencoLocalServer(args.host, args.port, args.latency, not args.no_batch, engine, not args.no_binary,
+                                          not args.no_compression, args.bandwidth)
+    print(f"Komenco stand-in server listening on http://{server.host}:{server.port}/api/komenco")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
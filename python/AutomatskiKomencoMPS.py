@@ -0,0 +1,325 @@
+from AutomatskiKomencoLocal import gate_matrix, X, Y, Z
+import numpy as np
+
+# the largest bond dimension kept after a gate, and the share of the weight (the sum of the
+# squared singular values) that may be dropped at every split
+DEFAULT_MAX_BOND = 64
+DEFAULT_CUTOFF = 1e-12
+# how many bitstrings are sampled to find the topK outcomes
+DEFAULT_SAMPLES = 1000
+
+PAULI_MATRICES = {"X": X, "Y": Y, "Z": Z}
+SWAP = gate_matrix("swap", [], 2)
+
+
+def qft_operations(qubits, inverse=False):
+    """
+    The (gate, params, qubits) of a qft (or iqft) on qubits as h, cp and swap gates, qubits[0]
+    being the least significant bit of the register like in StatevectorEngine.apply_qft.
+    """
+    k = len(qubits)
+    operations = []
+    for j in reversed(range(k)):
+        operations.append(("h", [], [qubits[j]]))
+        for m in reversed(range(j)):
+            operations.append(("cp", [np.pi / 2 ** (j - m)], [qubits[j], qubits[m]]))
+    for j in range(k // 2):
+        operations.append(("swap", [], [qubits[j], qubits[k - 1 - j]]))
+    if not inverse:
+        return operations
+    # the inverse runs the same gates backwards with the phases negated
+    return [(gate, [-param for param in params], gateQubits) for gate, params, gateQubits in reversed(operations)]
+
+
+class MatrixProductState:
+    """
+    An n qubit state as a chain of (left bond, 2, right bond) tensors, one per site.
+
+    The state is kept in mixed canonical form: every tensor left of center is a left isometry
+    and every one right of it a right isometry, so a split at the center is an optimal
+    truncation. Gates act on adjacent sites, the qubits of a distant gate are brought next to
+    each other by swaps. The swaps are not undone, qubit q simply lives on site position[q].
+
+    Every split keeps at most max_bond singular values and drops the smallest ones as long as
+    their weight stays under cutoff. The dropped weights add up to truncation_error, a bound on
+    the infidelity of the state, and fidelity is the product of the weights kept.
+    """
+
+    def __init__(self, num_qubits, max_bond=DEFAULT_MAX_BOND, cutoff=DEFAULT_CUTOFF):
+        self.num_qubits = num_qubits
+        self.max_bond = max_bond
+        self.cutoff = cutoff
+        zero = np.zeros((1, 2, 1), dtype=np.complex128)
+        zero[0, 0, 0] = 1.0
+        self.tensors = [zero.copy() for q in range(num_qubits)]
+        self.center = 0
+        # qubit -> site and site -> qubit
+        self.position = list(range(num_qubits))
+        self.qubits = list(range(num_qubits))
+        self.truncation_error = 0.0
+        self.fidelity = 1.0
+        self.swaps = 0
+        self.memory = sum(tensor.nbytes for tensor in self.tensors)
+        self.peak_memory = self.memory
+
+    @property
+    def bond_dimensions(self):
+        return [tensor.shape[2] for tensor in self.tensors[:-1]]
+
+    def stats(self):
+        return {"max_bond": max(self.bond_dimensions, default=1), "truncation_error": self.truncation_error,
+                "fidelity": self.fidelity, "memory_bytes": self.memory, "peak_memory_bytes": self.peak_memory,
+                "swaps": self.swaps}
+
+    def set_tensor(self, site, tensor):
+        self.memory += tensor.nbytes - self.tensors[site].nbytes
+        self.peak_memory = max(self.peak_memory, self.memory)
+        self.tensors[site] = tensor
+
+    def apply(self, gate, params, qubits):
+        for qubit in qubits:
+            if qubit < 0 or qubit >= self.num_qubits:
+                raise(Exception(f"invalid qubit: {qubit}"))
+        if gate in ("qft", "iqft"):
+            for operation in qft_operations(qubits, gate == "iqft"):
+                self.apply(*operation)
+            return
+        U = gate_matrix(gate, params, len(qubits))
+        if len(qubits) == 1:
+            site = self.position[qubits[0]]
+            self.tensors[site] = np.einsum("ij,ajb->aib", U, self.tensors[site])
+            return
+
+        start = self.gather(qubits)
+        # the matrix has the first qubit of the gate most significant, the block the first site
+        k = len(qubits)
+        order = sorted(range(k), key=lambda i: self.position[qubits[i]])
+        U = U.reshape((2,) * (2 * k)).transpose(order + [k + i for i in order]).reshape(2 ** k, 2 ** k)
+        self.apply_block(start, U)
+
+    def gather(self, qubits):
+        """
+        Swaps the qubits next to the median one of them.
+
+        Returns:
+            The first site of the block of len(qubits) sites they now occupy.
+        """
+        sites = sorted(self.position[qubit] for qubit in qubits)
+        middle = len(sites) // 2
+        start = sites[middle] - middle
+        # the closest ones first, so nothing moves through a site another qubit of the gate is on
+        for i in reversed(range(middle)):
+            for site in range(sites[i], start + i):
+                self.swap(site)
+        for i in range(middle + 1, len(sites)):
+            for site in reversed(range(start + i, sites[i])):
+                self.swap(site)
+        return start
+
+    def swap(self, site):
+        # exchanges the qubits on site and site + 1
+        self.apply_block(site, SWAP)
+        left, right = self.qubits[site], self.qubits[site + 1]
+        self.qubits[site], self.qubits[site + 1] = right, left
+        self.position[left], self.position[right] = site + 1, site
+        self.swaps += 1
+
+    def apply_block(self, start, U):
+        # U acts on the adjacent sites start, start + 1, ..., the first one most significant
+        k = U.shape[0].bit_length() - 1
+        self.move_center(start)
+        theta = self.tensors[start]
+        for site in range(start + 1, start + k):
+            theta = np.tensordot(theta, self.tensors[site], axes=(-1, 0))
+        left, right = theta.shape[0], theta.shape[-1]
+        theta = np.einsum("ij,ajb->aib", U, theta.reshape(left, 2 ** k, right))
+
+        # split off one site at a time, the singular values move on to the right
+        for site in range(start, start + k - 1):
+            matrix = theta.reshape(left * 2, -1)
+            u, s, vh = np.linalg.svd(matrix, full_matrices=False)
+            keep = self.truncate(s)
+            self.set_tensor(site, u[:, :keep].reshape(left, 2, keep))
+            theta = (s[:keep, None] * vh[:keep]).reshape(keep, -1, right)
+            left = keep
+        self.set_tensor(start + k - 1, theta.reshape(left, 2, right))
+        self.center = start + k - 1
+
+    def truncate(self, s):
+        """
+        Returns:
+            How many singular values to keep, the weight of the others is added to the
+            truncation error and the kept ones are renormalized in place.
+        """
+        weights = s ** 2
+        total = weights.sum()
+        if total == 0:
+            return 1
+        # tail[i] is the share of the weight of the singular values from i on
+        tail = np.cumsum(weights[::-1])[::-1] / total
+        keep = min(max(1, int(np.count_nonzero(tail > self.cutoff))), self.max_bond)
+        if keep < len(s):
+            discarded = float(tail[keep])
+            self.truncation_error += discarded
+            self.fidelity *= 1.0 - discarded
+            s[:keep] /= np.sqrt(1.0 - discarded)
+        return keep
+
+    def move_center(self, site):
+        while self.center < site:
+            tensor = self.tensors[self.center]
+            left, right = tensor.shape[0], tensor.shape[2]
+            q, r = np.linalg.qr(tensor.reshape(left * 2, right))
+            self.set_tensor(self.center, q.reshape(left, 2, -1))
+            self.set_tensor(self.center + 1, np.tensordot(r, self.tensors[self.center + 1], axes=(1, 0)))
+            self.center += 1
+        while self.center > site:
+            tensor = self.tensors[self.center]
+            left, right = tensor.shape[0], tensor.shape[2]
+            q, r = np.linalg.qr(tensor.reshape(left, 2 * right).T)
+            self.set_tensor(self.center, q.T.reshape(-1, 2, right))
+            self.set_tensor(self.center - 1, np.tensordot(self.tensors[self.center - 1], r.T, axes=(2, 0)))
+            self.center -= 1
+
+    def sample(self, shots, last, rng):
+        """
+        Samples the sites 0..last, one site at a time: with every tensor right of site 0 a right
+        isometry the squared norm of a contracted prefix is its marginal probability, so no
+        probability vector is ever formed and nothing right of last is touched.
+
+        Returns:
+            A (shots, last + 1) uint8 matrix of site values.
+        """
+        self.move_center(0)
+        bits = np.zeros((shots, last + 1), dtype=np.uint8)
+        vectors = np.ones((shots, 1), dtype=np.complex128)
+        for site in range(last + 1):
+            tensor = self.tensors[site]
+            zero = vectors @ tensor[:, 0, :]
+            one = vectors @ tensor[:, 1, :]
+            p0 = np.einsum("ij,ij->i", zero, zero.conj()).real
+            p1 = np.einsum("ij,ij->i", one, one.conj()).real
+            bit = rng.random(shots) * (p0 + p1) < p1
+            bits[:, site] = bit
+            vectors = np.where(bit[:, None], one, zero) / np.sqrt(np.where(bit, p1, p0))[:, None]
+        return bits
+
+    def marginals(self, bits, sites):
+        """
+        Returns:
+            The exact probability of every row of bits, the values of the given sites with the
+            other sites summed over.
+        """
+        self.move_center(0)
+        last = max(sites)
+        column = {site: j for j, site in enumerate(sites)}
+        if len(column) == last + 1:
+            # a measured prefix, the squared norm of its amplitude vector is its probability
+            vectors = np.ones((len(bits), 1), dtype=np.complex128)
+            for site in range(last + 1):
+                vectors = np.einsum("ca,cab->cb", vectors, self.tensors[site][:, bits[:, column[site]], :].transpose(1, 0, 2))
+            return np.einsum("ij,ij->i", vectors, vectors.conj()).real
+
+        # from the right, where everything past the last measured site contracts to the identity
+        environment = np.broadcast_to(np.eye(self.tensors[last].shape[2], dtype=np.complex128), (len(bits),) + (self.tensors[last].shape[2],) * 2)
+        for site in reversed(range(last + 1)):
+            tensor = self.tensors[site]
+            if site in column:
+                chosen = tensor[:, bits[:, column[site]], :].transpose(1, 0, 2)
+                environment = np.einsum("cab,cbd,ced->cae", chosen, environment, chosen.conj())
+            else:
+                environment = np.einsum("asb,cbd,esd->cae", tensor, environment, tensor.conj())
+        return environment[:, 0, 0].real
+
+    def top_k(self, measurements, topK, shots, rng):
+        """
+        Returns:
+            {bitstring: probability} of the topK most likely of the sampled outcomes, the
+            probabilities computed exactly on the state, not counted from the samples.
+        """
+        measured = list(dict.fromkeys(measurements))
+        sites = [self.position[qubit] for qubit in measured]
+        samples = self.sample(shots, max(sites), rng)[:, sites]
+        candidates, counts = np.unique(samples, axis=0, return_counts=True)
+        probabilities = self.marginals(candidates, sites)
+
+        order = np.lexsort((-counts, -probabilities))[:topK]
+        column = {qubit: j for j, qubit in enumerate(measured)}
+        bits = candidates[order][:, [column[qubit] for qubit in reversed(measurements)]]
+        width = len(measurements)
+        text = (bits + ord("0")).astype(np.uint8).tobytes().decode("ascii")
+        return {text[i * width:(i + 1) * width]: float(probabilities[j]) for i, j in enumerate(order)}
+
+    def expectation(self, pauli):
+        # <psi|P|psi> contracted from the right, past the last site of P the environment is the identity
+        if not pauli:
+            return 1.0
+        self.move_center(0)
+        operators = {self.position[qubit]: PAULI_MATRICES[letter] for qubit, letter in pauli}
+        last = max(operators)
+        environment = np.eye(self.tensors[last].shape[2], dtype=np.complex128)
+        for site in reversed(range(last + 1)):
+            tensor = self.tensors[site]
+            if site in operators:
+                environment = np.einsum("ts,asb,bd,etd->ae", operators[site], tensor, environment, tensor.conj())
+            else:
+                environment = np.einsum("asb,bd,esd->ae", tensor, environment, tensor.conj())
+        return float(environment[0, 0].real)
+
+
+
+class MPSEngine:
+    """
+    An in-process simulator for /api/komenco payloads that keeps the state as a matrix product
+    state (see MatrixProductState), for circuits far wider than a statevector that do not build
+    up much entanglement, e.g. 1-D Trotter chains like QASMBench's ising_model_n500.
+
+    The topK outcomes come from sampling samples bitstrings one site at a time and ranking the
+    distinct ones by their exact probability. For flat distributions (more likely outcomes than
+    samples) they are the most likely outcomes that were sampled. Every result carries the stats
+    of the state under "mps": the largest bond dimension, the truncation error and fidelity,
+    the memory of the tensors and the number of swaps, a truncation_error well below the
+    probabilities of interest means the result can be trusted. The clients attach them to their
+    results like the timings, as result["mps"] or result.mps. qft and iqft are run as their
+    h, cp and swap gates (see qft_operations).
+
+    Pass it as engine= to AutomatskiKomencoLocalTransport or AutomatskiKomencoLocalServer.
+    """
+
+    def __init__(self, max_bond=DEFAULT_MAX_BOND, cutoff=DEFAULT_CUTOFF, samples=DEFAULT_SAMPLES, seed=None):
+        self.max_bond = max_bond
+        self.cutoff = cutoff
+        self.samples = samples
+        self.rng = np.random.default_rng(seed)
+
+    def execute(self, body):
+        """
+        Args:
+            body: A serialized circuit as produced by serialize_circuit
+
+        Returns:
+            {"measurements": {bitstring: probability}, "mps": stats} with the topK outcomes of
+            the measured qubits, the first measured qubit being the rightmost bit.
+        """
+        measurements = body["measurements"]
+        if len(measurements) == 0:
+            raise(Exception("There are no measurements done at the end of the circuit."))
+
+        state = self.state(body["num_qubits"], body["operations"])
+        result = state.top_k(measurements, body.get("topK", 20), self.samples, self.rng)
+        return {"measurements": result, "mps": state.stats()}
+
+    def expectation(self, body, paulis):
+        """
+        Returns:
+            The expectation value of every Pauli string (see AutomatskiKomencoExpectation), exact
+            up to the truncation of the state.
+        """
+        state = self.state(body["num_qubits"], body["operations"])
+        return np.array([state.expectation(pauli) for pauli in paulis])
+
+    def state(self, num_qubits, operations):
+        state = MatrixProductState(num_qubits, self.max_bond, self.cutoff)
+        for operation in operations:
+            state.apply(operation["gate"], operation["params"], operation["qubits"])
+        return state
@@ -0,0 +1,150 @@
+from itertools import chain, repeat
+import numpy as np
+
+# missing probabilities in the compared distribution are replaced by this in the KL divergence
+KL_EPSILON = 1e-10
+
+
+def align(distributions, support=None):
+    """
+    Puts many {bitstring: count or probability} dictionaries on one shared support.
+
+    The keys are mapped to column indices once and every dictionary is scattered into a row of
+    a dense matrix in a single step, each row normalized to sum to 1 (rows without any mass
+    stay 0). Counts and probabilities can be mixed.
+
+    Args:
+        distributions: A list of dictionaries
+        support: The bitstrings to use as columns, by default the union of all the keys in the
+            order they are first seen. Mass on bitstrings outside of it is dropped after the
+            normalization.
+
+    Returns:
+        The (len(distributions), len(support)) matrix and the support.
+    """
+    distributions = list(distributions)
+    lengths = [len(distribution) for distribution in distributions]
+    size = sum(lengths)
+    rows = np.repeat(np.arange(len(distributions)), lengths)
+    if support is None:
+        # every key is in the support, the index can be looked up directly
+        index = dict(zip(dict.fromkeys(chain.from_iterable(distributions)), range(size)))
+        support = list(index)
+        columns = np.fromiter(map(index.__getitem__, chain.from_iterable(distributions)), dtype=np.intp, count=size)
+    else:
+        support = list(support)
+        index = {bitstring: column for column, bitstring in enumerate(support)}
+        columns = np.fromiter(map(index.get, chain.from_iterable(distributions), repeat(-1)), dtype=np.intp, count=size)
+    values = np.fromiter(chain.from_iterable(distribution.values() for distribution in distributions), dtype=np.float64, count=size)
+
+    totals = np.bincount(rows, weights=values, minlength=len(distributions))
+    matrix = np.zeros((len(distributions), len(support)))
+    inside = columns >= 0
+    matrix[rows[inside], columns[inside]] = values[inside]
+    np.divide(matrix, totals[:, None], out=matrix, where=totals[:, None] > 0)
+    return matrix, support
+
+
+def kl_divergence(p, q, epsilon=KL_EPSILON):
+    """
+    KL(p || q) along the last axis of aligned distributions, p and q broadcast against each
+    other (e.g. one reference row against a matrix of results).
+
+    Args:
+        epsilon: What a probability missing from q counts as, 0 makes those divergences inf
+    """
+    p, q = np.broadcast_arrays(np.asarray(p, dtype=np.float64), np.asarray(q, dtype=np.float64))
+    with np.errstate(divide="ignore"):
+        terms = np.where(p > 0, p * (np.log(p, where=p > 0, out=np.zeros_like(p)) - np.log(np.maximum(q, epsilon))), 0.0)
+    return terms.sum(axis=-1)
+
+
+def js_divergence(p, q):
+    """
+    The Jensen-Shannon divergence along the last axis, in nats (0 to ln 2).
+    """
+    p, q = np.broadcast_arrays(np.asarray(p, dtype=np.float64), np.asarray(q, dtype=np.float64))
+    m = (p + q) / 2
+    logm = np.log(m, where=m > 0, out=np.zeros_like(m))
+    pterms = np.where(p > 0, p * (np.log(p, where=p > 0, out=np.zeros_like(p)) - logm), 0.0)
+    qterms = np.where(q > 0, q * (np.log(q, where=q > 0, out=np.zeros_like(q)) - logm), 0.0)
+    return np.maximum((pterms.sum(axis=-1) + qterms.sum(axis=-1)) / 2, 0.0)
+
+
+def hellinger_fidelity(p, q):
+    """
+    The Hellinger fidelity (sum sqrt(p q))^2 along the last axis, 1 for equal distributions.
+    """
+    return np.sqrt(np.asarray(p, dtype=np.float64) * np.asarray(q, dtype=np.float64)).sum(axis=-1) ** 2
+
+
+def total_variation(p, q):
+    """
+    The total variation distance along the last axis, 0 to 1.
+    """
+    return np.abs(np.asarray(p, dtype=np.float64) - np.asarray(q, dtype=np.float64)).sum(axis=-1) / 2
+
+
+def heavy_outputs(ideal, num_qubits):
+    """
+    The heavy outputs of an ideal distribution, the bitstrings more likely than the median of
+    all 2**num_qubits outcomes. The outcomes off the support count as probability 0, so a
+    top-K ideal distribution gives the exact median as long as the ones it leaves out are
+    (near) 0.
+
+    Returns:
+        A boolean mask over the support.
+    """
+    ideal = np.asarray(ideal, dtype=np.float64)
+    outcomes = 2 ** num_qubits
+    zeros = outcomes - ideal.size
+    if zeros < 0:
+        raise(Exception(f"the support has {ideal.size} bitstrings, more than the {outcomes} outcomes of {num_qubits} qubits"))
+
+    values = np.sort(ideal)
+
+    def ranked(k):
+        # the k-th smallest of all the outcomes
+        return 0.0 if k < zeros else values[k - zeros]
+
+    if outcomes % 2:
+        median = ranked(outcomes // 2)
+    else:
+        median = (ranked(outcomes // 2 - 1) + ranked(outcomes // 2)) / 2
+    return ideal > median
+
+
+def heavy_output_probability(ideal, measured, num_qubits):
+    """
+    The probability that measured gives a heavy output of ideal (see heavy_outputs), along the
+    last axis of measured.
+    """
+    return np.asarray(measured, dtype=np.float64)[..., heavy_outputs(ideal, num_qubits)].sum(axis=-1)
+
+
+def score(reference, distributions, epsilon=KL_EPSILON, num_qubits=None):
+    """
+    Scores a batch of results against a reference distribution (e.g. the ideal one of a
+    simulator), aligning them once and computing every metric for the whole batch.
+
+    Args:
+        reference: A {bitstring: count or probability} dictionary
+        distributions: A list of {bitstring: count or probability} dictionaries
+        epsilon: See kl_divergence
+        num_qubits: The number of measured qubits, by default the length of the bitstrings
+
+    Returns:
+        {"kl": ..., "js": ..., "hellinger_fidelity": ..., "total_variation": ...,
+        "heavy_output_probability": ...}, each an array with one value per distribution.
+    """
+    matrix, support = align(chain([reference], distributions))
+    p, q = matrix[0], matrix[1:]
+    if num_qubits is None:
+        num_qubits = len(support[0]) if support else 0
+    return {
+        "kl": kl_divergence(p, q, epsilon),
+        "js": js_divergence(p, q),
+        "hellinger_fidelity": hellinger_fidelity(p, q),
+        "total_variation": total_variation(p, q),
+        "heavy_output_probability": heavy_output_probability(p, q, num_qubits),
+    }
@@ -1,7 +1,20 @@
-import requests
+from AutomatskiKomencoClient import AutomatskiKomencoClient
+from array import array
 import numpy as np
 import random
-import datetime 
+
+# the number of qubits of every gate with a fixed one, as checked by single, double and triple
+GATE_QUBITS = {
+    "id": 1, "x": 1, "y": 1, "z": 1, "h": 1, "s": 1, "sdg": 1, "t": 1, "tdg": 1, "rx": 1, "ry": 1,
+    "rz": 1, "u": 1, "u1": 1, "u2": 1, "u3": 1, "sx": 1, "sxdg": 1, "r": 1, "p": 1, "sqrt_x": 1,
+    "sqrt_y": 1, "sqrt_z": 1, "gpi": 1, "gpi2": 1, "xp": 1, "yp": 1, "zp": 1, "phased_xp": 1,
+    "phased_yp": 1, "phased_zp": 1,
+    "cx": 2, "cy": 2, "cz": 2, "ch": 2, "ucrx": 2, "ucry": 2, "ucrz": 2, "crx": 2, "cry": 2,
+    "crz": 2, "cr": 2, "cu1": 2, "cu2": 2, "cu3": 2, "dcx": 2, "ecr": 2, "iswap": 2, "rxx": 2,
+    "ryy": 2, "rzz": 2, "rzx": 2, "swap": 2, "csx": 2, "cp": 2, "xxp": 2, "yyp": 2, "zzp": 2,
+    "cnotp": 2, "cyp": 2, "czp": 2,
+    "cswap": 3, "ccx": 3, "ccy": 3, "ccz": 3, "ccp": 3, "ccnotp": 3, "ccyp": 3, "cczp": 3,
+}
 
 class QuantumCircuit:
     
@@ -10,13 +23,16 @@ class QuantumCircuit:
         self.measurements = []
         self.operations = []
 
+    def append_operation(self, cgate, cparams, cqubits):
+        self.operations.append([cgate, cparams, cqubits])
+
     def single(self, cgate, cparams, cqubits):
         if len(cqubits) != 1:
             raise(Exception(f"number of qubits for gate: {cgate} has to be one"))
         for qubit in cqubits:
             if qubit < 0 or qubit >= self.num_qubits:
                 raise(Exception(f"invalid qubit: {qubit}"))       
-        self.operations.append([cgate, cparams, cqubits])
+        self.append_operation(cgate, cparams, cqubits)
         
     def double(self, cgate, cparams, cqubits):
         if len(cqubits) != 2:
@@ -24,7 +40,7 @@ class QuantumCircuit:
         for qubit in cqubits:
             if qubit < 0 or qubit >= self.num_qubits:
                 raise(Exception(f"invalid qubit: {qubit}"))       
-        self.operations.append([cgate, cparams, cqubits])
+        self.append_operation(cgate, cparams, cqubits)
 
     def triple(self, cgate, cparams, cqubits):
         if len(cqubits) != 3:
@@ -32,13 +48,13 @@ class QuantumCircuit:
         for qubit in cqubits:
             if qubit < 0 or qubit >= self.num_qubits:
                 raise(Exception(f"invalid qubit: {qubit}"))       
-        self.operations.append([cgate, cparams, cqubits])       
+        self.append_operation(cgate, cparams, cqubits)       
 
     def multiple(self, cgate, cparams, cqubits):
         for qubit in cqubits:
             if qubit < 0 or qubit >= self.num_qubits:
                 raise(Exception(f"invalid qubit: {qubit}"))       
-        self.operations.append([cgate, cparams, cqubits])  
+        self.append_operation(cgate, cparams, cqubits)  
 
         
     def id(self, qubit1):
@@ -308,7 +324,7 @@ class QuantumCircuit:
                     raise(Exception(f"invalid qubit: {qubit}"))
                 else:    
                     cqubits.append(qubit)                
-        self.operations.append([cgate, cparams, cqubits])
+        self.append_operation(cgate, cparams, cqubits)
 
     def measure_all(self):
         cparams=[]
@@ -316,8 +332,74 @@ class QuantumCircuit:
         cgate="measure"
         for qubit in range(self.num_qubits):
             cqubits.append(qubit)                
-        self.operations.append([cgate, cparams, cqubits])        
-        
+        self.append_operation(cgate, cparams, cqubits)        
+        
+    def append_many(self, cgate, cparams, cqubits):
+        """
+        Append many gates of the same kind in one step.
+
+        The qubits (and params) are validated as whole NumPy arrays instead of gate by gate.
+
+        Args:
+            cgate: The gate name, e.g. "rx"
+            cparams: None for gates without params, one param per gate (shape m) or
+                     one row of params per gate (shape m x p)
+            cqubits: One qubit per gate (shape m) or one row of qubits per gate (shape m x k)
+        """
+        qubits = np.asarray(cqubits)
+        if qubits.ndim == 1:
+            qubits = qubits.reshape(-1, 1)
+        if qubits.ndim != 2:
+            raise(Exception(f"qubits for gate: {cgate} have to be a 1-D or 2-D array"))
+        if qubits.size and not np.issubdtype(qubits.dtype, np.integer):
+            raise(Exception(f"qubits for gate: {cgate} have to be integers"))
+        count = qubits.shape[0]
+        if count and cgate in GATE_QUBITS and qubits.shape[1] != GATE_QUBITS[cgate]:
+            raise(Exception(f"number of qubits for gate: {cgate} has to be {GATE_QUBITS[cgate]} but got {qubits.shape[1]}"))
+
+        if cparams is None:
+            params = np.empty((count, 0))
+        else:
+            params = np.asarray(cparams, dtype=np.float64)
+            if params.ndim == 1:
+                params = params.reshape(-1, 1)
+            if params.ndim != 2 or params.shape[0] != count:
+                raise(Exception(f"expected params for {count} gates: {cgate} but got shape {params.shape}"))
+
+        invalid = (qubits < 0) | (qubits >= self.num_qubits)
+        if invalid.any():
+            raise(Exception(f"invalid qubit: {qubits[invalid][0]}"))
+
+        self.extend_operations(cgate, params, qubits)
+
+    def extend_operations(self, cgate, params, qubits):
+        # params (m x p) and qubits (m x k) are already validated
+        self.operations.extend([cgate, cparams, cqubits] for cparams, cqubits in zip(params.tolist(), qubits.tolist()))
+
+    def h_layer(self, qubits):
+        self.append_many("h", None, qubits)
+
+    def x_layer(self, qubits):
+        self.append_many("x", None, qubits)
+
+    def rx_layer(self, thetas, qubits):
+        self.append_many("rx", thetas, qubits)
+
+    def ry_layer(self, thetas, qubits):
+        self.append_many("ry", thetas, qubits)
+
+    def rz_layer(self, thetas, qubits):
+        self.append_many("rz", thetas, qubits)
+
+    def cx_pairs(self, controls, targets):
+        self.append_many("cx", None, np.stack([np.asarray(controls), np.asarray(targets)], axis=1))
+
+    def cz_pairs(self, controls, targets):
+        self.append_many("cz", None, np.stack([np.asarray(controls), np.asarray(targets)], axis=1))
+
+    def rzz_pairs(self, thetas, qubits1, qubits2):
+        self.append_many("rzz", thetas, np.stack([np.asarray(qubits1), np.asarray(qubits2)], axis=1))
+
     
     def randomCircuit(self, numberOfOperations, qubitsToUseForRandomCircuit ):
         
@@ -378,64 +460,286 @@ class QuantumCircuit:
                 theta = random.uniform(0.0, 2*np.pi)
                 cparams.append(theta)
                 
-            self.operations.append([cgate, cparams, cqubits])   
-        
-        
-        
-class AutomatskiKomencoNative:
+            self.append_operation(cgate, cparams, cqubits)   
+
+
+class CompactOperations:
+    """
+    A read-only list-like view of the operations of a CompactQuantumCircuit.
+
+    Every item is built on access as the usual [name, params, qubits] list, nothing is kept.
+    """
+
+    def __init__(self, circuit):
+        self.circuit = circuit
+
+    def __len__(self):
+        return len(self.circuit.opcodes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("operation index out of range")
+        circuit = self.circuit
+        return [circuit.gateNames[circuit.opcodes[index]],
+                circuit.paramData[circuit.paramOffsets[index]:circuit.paramOffsets[index + 1]].tolist(),
+                circuit.qubitData[circuit.qubitOffsets[index]:circuit.qubitOffsets[index + 1]].tolist()]
+
+    def __iter__(self):
+        circuit = self.circuit
+        names = circuit.gateNames
+        qubitOffsets = circuit.qubitOffsets.tolist()
+        qubitData = circuit.qubitData.tolist()
+        paramOffsets = circuit.paramOffsets.tolist()
+        paramData = circuit.paramData.tolist()
+        for i, code in enumerate(circuit.opcodes.tolist()):
+            yield [names[code],
+                   paramData[paramOffsets[i]:paramOffsets[i + 1]],
+                   qubitData[qubitOffsets[i]:qubitOffsets[i + 1]]]
+
+    def append(self, operation):
+        cgate, cparams, cqubits = operation
+        self.circuit.append_operation(cgate, cparams, cqubits)
+
+
+class CompactQuantumCircuit(QuantumCircuit):
+    """
+    A QuantumCircuit that stores its operations in flat typed columns.
+
+    Gate names are interned into a per-circuit opcode table. Each operation costs one
+    opcode, two offsets and its raw qubit indices and float64 params, instead of three Python
+    lists. The gate methods are the same, and operations is a list-like view that rebuilds
+    the [name, params, qubits] lists on access. Use it for circuits with 10^5 gates or more.
+    """
+
+    def __init__(self, num_qubits):
+        self.gateNames = []
+        self.gateCodes = {}
+        self.clear()
+        super().__init__(num_qubits)
+
+    def clear(self):
+        self.opcodes = array('H')
+        self.qubitOffsets = array('I', [0])
+        self.qubitData = array('I')
+        self.paramOffsets = array('I', [0])
+        self.paramData = array('d')
+
+    @property
+    def operations(self):
+        return CompactOperations(self)
+
+    @operations.setter
+    def operations(self, operations):
+        self.clear()
+        for cgate, cparams, cqubits in operations:
+            self.append_operation(cgate, cparams, cqubits)
+
+    def opcode(self, cgate):
+        code = self.gateCodes.get(cgate)
+        if code is None:
+            code = len(self.gateNames)
+            self.gateNames.append(cgate)
+            self.gateCodes[cgate] = code
+        return code
+
+    def append_operation(self, cgate, cparams, cqubits):
+        self.opcodes.append(self.opcode(cgate))
+        self.qubitData.extend(cqubits)
+        self.qubitOffsets.append(len(self.qubitData))
+        self.paramData.extend(cparams)
+        self.paramOffsets.append(len(self.paramData))
+
+    def extend_operations(self, cgate, params, qubits):
+        # one bulk copy per column instead of one append per gate
+        count, arity = qubits.shape
+        self.opcodes.frombytes(np.full(count, self.opcode(cgate), dtype=np.uint16).tobytes())
+        self.qubitData.frombytes(np.ascontiguousarray(qubits, dtype=np.uint32).tobytes())
+        self.qubitOffsets.frombytes((self.qubitOffsets[-1] + arity * np.arange(1, count + 1, dtype=np.uint32)).tobytes())
+        self.paramData.frombytes(np.ascontiguousarray(params, dtype=np.float64).tobytes())
+        self.paramOffsets.frombytes((self.paramOffsets[-1] + params.shape[1] * np.arange(1, count + 1, dtype=np.uint32)).tobytes())
+
+    def columns(self):
+        """
+        Returns:
+            Copies of the columns as NumPy arrays: opcodes, qubit_offsets, qubits,
+            param_offsets and params. gate_names maps an opcode back to its gate.
+        """
+        return {
+            "gate_names": list(self.gateNames),
+            "opcodes": np.array(self.opcodes, dtype=np.uint16),
+            "qubit_offsets": np.array(self.qubitOffsets, dtype=np.uint32),
+            "qubits": np.array(self.qubitData, dtype=np.uint32),
+            "param_offsets": np.array(self.paramOffsets, dtype=np.uint32),
+            "params": np.array(self.paramData, dtype=np.float64),
+        }
+
+    def serialize_operations(self):
+        # the same operations/measurements split as serialize_circuit, straight off the columns
+        names = self.gateNames
+        measureCode = self.gateCodes.get("measure")
+        qubitOffsets = self.qubitOffsets.tolist()
+        qubitData = self.qubitData.tolist()
+        paramOffsets = self.paramOffsets.tolist()
+        paramData = self.paramData.tolist()
+
+        operations = []
+        measurements = []
+        for i, code in enumerate(self.opcodes.tolist()):
+            qubits = qubitData[qubitOffsets[i]:qubitOffsets[i + 1]]
+            if code == measureCode:
+                measurements.extend(qubits)
+            else:
+                operations.append({"gate": names[code], "params": paramData[paramOffsets[i]:paramOffsets[i + 1]], "qubits": qubits})
+        return operations, measurements
+
+
+
+class Parameter:
+    """
+    A symbolic parameter slot of a ParameterizedCircuit, e.g. rx(theta, 0).
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Parameter({self.name})"
+
+
+class ParameterizedCircuit(QuantumCircuit):
+    """
+    A QuantumCircuit whose gate params may be Parameter slots that are bound late.
+
+    The circuit is serialized once per topK into a template payload. bind() and bind_many()
+    then only patch the params of the operations that have slots: the bound payload shares
+    every other operation with the template, so the gate list is never walked again. The
+    bound payloads are plain /api/komenco payloads and can be passed to run, run_many and
+    run_batch of AutomatskiKomencoNative instead of a circuit.
+    """
+
+    def __init__(self, num_qubits):
+        super().__init__(num_qubits)
+        self.parameters = []
+        self.parameterIndex = {}
+        self.templates = {}
+
+    def append_operation(self, cgate, cparams, cqubits):
+        for param in cparams:
+            if isinstance(param, Parameter) and param not in self.parameterIndex:
+                self.parameterIndex[param] = len(self.parameters)
+                self.parameters.append(param)
+        self.templates.clear()
+        super().append_operation(cgate, cparams, cqubits)
+
+    def extend_operations(self, cgate, params, qubits):
+        # the bulk builders (h_layer, cx_pairs, append_many, ...) take float params, so they add no slots
+        self.templates.clear()
+        super().extend_operations(cgate, params, qubits)
+
+    def template(self, topK=20):
+        """
+        Returns:
+            The template payload for topK and its slots: one (operation index, gate, params
+            with None in the slots, qubits, [(param position, parameter index)]) per operation
+            that has a Parameter.
+        """
+        if topK in self.templates:
+            return self.templates[topK]
+
+        operations = []
+        measurements = []
+        slots = []
+        for cgate, cparams, cqubits in self.operations:
+            if cgate == 'measure':
+                measurements.extend(cqubits)
+                continue
+            positions = [(position, self.parameterIndex[param]) for position, param in enumerate(cparams) if isinstance(param, Parameter)]
+            params = [None if isinstance(param, Parameter) else param for param in cparams]
+            if positions:
+                slots.append((len(operations), cgate, params, list(cqubits), positions))
+            operations.append({"gate": cgate, "params": params, "qubits": list(cqubits)})
+
+        if len(measurements) == 0:
+            raise(Exception("There are no measurements done at the end of the circuit."))
+
+        body = {"num_qubits": self.num_qubits, "operations": operations, "measurements": measurements, "topK": topK}
+        self.templates[topK] = (body, slots)
+        return body, slots
+
+    def bind(self, values, topK=20):
+        """
+        Args:
+            values: One value per entry of self.parameters (in that order), or a dict keyed
+                    by Parameter or parameter name
+            topK: The topK of the payload
+
+        Returns:
+            The bound /api/komenco payload.
+        """
+        if isinstance(values, dict):
+            values = [values[param] if param in values else values[param.name] for param in self.parameters]
+        return self.bind_many([values], topK)[0]
+
+    def bind_many(self, matrix, topK=20):
+        """
+        Bind every row of matrix (shape batch x len(self.parameters)) into its own payload.
+        """
+        values = np.asarray(matrix, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(self.parameters):
+            raise(Exception(f"expected values of shape (batch, {len(self.parameters)}) but got {values.shape}"))
+
+        body, slots = self.template(topK)
+        templateOperations = body["operations"]
+
+        bodies = []
+        for row in values.tolist():
+            operations = templateOperations.copy()
+            for index, cgate, cparams, cqubits, positions in slots:
+                params = cparams.copy()
+                for position, parameter in positions:
+                    params[position] = row[parameter]
+                operations[index] = {"gate": cgate, "params": params, "qubits": cqubits}
+            bound = dict(body)
+            bound["operations"] = operations
+            bodies.append(bound)
+        return bodies
+        
+        
+        
+class AutomatskiKomencoNative(AutomatskiKomencoClient):
     
-    def __init__(self, host, port):
-        self.host = host
-        self.port = port
-        
-    def run(self, circuit, repetitions=1000, topK=20):
-        tstart = datetime.datetime.now()
+    def __init__(self, host, port, **kwargs):
+        super().__init__(host, port, **kwargs)
         
-        body = self.serialize_circuit(circuit, topK)
-        response = requests.post(f'http://{self.host}:{self.port}/api/komenco', json=body)
-        response.close() #bug fix - too many connections open
-        struct = response.json()
-        
-        tend = datetime.datetime.now()
-        execution_time = (tend - tstart).microseconds
-        print(f"Time Taken {(tend - tstart)}")
-        
-        cannotProceed = None
-        try:
-            if struct["error"] :
-                print(struct["error"])
-                cannotProceed = True
-                raise Exception(struct["error"])
-        except Exception as e:
-            if cannotProceed:
-                raise e            
-            pass 
-            
+    def build_result(self, body, struct, repetitions, execution_time):
         return self.deserialize_result(struct, repetitions)
 
     def serialize_circuit(self, circuit, topK):
+        if isinstance(circuit, ParameterizedCircuit) and circuit.parameters:
+            raise(Exception("bind the parameters of the circuit first, e.g. run(circuit.bind(values))"))
+
         # Extract the number of qubits
         num_qubits = circuit.num_qubits
 
         operations = []
         measurements = []
 
-        for cgate, cparams, cqubits in circuit.operations:
-            gate = cgate
-            params = [param for param in cparams]
-            qubits = [q for q in cqubits]
-            if gate == 'measure':
-                for q in qubits:
-                    measurements.append(q)
-            else:
-                operations.append({"gate": gate, "params": params, "qubits": qubits})
-        
-        print("Executing Quantum Circuit With...")
-        print(f"{num_qubits} Qubits And ...")
-        print(f"{len(operations)} Gates")
-        
-        if len(measurements) == 0:
-            raise(Exception("There are no measurements done at the end of the circuit."))
+        if isinstance(circuit, CompactQuantumCircuit):
+            operations, measurements = circuit.serialize_operations()
+        else:
+            for cgate, cparams, cqubits in circuit.operations:
+                gate = cgate
+                params = [param for param in cparams]
+                qubits = [q for q in cqubits]
+                if gate == 'measure':
+                    for q in qubits:
+                        measurements.append(q)
+                else:
+                    operations.append({"gate": gate, "params": params, "qubits": qubits})
         
         return { "num_qubits": num_qubits, "operations": operations, "measurements": measurements, "topK": topK}    
 
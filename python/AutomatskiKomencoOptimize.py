@@ -0,0 +1,192 @@
+from AutomatskiKomencoLocal import GATES
+import numpy as np
+
+# how close to the identity (up to a global phase) a fused run has to be to be dropped
+IDENTITY_TOLERANCE = 1e-10
+
+# gates that undo themselves when applied twice on the same qubits
+SELF_INVERSE = {"cx", "cy", "cz", "ch", "swap", "ccx", "ccy", "ccz", "cswap", "c3x", "c4x", "mcx", "mct", "mcz"}
+# gates whose qubits can be listed in any order
+SYMMETRIC = {"cz", "swap", "ccz", "mcz", "cp", "rxx", "ryy", "rzz"}
+# rotations of the same kind on the same qubits add up, with the period after which they are the identity
+ADDITIVE = {"crx": 4 * np.pi, "cry": 4 * np.pi, "crz": 4 * np.pi, "cp": 2 * np.pi,
+            "rxx": 4 * np.pi, "ryy": 4 * np.pi, "rzz": 4 * np.pi, "rzx": 4 * np.pi}
+
+
+def u_params(U):
+    """
+    Returns:
+        theta, phi, lam of the u gate equal to the 2x2 unitary U up to a global phase.
+    """
+    su = U / np.sqrt(np.linalg.det(U))
+    theta = 2 * np.arctan2(abs(su[1, 0]), abs(su[0, 0]))
+    phiplambda2 = np.angle(su[1, 1])
+    phimlambda2 = np.angle(su[1, 0])
+    return [float(theta), float(phiplambda2 + phimlambda2), float(phiplambda2 - phimlambda2)]
+
+
+def is_identity(U):
+    return abs(abs(np.trace(U)) / 2 - 1) < IDENTITY_TOLERANCE
+
+
+def single_matrix(operation):
+    # the 2x2 matrix of a fusable single-qubit operation, None for anything else
+    spec = GATES.get(operation["gate"])
+    if spec is None or spec[0] != "single" or len(operation["qubits"]) != 1:
+        return None
+    try:
+        return spec[1](operation["gate"], operation["params"])
+    except (TypeError, ValueError):
+        # symbolic params (e.g. unbound qiskit Parameters) cannot be fused
+        return None
+
+
+def same_qubits(gate, qubits1, qubits2):
+    if gate in SYMMETRIC:
+        return sorted(qubits1) == sorted(qubits2)
+    return list(qubits1) == list(qubits2)
+
+
+def fusion_pass(operations, num_qubits):
+    output = []
+    # per qubit: the pending run of single-qubit operations and the stack of output indices touching it
+    pending = [[] for _ in range(num_qubits)]
+    touching = [[] for _ in range(num_qubits)]
+
+    def emit(operation):
+        output.append(operation)
+        for q in operation["qubits"]:
+            touching[q].append(len(output) - 1)
+
+    def flush(q):
+        run = pending[q]
+        if len(run) == 1:
+            emit(run[0][0])
+        elif len(run) > 1:
+            U = run[0][1]
+            for operation, matrix in run[1:]:
+                U = matrix @ U
+            if not is_identity(U):
+                emit({"gate": "u", "params": u_params(U), "qubits": [q]})
+        pending[q] = []
+
+    for operation in operations:
+        qubits = operation["qubits"]
+        matrix = single_matrix(operation)
+        if matrix is not None:
+            pending[qubits[0]].append((operation, matrix))
+            continue
+
+        for q in qubits:
+            flush(q)
+
+        gate = operation["gate"]
+        last = [touching[q][-1] if touching[q] else None for q in qubits]
+        previous = output[last[0]] if last[0] is not None and all(index == last[0] for index in last) else None
+        if previous is not None and previous["gate"] == gate and len(previous["qubits"]) == len(qubits) \
+                and same_qubits(gate, previous["qubits"], qubits):
+            if gate in SELF_INVERSE:
+                output[last[0]] = None
+                for q in qubits:
+                    touching[q].pop()
+                continue
+            if gate in ADDITIVE and len(previous["params"]) == 1 and len(operation["params"]) == 1:
+                try:
+                    angle = float(previous["params"][0]) + float(operation["params"][0])
+                except (TypeError, ValueError):
+                    angle = None
+                if angle is not None:
+                    angle = np.fmod(angle, ADDITIVE[gate])
+                    if abs(angle) < IDENTITY_TOLERANCE or abs(abs(angle) - ADDITIVE[gate]) < IDENTITY_TOLERANCE:
+                        output[last[0]] = None
+                        for q in qubits:
+                            touching[q].pop()
+                    else:
+                        output[last[0]] = {"gate": gate, "params": [float(angle)], "qubits": list(previous["qubits"])}
+                    continue
+
+        emit(operation)
+
+    for q in range(num_qubits):
+        flush(q)
+
+    return [operation for operation in output if operation is not None]
+
+
+def prune_light_cone(body):
+    """
+    Drop the gates and qubits that cannot affect the measured qubits.
+
+    Walking the operations backwards from the measurements, a gate is kept only if it touches
+    a qubit that is (transitively) connected to a later kept gate or a measurement. The
+    qubits that are left are renumbered 0..m-1 in their original order, so num_qubits only
+    counts the wires that matter. The bitstrings that come back are ordered by the
+    measurements list, whose order is kept, so they need no remapping.
+
+    Args:
+        body: A serialized circuit as produced by serialize_circuit, it is not modified
+
+    Returns:
+        The pruned payload and {"qubits_before": ..., "qubits_after": ...,
+        "qubit_map": {old index: new index}}.
+    """
+    live = set(body["measurements"])
+    kept = []
+    for operation in reversed(body["operations"]):
+        qubits = operation["qubits"]
+        if any(q in live for q in qubits):
+            live.update(qubits)
+            kept.append(operation)
+    kept.reverse()
+
+    qubitMap = {old: new for new, old in enumerate(sorted(live))}
+    identity = all(old == new for old, new in qubitMap.items()) and len(qubitMap) == body["num_qubits"]
+
+    prunedBody = dict(body)
+    if identity:
+        prunedBody["operations"] = kept
+    else:
+        prunedBody["num_qubits"] = len(qubitMap)
+        prunedBody["operations"] = [{"gate": operation["gate"], "params": operation["params"],
+                                     "qubits": [qubitMap[q] for q in operation["qubits"]]} for operation in kept]
+        prunedBody["measurements"] = [qubitMap[q] for q in body["measurements"]]
+    return prunedBody, {"qubits_before": body["num_qubits"], "qubits_after": prunedBody["num_qubits"], "qubit_map": qubitMap}
+
+
+def optimize_circuit(body, max_passes=4, prune=True):
+    """
+    Fuse and cancel gates of a serialized circuit before it is sent.
+
+    Runs of adjacent single-qubit gates on a qubit become one u gate (or nothing if they
+    multiply to the identity), adjacent self-inverse pairs such as cx cx cancel and adjacent
+    rotations like rzz rzz on the same qubits add up. Only the global phase can change, the
+    measurement distribution is the same. The pass is repeated (at most max_passes times)
+    while it keeps removing gates, so that h cx cx h also disappears. With prune the circuit
+    is first cut down to the light cone of its measurements (see prune_light_cone).
+
+    Args:
+        body: A serialized circuit as produced by serialize_circuit, it is not modified
+
+    Returns:
+        The optimized payload and {"gates_before": ..., "gates_after": ..., "passes": ...,
+        "qubits_before": ..., "qubits_after": ...}.
+    """
+    before = len(body["operations"])
+    pruneStats = {"qubits_before": body["num_qubits"], "qubits_after": body["num_qubits"]}
+    if prune:
+        body, pruneStats = prune_light_cone(body)
+
+    operations = body["operations"]
+    passes = 0
+    while passes < max_passes:
+        optimized = fusion_pass(operations, body["num_qubits"])
+        passes += 1
+        removed = len(optimized) < len(operations)
+        operations = optimized
+        if not removed:
+            break
+
+    optimizedBody = dict(body)
+    optimizedBody["operations"] = operations
+    return optimizedBody, {"gates_before": before, "gates_after": len(operations), "passes": passes,
+                           "qubits_before": pruneStats["qubits_before"], "qubits_after": pruneStats["qubits_after"]}
@@ -0,0 +1,353 @@
+import ast
+import math
+import os
+import re
+
+# qelib1.inc gates that Komenco runs natively, with their number of params and qubits
+QELIB1_NATIVE = {
+    "u3": (3, 1), "u2": (2, 1), "u1": (1, 1), "u": (3, 1), "p": (1, 1), "id": (0, 1),
+    "x": (0, 1), "y": (0, 1), "z": (0, 1), "h": (0, 1), "s": (0, 1), "sdg": (0, 1),
+    "t": (0, 1), "tdg": (0, 1), "rx": (1, 1), "ry": (1, 1), "rz": (1, 1), "sx": (0, 1), "sxdg": (0, 1),
+    "cx": (0, 2), "cz": (0, 2), "cy": (0, 2), "swap": (0, 2), "ch": (0, 2), "csx": (0, 2),
+    "crx": (1, 2), "cry": (1, 2), "crz": (1, 2), "cu1": (1, 2), "cp": (1, 2), "cu3": (3, 2), "cu": (4, 2),
+    "rxx": (1, 2), "rzz": (1, 2), "ccx": (0, 3), "cswap": (0, 3), "c3x": (0, 4), "c4x": (0, 5),
+}
+
+# the rest of qelib1.inc is expanded into the gates above
+QELIB1_DEFINITIONS = """
+gate u0(gamma) q { U(0,0,0) q; }
+gate rccx a,b,c { u2(0,pi) c; u1(pi/4) c; cx b, c; u1(-pi/4) c; cx a, c; u1(pi/4) c; cx b, c; u1(-pi/4) c; u2(0,pi) c; }
+gate rc3x a,b,c,d { u2(0,pi) d; u1(pi/4) d; cx c,d; u1(-pi/4) d; u2(0,pi) d; cx a,d; u1(pi/4) d; cx b,d;
+    u1(-pi/4) d; cx a,d; u1(pi/4) d; cx b,d; u1(-pi/4) d; u2(0,pi) d; u1(pi/4) d; cx c,d; u1(-pi/4) d; u2(0,pi) d; }
+gate c3sqrtx a,b,c,d { h d; cu1(-pi/8) a,d; h d; cx a,b; h d; cu1(pi/8) b,d; h d; cx a,b; h d; cu1(-pi/8) b,d; h d;
+    cx b,c; h d; cu1(pi/8) c,d; h d; cx a,c; h d; cu1(-pi/8) c,d; h d; cx b,c; h d; cu1(pi/8) c,d; h d;
+    cx a,c; h d; cu1(-pi/8) c,d; h d; }
+"""
+
+# the two gates built into the language
+BUILTIN_GATES = {"U": ("u", 3, 1), "CX": ("cx", 0, 2)}
+
+FUNCTIONS = {"sin": math.sin, "cos": math.cos, "tan": math.tan, "exp": math.exp, "ln": math.log, "sqrt": math.sqrt}
+EXPRESSION_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call,
+                    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+SPLITTER = re.compile(r"([;{}])")
+APPLICATION = re.compile(r"([A-Za-z_]\w*)\s*(?:\((.*)\))?\s*(.*)", re.S)
+ARGUMENT = re.compile(r"\s*([A-Za-z_]\w*)\s*(?:\[\s*(\d+)\s*\])?\s*$")
+
+
+class QASMReader:
+    """
+    A streaming OpenQASM 2 reader that needs neither Qiskit nor any other package.
+
+    Statements are handled one at a time as the source is read, nothing but the gate
+    definitions is kept around. Every operation is handed to emit(gate, params, qubits)
+    with absolute qubit indices (registers concatenated in declaration order), measurements
+    as emit("measure", [], [qubit]). The qelib1.inc gates Komenco knows are emitted as they
+    are, the others and all gates defined in the program are expanded into their bodies.
+    Like the serializers, barriers are skipped and reset / if raise.
+    """
+
+    def __init__(self, emit, include_path=None):
+        self.emit = emit
+        self.includePath = include_path
+        self.registers = {}
+        self.classicalRegisters = {}
+        self.num_qubits = 0
+        self.definitions = {}
+        self.expressions = {}
+        self.read_lines(QELIB1_DEFINITIONS.splitlines(), "qelib1.inc")
+
+    def read_file(self, filename):
+        directory = os.path.dirname(os.path.abspath(filename))
+        with open(filename, "r") as file:
+            self.read_lines(file, filename, directory)
+        return self
+
+    def read_string(self, program):
+        self.read_lines(program.splitlines(), "<string>", self.includePath or os.getcwd())
+        return self
+
+    def read_lines(self, lines, source, directory=None):
+        for number, statement in self.statements(lines):
+            try:
+                self.statement(statement, directory)
+            except Exception as e:
+                raise(Exception(f"{source}:{number}: {e}"))
+
+    @staticmethod
+    def statements(lines):
+        # yields (line number, statement), a gate definition is one statement up to its closing brace
+        pieces = []
+        depth = 0
+        for number, line in enumerate(lines, 1):
+            line = line.split("//", 1)[0]
+            for piece in SPLITTER.split(line):
+                if piece == ";" and depth == 0:
+                    statement = "".join(pieces).strip()
+                    pieces = []
+                    if statement:
+                        yield number, statement
+                    continue
+                pieces.append(piece)
+                if piece == "{":
+                    depth += 1
+                elif piece == "}":
+                    depth -= 1
+                    if depth == 0:
+                        yield number, "".join(pieces).strip()
+                        pieces = []
+        if "".join(pieces).strip():
+            raise(Exception("unexpected end of the program, a ';' or '}' is missing"))
+
+    def statement(self, statement, directory):
+        keyword = statement.split(None, 1)[0].split("(", 1)[0]
+
+        if keyword == "OPENQASM":
+            return
+        if keyword == "include":
+            self.include(statement.split(None, 1)[1].strip().strip('"'), directory)
+        elif keyword == "qreg" or keyword == "creg":
+            match = re.fullmatch(r"[qc]reg\s+([A-Za-z_]\w*)\s*\[\s*(\d+)\s*\]", statement)
+            if match is None:
+                raise(Exception(f"invalid register declaration: '{statement}'"))
+            name, size = match.group(1), int(match.group(2))
+            if keyword == "qreg":
+                self.registers[name] = (self.num_qubits, size)
+                self.num_qubits += size
+            else:
+                self.classicalRegisters[name] = size
+        elif keyword == "gate":
+            self.define(statement)
+        elif keyword == "opaque":
+            name = statement.split(None, 1)[1].split("(", 1)[0].split()[0]
+            self.definitions[name] = None
+        elif keyword == "measure":
+            # the classical target is not needed, the bitstrings follow the order of the measurements
+            target = statement[len("measure"):].split("->", 1)[0]
+            for qubits in self.broadcast([target]):
+                self.emit("measure", [], qubits)
+        elif keyword == "barrier":
+            return
+        elif keyword == "reset":
+            raise(Exception("gate or operation: 'reset' is not supported by Komenco yet"))
+        elif keyword == "if":
+            raise(Exception("classically controlled operations are not supported by Komenco yet"))
+        else:
+            match = APPLICATION.fullmatch(statement)
+            if match is None:
+                raise(Exception(f"invalid statement: '{statement}'"))
+            params = [self.evaluate(text, None) for text in self.split_params(match.group(2))]
+            for qubits in self.broadcast(match.group(3).split(",")):
+                self.apply(match.group(1), params, qubits)
+
+    def include(self, filename, directory):
+        if filename == "qelib1.inc":
+            return
+        candidates = [os.path.join(path, filename) for path in [directory, self.includePath] if path]
+        for path in candidates + [filename]:
+            if os.path.exists(path):
+                with open(path, "r") as file:
+                    self.read_lines(file, path, os.path.dirname(os.path.abspath(path)))
+                return
+        raise(Exception(f"cannot find the include file: '{filename}'"))
+
+    def define(self, statement):
+        header, body = statement.split("{", 1)
+        match = re.fullmatch(r"gate\s+([A-Za-z_]\w*)\s*(?:\((.*)\))?\s*(.*)", header.strip(), re.S)
+        if match is None:
+            raise(Exception(f"invalid gate definition: '{header.strip()}'"))
+        name = match.group(1)
+        params = [param.strip() for param in self.split_params(match.group(2))]
+        qargs = [qarg.strip() for qarg in match.group(3).split(",")]
+
+        operations = []
+        for text in body.rsplit("}", 1)[0].split(";"):
+            text = text.strip()
+            if not text or text.startswith("barrier"):
+                continue
+            operation = APPLICATION.fullmatch(text)
+            if operation is None:
+                raise(Exception(f"invalid statement in gate {name}: '{text}'"))
+            arguments = [argument.strip() for argument in operation.group(3).split(",")]
+            for argument in arguments:
+                if argument not in qargs:
+                    raise(Exception(f"unknown qubit argument '{argument}' in gate {name}"))
+            operations.append((operation.group(1), [self.expression(text) for text in self.split_params(operation.group(2))],
+                               [qargs.index(argument) for argument in arguments]))
+
+        self.definitions[name] = (params, len(qargs), operations)
+
+    def apply(self, name, params, qubits):
+        if name in self.definitions:
+            definition = self.definitions[name]
+            if definition is None:
+                raise(Exception(f"opaque gate: '{name}' is not supported by Komenco"))
+            names, width, operations = definition
+            self.check(name, params, qubits, len(names), width)
+            scope = dict(zip(names, params))
+            for gate, expressions, arguments in operations:
+                self.apply(gate, [self.evaluate(expression, scope) for expression in expressions],
+                           [qubits[argument] for argument in arguments])
+            return
+
+        if name in BUILTIN_GATES:
+            gate, count, width = BUILTIN_GATES[name]
+        elif name in QELIB1_NATIVE:
+            gate = name
+            count, width = QELIB1_NATIVE[name]
+        else:
+            raise(Exception(f"unknown gate: '{name}'"))
+        self.check(name, params, qubits, count, width)
+        self.emit(gate, params, qubits)
+
+    @staticmethod
+    def check(name, params, qubits, count, width):
+        if len(params) != count:
+            raise(Exception(f"gate {name} takes {count} params, got {len(params)}"))
+        if len(qubits) != width:
+            raise(Exception(f"gate {name} takes {width} qubits, got {len(qubits)}"))
+        if len(set(qubits)) != len(qubits):
+            raise(Exception(f"gate {name} is applied to duplicate qubits {qubits}"))
+
+    def broadcast(self, arguments):
+        # a whole register as an argument applies the operation once per qubit of the register
+        resolved = []
+        size = None
+        for argument in arguments:
+            match = ARGUMENT.match(argument)
+            if match is None or match.group(1) not in self.registers:
+                raise(Exception(f"unknown quantum register: '{argument.strip()}'"))
+            offset, length = self.registers[match.group(1)]
+            if match.group(2) is None:
+                if size is not None and size != length:
+                    raise(Exception(f"registers of different sizes in '{', '.join(arguments)}'"))
+                size = length
+                resolved.append(range(offset, offset + length))
+            else:
+                index = int(match.group(2))
+                if index >= length:
+                    raise(Exception(f"qubit index out of range: '{argument.strip()}'"))
+                resolved.append(offset + index)
+
+        if size is None:
+            return [resolved]
+        return [[qubits if isinstance(qubits, int) else qubits[i] for qubits in resolved] for i in range(size)]
+
+    @staticmethod
+    def split_params(text):
+        if text is None or not text.strip():
+            return []
+        if "(" not in text:
+            return text.split(",")
+        params = []
+        depth = 0
+        start = 0
+        for i, char in enumerate(text):
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char == "," and depth == 0:
+                params.append(text[start:i])
+                start = i + 1
+        params.append(text[start:])
+        return params
+
+    def expression(self, text):
+        # plain numbers are the common case, everything else is compiled once and cached
+        try:
+            return float(text)
+        except ValueError:
+            pass
+        code = self.expressions.get(text)
+        if code is None:
+            tree = ast.parse(text.strip().replace("^", "**"), mode="eval")
+            for node in ast.walk(tree):
+                if not isinstance(node, EXPRESSION_NODES):
+                    raise(Exception(f"invalid expression: '{text.strip()}'"))
+                if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS
+                                                   or len(node.args) != 1 or node.keywords):
+                    raise(Exception(f"invalid function call in: '{text.strip()}'"))
+            code = compile(tree, "<qasm>", "eval")
+            self.expressions[text] = code
+        return code
+
+    def evaluate(self, expression, scope):
+        if isinstance(expression, str):
+            expression = self.expression(expression)
+        if isinstance(expression, float):
+            return expression
+        namespace = {"__builtins__": {}, "pi": math.pi}
+        namespace.update(FUNCTIONS)
+        if scope:
+            namespace.update(scope)
+        try:
+            return float(eval(expression, namespace))
+        except NameError as e:
+            raise(Exception(f"unknown parameter in expression: {e}"))
+
+
+class PayloadBuilder:
+    # collects what the reader emits into the operations / measurements of a Komenco payload
+
+    def __init__(self):
+        self.operations = []
+        self.measurements = []
+
+    def __call__(self, gate, params, qubits):
+        if gate == "measure":
+            self.measurements.extend(qubits)
+        else:
+            self.operations.append({"gate": gate, "params": params, "qubits": list(qubits)})
+
+
+def read_payload(read, topK, include_path):
+    builder = PayloadBuilder()
+    reader = QASMReader(builder, include_path)
+    read(reader)
+    return {"num_qubits": reader.num_qubits, "operations": builder.operations, "measurements": builder.measurements, "topK": topK}
+
+
+def read_circuit(read, include_path):
+    from AutomatskiKomencoNative import QuantumCircuit
+
+    # the number of qubits is only known at the end, append_operation does not check it
+    circuit = QuantumCircuit(0)
+    reader = QASMReader(lambda gate, params, qubits: circuit.append_operation(gate, params, list(qubits)), include_path)
+    read(reader)
+    circuit.num_qubits = reader.num_qubits
+    return circuit
+
+
+def load(filename, topK=20, include_path=None):
+    """
+    Reads an OpenQASM 2 file straight into a Komenco payload, without Qiskit.
+
+    Args:
+        filename: The .qasm file, includes other than qelib1.inc are looked up next to it
+        topK: The number of most probable bitstrings the server should return
+        include_path: An extra directory to look up includes in
+
+    Returns:
+        The payload, it can be passed to run() / run_batch() of any Komenco client.
+    """
+    return read_payload(lambda reader: reader.read_file(filename), topK, include_path)
+
+
+def loads(program, topK=20, include_path=None):
+    """
+    Like load() but for a program in a string, includes are looked up in include_path or the current directory.
+    """
+    return read_payload(lambda reader: reader.read_string(program), topK, include_path)
+
+
+def load_circuit(filename, include_path=None):
+    """
+    Reads an OpenQASM 2 file into a native QuantumCircuit, e.g. to add gates before running it.
+    """
+    return read_circuit(lambda reader: reader.read_file(filename), include_path)
+
+
+def loads_circuit(program, include_path=None):
+    return read_circuit(lambda reader: reader.read_string(program), include_path)
@@ -1,36 +1,15 @@
-import requests
+from AutomatskiKomencoClient import AutomatskiKomencoClient
 import qiskit
 from qiskit.result import Result
 #from qiskit.result.counts import Counts
 import numpy as np
 import uuid
-import datetime
 
-def _get_qindex(circ, name, index):
-    """
-    Find the qubit index.
 
-    Args:
-        circ: The Qiskit QuantumCircuit in question
-        name: The name of the quantum register
-        index: The qubit's relative index inside the register
-
-    Returns:
-        The qubit's absolute index if all registers are concatenated.
-    """
-    ret = 0
-    for reg in circ.qregs:
-        if name != reg.name:
-            ret += reg.size
-        else:
-            return ret + index
-    return ret + index
-    
-class AutomatskiKomencoQiskit:
+class AutomatskiKomencoQiskit(AutomatskiKomencoClient):
     
-    def __init__(self, host, port):
-        self.host = host
-        self.port = port
+    def __init__(self, host, port, **kwargs):
+        super().__init__(host, port, **kwargs)
         self.gateMap = {}
         
         self.gateMap["cu1"]="cp"
@@ -44,31 +23,7 @@ class AutomatskiKomencoQiskit:
         self.gateMap["cxp"] = "cnotp"
         self.gateMap["ccxp"] = "ccnotp"
         
-    def run(self, circuit, repetitions=1000, topK=20):
-        tstart = datetime.datetime.now()
-        
-        body = self.serialize_circuit(circuit, topK)
-        response = requests.post(f'http://{self.host}:{self.port}/api/komenco', json=body)
-        response.close() #bug fix - too many connections open
-        struct = response.json()
-        
-        tend = datetime.datetime.now()
-        execution_time = (tend - tstart).microseconds
-        print(f"Time Taken {(tend - tstart)}")
-        
-        cannotProceed = None
-        try:
-            if struct["error"] :
-                print(struct["error"])
-                cannotProceed = True
-                raise Exception(struct["error"])
-        except Exception as e:
-            if cannotProceed:
-                raise e            
-            pass 
-        
-        
-        
+    def build_result(self, body, struct, repetitions, execution_time):
         return self.deserialize_result(struct, repetitions, execution_time)
 
     def serialize_circuit(self, circuit, topK):
@@ -78,6 +33,9 @@ class AutomatskiKomencoQiskit:
         operations = []
         measurements = []
 
+        # absolute index of every qubit, the same as concatenating the registers, built once per circuit
+        qindex = {qubit: index for index, qubit in enumerate(circuit.qubits)}
+
         for instr, qargs, cargs in circuit.data:
             gate = instr.name.lower() #the server uses lowercase gate names 
             
@@ -87,12 +45,7 @@ class AutomatskiKomencoQiskit:
                 
             params = [param for param in instr.params]
             #print([q for q in qargs])
-            qubits = []
-            # Get qbit arguments
-            # ref: myqlm converters [interop]
-            for qarg in qargs:
-                qubits.append(
-                    _get_qindex(circuit, qarg._register.name, qarg._index))
+            qubits = [qindex[qarg] for qarg in qargs]
                     
             if gate == 'measure':
                 for q in qubits:
@@ -104,13 +57,6 @@ class AutomatskiKomencoQiskit:
             else:
                 operations.append({"gate": gate, "params": params, "qubits": qubits})
         
-        print("Executing Quantum Circuit With...")
-        print(f"{num_qubits} Qubits And ...")
-        print(f"{len(operations)} Gates")
-        
-        if len(measurements) == 0:
-            raise(Exception("There are no measurements done at the end of the circuit."))        
-                
         return { "num_qubits": num_qubits, "operations": operations, "measurements": measurements, "topK": topK}    
 
     @staticmethod
@@ -0,0 +1,337 @@
+from AutomatskiKomencoLocal import StatevectorEngine
+from AutomatskiKomencoExpectation import pack_bits
+import numpy as np
+
+# the Clifford gates of the operations list as the tableau updates they are made of, applied in
+# order, the numbers are positions in the qubits of the operation (the first one is the control)
+CLIFFORD_GATES = {
+    "id": [],
+    "x": [("x", 0)],
+    "y": [("y", 0)],
+    "z": [("z", 0)],
+    "h": [("h", 0)],
+    "s": [("s", 0)],
+    "sdg": [("sdg", 0)],
+    "sqrt_z": [("s", 0)],
+    "sx": [("h", 0), ("s", 0), ("h", 0)],
+    "sqrt_x": [("h", 0), ("s", 0), ("h", 0)],
+    "sxdg": [("h", 0), ("sdg", 0), ("h", 0)],
+    "sqrt_y": [("z", 0), ("h", 0)],
+    "cx": [("cx", 0, 1)],
+    "cy": [("sdg", 1), ("cx", 0, 1), ("s", 1)],
+    "cz": [("h", 1), ("cx", 0, 1), ("h", 1)],
+    "swap": [("swap", 0, 1)],
+    "iswap": [("s", 0), ("s", 1), ("h", 0), ("cx", 0, 1), ("cx", 1, 0), ("h", 1)],
+    "dcx": [("cx", 0, 1), ("cx", 1, 0)],
+}
+
+
+def is_clifford(operations):
+    return all(operation["gate"] in CLIFFORD_GATES for operation in operations)
+
+
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        # set bits per uint64, numpy < 2.0 has no bitwise_count
+        words = np.ascontiguousarray(words, dtype=np.uint64)
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1)
+
+
+def unpack_bits(words, width):
+    # the inverse of pack_bits, a (rows, width) uint8 0/1 matrix
+    return np.unpackbits(np.ascontiguousarray(words, dtype="<u8").view(np.uint8), axis=1, bitorder="little")[:, :width]
+
+
+def first_column(words):
+    # the lowest set bit of a packed row, None when there is none
+    nonzero = np.flatnonzero(words)
+    if len(nonzero) == 0:
+        return None
+    value = int(words[nonzero[0]])
+    return int(nonzero[0]) * 64 + (value & -value).bit_length() - 1
+
+
+def multiply(rows, signs, targets, source, sourceSign):
+    """
+    Replaces every target row by source * target, Pauli strings packed as (x words | z words)
+    with (-1)^sign in signs. The sign follows the i^g of the product of every qubit
+    (Aaronson-Gottesman rowsum), counted over whole words for all the targets at once.
+    """
+    half = rows.shape[1] // 2
+    x1, z1 = source[:half], source[half:]
+    x2, z2 = rows[targets, :half], rows[targets, half:]
+    plus = (x1 & z1 & ~x2 & z2) | (x1 & ~z1 & x2 & z2) | (~x1 & z1 & x2 & ~z2)
+    minus = (x1 & z1 & x2 & ~z2) | (x1 & ~z1 & ~x2 & z2) | (~x1 & z1 & x2 & z2)
+    phase = popcount(plus).sum(axis=1, dtype=np.int64) - popcount(minus).sum(axis=1, dtype=np.int64)
+    signs[targets] = ((2 * signs[targets] + 2 * sourceSign + phase) % 4) // 2
+    rows[targets] ^= source
+
+
+def echelon(rows, signs):
+    """
+    Gaussian elimination of commuting Pauli strings with their signs over their X columns.
+
+    Returns:
+        (rows, signs, pivots, rest, restSigns), the rows that have X in row echelon form with
+        the pivot column of every one, and the rows left over, which have Z only.
+    """
+    rows = rows.copy()
+    signs = signs.copy()
+    half = rows.shape[1] // 2
+    pivots = []
+    top = 0
+    while top < len(rows):
+        column = first_column(np.bitwise_or.reduce(rows[top:, :half], axis=0))
+        if column is None:
+            break
+        word, bit = divmod(column, 64)
+        hits = top + np.flatnonzero((rows[top:, word] >> np.uint64(bit)) & np.uint64(1))
+        pivot = hits[0]
+        if pivot != top:
+            rows[[top, pivot]] = rows[[pivot, top]]
+            signs[[top, pivot]] = signs[[pivot, top]]
+        if len(hits) > 1:
+            multiply(rows, signs, hits[1:], rows[top], signs[top])
+        pivots.append(column)
+        top += 1
+    return rows[:top], signs[:top], pivots, rows[top:, half:], signs[top:]
+
+
+def z_basis(rows, signs):
+    """
+    Products of Z only multiply without a phase, their signs are simply xor-ed, so the Z-only
+    rows are reduced as Python ints (bit q for column q) into a basis keyed by the highest bit
+    of every row. Unlike column by column elimination this does not fill in the rows of fan-out
+    circuits (GHZ states have n - 1 rows Z_0 Z_q).
+
+    Returns:
+        {highest bit: (row, sign)}
+    """
+    basis = {}
+    for words, sign in zip(rows, signs.tolist()):
+        row = int.from_bytes(np.ascontiguousarray(words, dtype="<u8").tobytes(), "little")
+        while row:
+            high = row.bit_length() - 1
+            if high not in basis:
+                basis[high] = (row, sign)
+                break
+            other, otherSign = basis[high]
+            row ^= other
+            sign ^= otherSign
+    return basis
+
+
+def int_parity(value):
+    return bin(value).count("1") & 1
+
+
+class StabilizerTableau:
+    """
+    The stabilizer generators of an n qubit state, bit-packed.
+
+    xs[q] and zs[q] hold, for qubit q, one bit per generator (64 generators per uint64 word) and r
+    the signs, so a gate is a handful of whole-word operations on the rows of its qubits. Only
+    the n stabilizers are kept: there are no measurements in the middle of a circuit, so the
+    destabilizers of Aaronson-Gottesman are never needed.
+    """
+
+    def __init__(self, num_qubits):
+        self.num_qubits = num_qubits
+        # generator g starts as Z_g
+        identity = np.eye(num_qubits, dtype=np.uint8)
+        self.xs = pack_bits(np.zeros_like(identity))
+        self.zs = pack_bits(identity)
+        self.r = np.zeros(self.xs.shape[1], dtype="<u8")
+
+    def apply(self, gate, qubits):
+        if gate not in CLIFFORD_GATES:
+            raise(Exception(f"gate or operation: '{gate}' is not a Clifford gate"))
+        for qubit in qubits:
+            if qubit < 0 or qubit >= self.num_qubits:
+                raise(Exception(f"invalid qubit: {qubit}"))
+        for primitive, *positions in CLIFFORD_GATES[gate]:
+            getattr(self, primitive)(*[qubits[position] for position in positions])
+
+    def h(self, a):
+        self.r ^= self.xs[a] & self.zs[a]
+        self.xs[a], self.zs[a] = self.zs[a], self.xs[a].copy()
+
+    def s(self, a):
+        self.r ^= self.xs[a] & self.zs[a]
+        self.zs[a] ^= self.xs[a]
+
+    def sdg(self, a):
+        self.r ^= self.xs[a] & ~self.zs[a]
+        self.zs[a] ^= self.xs[a]
+
+    def x(self, a):
+        self.r ^= self.zs[a]
+
+    def y(self, a):
+        self.r ^= self.xs[a] ^ self.zs[a]
+
+    def z(self, a):
+        self.r ^= self.xs[a]
+
+    def cx(self, control, target):
+        x, z = self.xs, self.zs
+        self.r ^= x[control] & z[target] & ~(x[target] ^ z[control])
+        x[target] ^= x[control]
+        z[control] ^= z[target]
+
+    def swap(self, a, b):
+        self.xs[[a, b]] = self.xs[[b, a]]
+        self.zs[[a, b]] = self.zs[[b, a]]
+
+    def generators(self, order):
+        """
+        Returns:
+            (rows, signs) with one packed (x words | z words) row per generator, the qubits in
+            the given order, and its sign bit.
+        """
+        n = self.num_qubits
+        x = pack_bits(unpack_bits(self.xs, n)[order].T)
+        z = pack_bits(unpack_bits(self.zs, n)[order].T)
+        signs = unpack_bits(self.r[None, :], n)[0].astype(np.int64)
+        return np.concatenate([x, z], axis=1), signs
+
+    def top_k(self, measurements, topK):
+        """
+        The measurement distribution of a stabilizer state is uniform over an affine subspace:
+        the stabilizers that are products of Z on measured qubits fix the parities of those
+        outcomes, every other measured bit is a fair coin. They are what is left after the X
+        columns are eliminated and the unmeasured Z columns (the highest ones) are reduced away.
+
+        Returns:
+            {bitstring: probability} of up to topK outcomes, when more outcomes are equally
+            likely which of them come back is arbitrary (like in the statevector engine).
+            More than 1074 free bits make the probability underflow to 0.0, that raises.
+        """
+        n = self.num_qubits
+        measured = list(dict.fromkeys(measurements))
+        measuredSet = set(measured)
+        others = [q for q in range(n) if q not in measuredSet]
+        rows, signs, pivots, rest, restSigns = echelon(*self.generators(measured + others))
+
+        # bit j of an outcome is measured[j], a constraint fixes its highest bit
+        k = len(measured)
+        constraints = sorted((high, row, sign) for high, (row, sign) in z_basis(rest, restSigns).items() if high < k)
+        fixed = {high for high, row, sign in constraints}
+        free = [j for j in range(k) if j not in fixed]
+        probability = 2.0 ** -len(free)
+        if probability == 0.0:
+            raise(Exception(f"every outcome has probability 2^-{len(free)}, which is too small for a float, measure fewer qubits"))
+
+        count = min(topK, 2 ** len(free))
+        outcomes = []
+        for t in range(count):
+            outcome = 0
+            for j, position in enumerate(free[:(count - 1).bit_length()]):
+                outcome |= ((t >> j) & 1) << position
+            # the lower bits of every constraint are free or fixed by an earlier one
+            for high, row, sign in constraints:
+                outcome |= (sign ^ int_parity(outcome & row)) << high
+            outcomes.append(outcome)
+
+        if len(measured) == len(measurements):
+            keys = [format(outcome, f"0{k}b") for outcome in outcomes]
+        else:
+            position = {qubit: j for j, qubit in enumerate(measured)}
+            keys = ["".join(str((outcome >> position[qubit]) & 1) for qubit in reversed(measurements)) for outcome in outcomes]
+        return {key: probability for key in sorted(keys)}
+
+    def expectations(self, paulis):
+        """
+        Returns:
+            The exact expectation value of every Pauli string, 0 unless it is (up to its sign)
+            in the stabilizer group, in which case it is reduced to the identity by the echelon
+            form of the generators and the sign left over is the value.
+        """
+        n = self.num_qubits
+        rows, signs, pivots, rest, restSigns = echelon(*self.generators(list(range(n))))
+        strings = np.zeros((len(paulis), 2 * n), dtype=np.uint8)
+        for i, pauli in enumerate(paulis):
+            for qubit, letter in pauli:
+                strings[i, qubit] = letter in "XY"
+                strings[i, n + qubit] = letter in "YZ"
+        targets = np.concatenate([pack_bits(strings[:, :n]), pack_bits(strings[:, n:])], axis=1)
+        targetSigns = np.zeros(len(paulis), dtype=np.int64)
+        for row, column in enumerate(pivots):
+            word, bit = divmod(column, 64)
+            hits = np.flatnonzero((targets[:, word] >> np.uint64(bit)) & np.uint64(1))
+            if len(hits):
+                multiply(targets, targetSigns, hits, rows[row], signs[row])
+
+        # what is left has to be a product of the Z-only generators
+        half = targets.shape[1] // 2
+        basis = z_basis(rest, restSigns)
+        values = np.zeros(len(paulis))
+        for i in np.flatnonzero(~targets[:, :half].any(axis=1)):
+            z = int.from_bytes(targets[i, half:].tobytes(), "little")
+            sign = int(targetSigns[i])
+            while z and z.bit_length() - 1 in basis:
+                other, otherSign = basis[z.bit_length() - 1]
+                z ^= other
+                sign ^= otherSign
+            if z == 0:
+                values[i] = 1.0 - 2.0 * sign
+        return values
+
+
+class StabilizerEngine:
+    """
+    An in-process simulator for /api/komenco payloads that runs Clifford circuits (only the
+    CLIFFORD_GATES: h, s, sdg, x, y, z, cx, cy, cz, swap, iswap, dcx, ...) on a stabilizer
+    tableau, in polynomial time and memory, so GHZ states, Bernstein-Vazirani and the like run
+    for thousands of qubits. Anything else goes to the fallback engine, a StatevectorEngine by
+    default, fallback=False refuses it instead.
+
+    Pass it as engine= to AutomatskiKomencoLocalTransport or AutomatskiKomencoLocalServer.
+    """
+
+    def __init__(self, fallback=None):
+        self.fallback = StatevectorEngine() if fallback is None else fallback
+
+    def execute(self, body):
+        """
+        Args:
+            body: A serialized circuit as produced by serialize_circuit
+
+        Returns:
+            {"measurements": {bitstring: probability}} with the topK most likely outcomes of the
+            measured qubits, the first measured qubit being the rightmost bit.
+        """
+        measurements = body["measurements"]
+        if len(measurements) == 0:
+            raise(Exception("There are no measurements done at the end of the circuit."))
+
+        if not is_clifford(body["operations"]):
+            return self.delegate(body).execute(body)
+        tableau = self.tableau(body["num_qubits"], body["operations"])
+        return {"measurements": tableau.top_k(measurements, body.get("topK", 20))}
+
+    def expectation(self, body, paulis):
+        """
+        Returns:
+            The exact expectation value of every Pauli string (see AutomatskiKomencoExpectation)
+            in the state the circuit prepares.
+        """
+        if not is_clifford(body["operations"]):
+            return self.delegate(body).expectation(body, paulis)
+        return self.tableau(body["num_qubits"], body["operations"]).expectations(paulis)
+
+    def tableau(self, num_qubits, operations):
+        tableau = StabilizerTableau(num_qubits)
+        for operation in operations:
+            tableau.apply(operation["gate"], operation["qubits"])
+        return tableau
+
+    def delegate(self, body):
+        if not self.fallback:
+            gates = sorted({operation["gate"] for operation in body["operations"]} - set(CLIFFORD_GATES))
+            raise(Exception(f"not a Clifford circuit, the gates {gates} are not supported by the stabilizer engine"))
+        return self.fallback
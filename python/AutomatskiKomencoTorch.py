@@ -0,0 +1,72 @@
+from AutomatskiKomencoHybrid import HybridRunner, SHIFT
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+class ParameterShift(torch.autograd.Function):
+    """
+    Runs a (rows, parameters) tensor of circuit parameters through a HybridRunner with the
+    parameter-shift rule as its gradient.
+
+    When a gradient is needed the forward pass sends the rows together with all their
+    2 * parameters shifted copies in a single dispatch (coinciding rows are run once, see
+    HybridRunner) and keeps the Jacobian, so backward does not talk to the server at all.
+    Without one (eval, torch.no_grad()) only the rows are run.
+    """
+
+    @staticmethod
+    def forward(ctx, values, runner, shift=SHIFT, gradient=True):
+        rows = values.detach().cpu().numpy().astype(np.float64)
+        # grad mode is always off in here, the caller tells whether a backward can follow
+        if gradient and ctx.needs_input_grad[0]:
+            outputs, jacobian = runner.jacobian(rows, shift, with_outputs=True)
+            ctx.save_for_backward(torch.as_tensor(jacobian, dtype=values.dtype, device=values.device))
+        else:
+            outputs = runner.run(rows)
+        return torch.as_tensor(outputs, dtype=values.dtype, device=values.device)
+
+    @staticmethod
+    def backward(ctx, grad):
+        jacobian, = ctx.saved_tensors
+        return torch.einsum("nw,nwp->np", grad, jacobian), None, None, None
+
+
+class QuantumLayer(nn.Module):
+    """
+    A torch layer that runs a ParameterizedCircuit on Komenco with its parameters taken from
+    the input.
+
+    The last dimension of the input holds the values of the first circuit.parameters, all the
+    leading dimensions (e.g. batch x patches) are flattened into one batch. The whole batch is
+    bound in one bind_many call and sent at once, with run_many (concurrent single requests, or
+    dispatch="batch" for one /api/komenco/batch request), and the readout of every result is
+    assembled into the output tensor in one step (see AutomatskiKomencoHybrid.HybridRunner).
+    The output has the leading dimensions of the input and one value per measured qubit.
+
+    The last num_weights circuit parameters are trainable weights of the layer, shared by the
+    whole batch. Gradients with respect to the input and the weights come from the
+    parameter-shift rule (see ParameterShift), use readout="mean" to train through the layer.
+    """
+
+    def __init__(self, circuit, client, readout="mode", repetitions=1000, topK=20, dispatch="many", concurrency=None,
+                 num_weights=0, shift=SHIFT):
+        super().__init__()
+        self.runner = HybridRunner(circuit, client, readout, repetitions, topK, dispatch, concurrency)
+        self.shift = shift
+        self.num_inputs = self.runner.num_parameters - num_weights
+        if self.num_inputs < 0:
+            raise(Exception(f"the circuit has {self.runner.num_parameters} parameters, less than num_weights={num_weights}"))
+        self.weights = nn.Parameter(torch.rand(num_weights) * 2 * np.pi) if num_weights else None
+
+    def forward(self, x):
+        if x.shape[-1] != self.num_inputs:
+            raise(Exception(f"expected {self.num_inputs} values in the last dimension but got {x.shape[-1]}"))
+        leading = x.shape[:-1]
+        if not x.is_floating_point():
+            x = x.float()
+        values = x.reshape(-1, self.num_inputs)
+        if self.weights is not None:
+            values = torch.cat([values, self.weights.to(values.dtype).expand(len(values), -1)], dim=1)
+        output = ParameterShift.apply(values, self.runner, self.shift, torch.is_grad_enabled() and values.requires_grad)
+        return output.reshape(*leading, -1)
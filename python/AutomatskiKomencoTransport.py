@@ -0,0 +1,347 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from AutomatskiKomencoWire import CONTENT_TYPE, encode_circuit, decode_result, encode_batch, decode_results
+from AutomatskiKomencoWire import ACCEPT_ENCODING, compression_encoding, compression_level, compress
+from AutomatskiKomencoInstrumentation import PhaseTimings, Phase
+import json
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+
+# defaults for the connection pool shared by all the Komenco clients
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = None
+DEFAULT_MAX_RETRIES = 0
+
+BINARY_HEADERS = {"Content-Type": CONTENT_TYPE, "Accept": f"{CONTENT_TYPE}, application/json"}
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# the PhaseTimings of the request the current thread is making, None when nobody is timing it
+_current = threading.local()
+
+
+def current_timings():
+    return getattr(_current, "timings", None)
+
+
+class TimedConnection:
+    """
+    Adds the connect, send and server phases of every request to the current PhaseTimings.
+
+    server is the wait between the request being written and the response headers being read,
+    a plain HTTP connection is opened lazily inside request() so that time is taken out of send.
+    """
+
+    def connect(self):
+        tstart = time.perf_counter_ns()
+        super().connect()
+        timings = current_timings()
+        if timings is not None:
+            timings.add("connect", time.perf_counter_ns() - tstart)
+
+    def request(self, *args, **kwargs):
+        timings = current_timings()
+        if timings is None:
+            return super().request(*args, **kwargs)
+        connected = timings.get("connect", 0)
+        tstart = time.perf_counter_ns()
+        super().request(*args, **kwargs)
+        timings.add("send", time.perf_counter_ns() - tstart - (timings.get("connect", 0) - connected))
+
+    def getresponse(self, *args, **kwargs):
+        tstart = time.perf_counter_ns()
+        response = super().getresponse(*args, **kwargs)
+        timings = current_timings()
+        if timings is not None:
+            _current.responded = time.perf_counter_ns()
+            timings.add("server", _current.responded - tstart)
+        return response
+
+
+class TimedHTTPConnection(TimedConnection, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnection, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    # an HTTPAdapter whose connections report their phases, see TimedConnection
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+class AutomatskiKomencoTransport:
+    """
+    A keep-alive HTTP transport for one Komenco host.
+
+    Every client talking to the same host:port shares one instance (see get_transport),
+    so consecutive circuits reuse the same TCP connections instead of opening a new one
+    per request. pool_block bounds the number of open connections to pool_size, which
+    is what the old response.close() workaround for "too many connections" was for.
+
+    With binary the circuits are sent in the compact AutomatskiKomencoWire format. The first
+    binary request tells whether the server understands it, if it does not (or a circuit
+    cannot be encoded) JSON is used as before.
+
+    With compress ("gzip", "zstd" or True for the best available) request bodies are
+    compressed, at a level picked by their size and not at all when they are small. Like
+    binary it is dropped for good if the server does not take compressed requests.
+    Responses are compressed by the server whenever it wants, see ACCEPT_ENCODING.
+
+    post and post_batch add the time spent encoding the payload (serialize) and the connect,
+    send, server and receive time of their requests to the PhaseTimings they are given.
+    """
+
+    def __init__(self, host, port, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES, binary=False, compress=None):
+        self.host = host
+        self.port = port
+        self.url = f'http://{host}:{port}/api/komenco'
+        self.batch_url = f'http://{host}:{port}/api/komenco/batch'
+        # None until the first batch tells us whether the server understands batches
+        self.batch_supported = None
+        self.binary = binary
+        # None until the first binary request tells us whether the server understands it
+        self.binary_supported = None
+        self.compress = compression_encoding(compress)
+        # None until the first compressed request tells us whether the server understands it
+        self.compression_supported = None
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.executor = None
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.mount(pool_size)
+        self.session.headers["Connection"] = "keep-alive"
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+    def mount(self, pool_size):
+        replaced = self.session.adapters.get('http://')
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=self.max_retries, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool_size = pool_size
+        # the idle keep-alive connections of the old pool are closed, busy ones when they come back
+        if replaced is not None:
+            replaced.close()
+
+    def post(self, body, timings=None):
+        _current.timings = timings
+        try:
+            with Phase(timings, "serialize"):
+                data = self.encode(encode_circuit, body)
+            if data is not None:
+                response = self.send(self.url, data, BINARY_HEADERS)
+                if self.negotiate(response):
+                    with Phase(timings, "receive"):
+                        return self.decode(response, lambda content: decode_result(content)[0])
+
+            with Phase(timings, "serialize"):
+                data = self.encode_json(body)
+            response = self.send(self.url, data, JSON_HEADERS)
+            # reading the whole body hands the connection back to the pool
+            with Phase(timings, "receive"):
+                struct = response.json()
+            return struct
+        finally:
+            _current.timings = None
+
+    def post_batch(self, bodies, timings=None):
+        """
+        Post many serialized circuits in one request.
+
+        Returns:
+            The server's {"results": [...]} struct, or None when the server has no batch
+            endpoint, in which case the caller has to fall back to single requests.
+        """
+        if self.batch_supported is False:
+            return None
+
+        _current.timings = timings
+        try:
+            return self.send_batch(bodies, timings)
+        finally:
+            _current.timings = None
+
+    def send_batch(self, bodies, timings):
+        with Phase(timings, "serialize"):
+            data = self.encode(encode_batch, bodies)
+        if data is not None:
+            response = self.send(self.batch_url, data, BINARY_HEADERS)
+            # a missing batch endpoint is found out by the JSON request below
+            if response.status_code not in (404, 405, 501) and self.negotiate(response):
+                self.batch_supported = True
+                with Phase(timings, "receive"):
+                    return self.decode(response, decode_results)
+            response.close()
+
+        with Phase(timings, "serialize"):
+            data = self.encode_json({"circuits": bodies})
+        response = self.send(self.batch_url, data, JSON_HEADERS)
+        if response.status_code in (404, 405, 501):
+            response.close()
+            self.batch_supported = False
+            return None
+
+        with Phase(timings, "receive"):
+            struct = response.json()
+        self.batch_supported = True
+        return struct
+
+    def send(self, url, data, headers):
+        # compresses the body when it pays off, and sends it as is if the server cannot take that
+        level = None
+        # the first binary request goes uncompressed, a refusal would not tell which of the two the server lacks
+        if self.compress and self.compression_supported is not False and not (headers is BINARY_HEADERS and self.binary_supported is None):
+            level = compression_level(self.compress, len(data))
+        if level is not None:
+            with Phase(current_timings(), "send"):
+                compressed = compress(data, self.compress, level)
+            response = self.request(url, compressed, {**headers, "Content-Encoding": self.compress})
+            # only 400 and 415 say the encoding was refused, anything else is the answer to the request
+            if self.compression_supported is True or response.status_code not in (400, 415):
+                if response.status_code == 200:
+                    self.compression_supported = True
+                return response
+            response.close()
+            self.compression_supported = False
+
+        return self.request(url, data, headers)
+
+    def request(self, url, data, headers):
+        response = self.session.post(url, data=data, headers=headers, timeout=self.timeout)
+        # the body has been read by now, that is the start of receive
+        timings = current_timings()
+        if timings is not None and getattr(_current, "responded", None) is not None:
+            timings.add("receive", time.perf_counter_ns() - _current.responded)
+            _current.responded = None
+        return response
+
+    @staticmethod
+    def encode_json(payload):
+        # what requests does for json=, done here so that the bytes can be compressed
+        return json.dumps(payload, allow_nan=False).encode("utf-8")
+
+    def encode(self, encoder, payload):
+        # the binary request, or None to send JSON
+        if not self.binary or self.binary_supported is False:
+            return None
+        try:
+            return encoder(payload)
+        except Exception:
+            return None
+
+    def negotiate(self, response):
+        # True if the binary request was understood, an old server answers e.g. 400 or 415
+        if self.binary_supported is True:
+            return True
+        if response.status_code == 200:
+            self.binary_supported = True
+            return True
+        # any other failure is one of the request or of the server, it takes the normal error path
+        if response.status_code not in (400, 415):
+            return True
+        response.close()
+        self.binary_supported = False
+        return False
+
+    @staticmethod
+    def decode(response, decoder):
+        # errors (and servers that only answer JSON) still come back as JSON
+        contentType = response.headers.get("Content-Type", "")
+        if contentType.startswith(CONTENT_TYPE):
+            return decoder(response.content)
+        if response.status_code != 200 and not contentType.startswith("application/json"):
+            raise(Exception(f"the server answered {response.status_code}: {response.text[:200]}"))
+        return response.json()
+
+    def post_many(self, bodies, timings=None):
+        # one request per circuit, spread over the pooled connections, in submission order
+        if timings is None:
+            return list(self.get_executor().map(self.post, bodies))
+        perBody = [PhaseTimings() for body in bodies]
+        structs = list(self.get_executor().map(self.post, bodies, perBody))
+        for bodyTimings in perBody:
+            timings.merge(bodyTimings)
+        return structs
+
+    async def post_async(self, body, timings=None):
+        # the blocking post runs on one worker thread per pooled connection
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.get_executor(), self.post, body, timings)
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="komenco")
+            return self.executor
+
+    def grow(self, pool_size):
+        """
+        Make room for at least pool_size concurrent requests.
+
+        The pool never shrinks, it is shared by every client of host:port. Connections already
+        handed out by the old pool are closed when they come back instead of being kept alive.
+        """
+        with self.lock:
+            if pool_size <= self.pool_size:
+                return
+            self.mount(pool_size)
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+        self.session.close()
+
+
+_transports = {}
+_transportsLock = threading.Lock()
+
+
+def get_transport(host, port, **kwargs):
+    """
+    Return the shared transport for host:port, creating it on first use.
+
+    Args:
+        host: The Komenco server host
+        port: The Komenco server port
+        kwargs: Passed to AutomatskiKomencoTransport when the transport is created
+
+    Returns:
+        The AutomatskiKomencoTransport shared by every client of host:port.
+    """
+    key = (host, port)
+    with _transportsLock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = AutomatskiKomencoTransport(host, port, **kwargs)
+            _transports[key] = transport
+    return transport
+
+
+def close_transports():
+    with _transportsLock:
+        for transport in _transports.values():
+            transport.close()
+        _transports.clear()
@@ -0,0 +1,248 @@
+from array import array
+from itertools import accumulate, chain
+from operator import itemgetter
+import gzip
+import struct
+import sys
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# the media type of the binary encoding, JSON stays the fallback
+CONTENT_TYPE = "application/x-komenco"
+
+CIRCUIT_MAGIC = b"KMC1"
+BATCH_MAGIC = b"KMB1"
+RESULT_MAGIC = b"KMR1"
+RESULTS_MAGIC = b"KMS1"
+
+# num_qubits, topK, gate names, operations, measurements, qubit indices, params
+CIRCUIT_HEADER = struct.Struct("<4s7I")
+# bitstring width, number of bitstrings
+RESULT_HEADER = struct.Struct("<4s2I")
+COUNT = struct.Struct("<4sI")
+LENGTH = struct.Struct("<I")
+
+# request bodies smaller than this are not worth compressing
+COMPRESSION_MIN_SIZE = 1024
+# (largest payload size, gzip level, zstd level), big payloads get the cheaper levels
+COMPRESSION_LEVELS = [(64 * 1024, 6, 6), (1024 * 1024, 4, 3), (None, 1, 1)]
+# what the clients accept for responses, urllib3 decodes zstd when zstandard is installed
+ACCEPT_ENCODING = "zstd, gzip, deflate" if zstandard is not None else "gzip, deflate"
+
+getGate = itemgetter("gate")
+getQubits = itemgetter("qubits")
+getParams = itemgetter("params")
+
+
+def pack(typecode, values):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(typecode, data, offset, count):
+    unpacked = array(typecode)
+    end = offset + count * unpacked.itemsize
+    unpacked.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked, end
+
+
+def encode_circuit(body):
+    """
+    Encodes a serialized circuit into the binary wire format.
+
+    The message carries its own opcode table (the distinct gate names), then one uint16
+    opcode, qubit count and param count per operation, all the qubit indices as uint32, all
+    the params as float64 and the measured qubits as uint32, little endian.
+
+    Raises:
+        Exception: If the circuit does not fit the format (e.g. a symbolic param), the caller
+            sends it as JSON instead.
+    """
+    operations = body["operations"]
+    gates = list(map(getGate, operations))
+    names = list(dict.fromkeys(gates))
+    if len(names) > 0xFFFF:
+        raise(Exception("too many distinct gates for the binary format"))
+    opcode = {name: index for index, name in enumerate(names)}
+
+    qubits = list(map(getQubits, operations))
+    params = list(map(getParams, operations))
+    measurements = body["measurements"]
+    try:
+        paramData = pack("d", chain.from_iterable(params))
+        qubitData = pack("I", chain.from_iterable(qubits))
+        measurementData = pack("I", measurements)
+        qubitCounts = pack("H", map(len, qubits))
+        paramCounts = pack("H", map(len, params))
+    except (TypeError, OverflowError):
+        raise(Exception("only numeric params and qubit indices can be sent in the binary format"))
+
+    encodedNames = b"".join(LENGTH.pack(len(name)) + name for name in (name.encode("utf-8") for name in names))
+    return b"".join([
+        CIRCUIT_HEADER.pack(CIRCUIT_MAGIC, body["num_qubits"], body["topK"], len(names), len(operations),
+                            len(measurements), len(qubitData) // 4, len(paramData) // 8),
+        encodedNames,
+        pack("H", map(opcode.__getitem__, gates)),
+        qubitCounts,
+        paramCounts,
+        qubitData,
+        paramData,
+        measurementData,
+    ])
+
+
+def decode_circuit(data, offset=0):
+    magic, num_qubits, topK, numNames, numOperations, numMeasurements, numQubits, numParams = CIRCUIT_HEADER.unpack_from(data, offset)
+    if magic != CIRCUIT_MAGIC:
+        raise(Exception("not a binary Komenco circuit"))
+    offset += CIRCUIT_HEADER.size
+
+    names = []
+    for i in range(numNames):
+        length, = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        names.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+
+    opcodes, offset = unpack("H", data, offset, numOperations)
+    qubitCounts, offset = unpack("H", data, offset, numOperations)
+    paramCounts, offset = unpack("H", data, offset, numOperations)
+    qubits, offset = unpack("I", data, offset, numQubits)
+    params, offset = unpack("d", data, offset, numParams)
+    measurements, offset = unpack("I", data, offset, numMeasurements)
+
+    qubits = qubits.tolist()
+    params = params.tolist()
+    qubitEnds = list(accumulate(qubitCounts))
+    paramEnds = list(accumulate(paramCounts))
+    operations = [{"gate": names[opcode], "params": params[paramEnd - paramCount:paramEnd], "qubits": qubits[qubitEnd - qubitCount:qubitEnd]}
+                  for opcode, qubitCount, qubitEnd, paramCount, paramEnd in zip(opcodes, qubitCounts, qubitEnds, paramCounts, paramEnds)]
+
+    body = {"num_qubits": num_qubits, "operations": operations, "measurements": measurements.tolist(), "topK": topK}
+    return body, offset
+
+
+def encode_result(response):
+    """
+    Encodes a {"measurements": {bitstring: probability}} response, bitstrings packed as
+    big endian integers of ceil(width / 8) bytes followed by the float64 probabilities.
+
+    Returns:
+        The bytes, or None for anything else (e.g. an error) which is sent as JSON.
+    """
+    if set(response) != {"measurements"}:
+        return None
+    measurements = response["measurements"]
+    bitstrings = list(measurements.keys())
+    width = len(bitstrings[0]) if bitstrings else 0
+    if any(len(bitstring) != width for bitstring in bitstrings):
+        return None
+    size = (width + 7) // 8
+    try:
+        packed = b"".join(int(bitstring, 2).to_bytes(size, "big") for bitstring in bitstrings) if width else b""
+    except ValueError:
+        return None
+    return RESULT_HEADER.pack(RESULT_MAGIC, width, len(bitstrings)) + packed + pack("d", measurements.values())
+
+
+def decode_result(data, offset=0):
+    magic, width, count = RESULT_HEADER.unpack_from(data, offset)
+    if magic != RESULT_MAGIC:
+        raise(Exception("not a binary Komenco result"))
+    offset += RESULT_HEADER.size
+    size = (width + 7) // 8
+    pattern = f"0{width}b" if width else ""
+    fromBytes = int.from_bytes
+    bitstrings = [format(fromBytes(data[start:start + size], "big"), pattern) if width else "" for start in range(offset, offset + count * size, size)]
+    probabilities, offset = unpack("d", data, offset + count * size, count)
+    return {"measurements": dict(zip(bitstrings, probabilities.tolist()))}, offset
+
+
+def encode_batch(bodies):
+    return COUNT.pack(BATCH_MAGIC, len(bodies)) + b"".join(encode_circuit(body) for body in bodies)
+
+
+def decode_batch(data):
+    magic, count = COUNT.unpack_from(data, 0)
+    if magic != BATCH_MAGIC:
+        raise(Exception("not a binary Komenco batch"))
+    offset = COUNT.size
+    bodies = []
+    for i in range(count):
+        body, offset = decode_circuit(data, offset)
+        bodies.append(body)
+    return bodies
+
+
+def encode_results(responses):
+    """
+    Encodes the results of a batch, or returns None if any of them has to go as JSON.
+    """
+    encoded = [encode_result(response) for response in responses]
+    if any(data is None for data in encoded):
+        return None
+    return COUNT.pack(RESULTS_MAGIC, len(encoded)) + b"".join(encoded)
+
+
+def decode_results(data):
+    magic, count = COUNT.unpack_from(data, 0)
+    if magic != RESULTS_MAGIC:
+        raise(Exception("not a binary Komenco batch result"))
+    offset = COUNT.size
+    responses = []
+    for i in range(count):
+        response, offset = decode_result(data, offset)
+        responses.append(response)
+    return {"results": responses}
+
+
+def compression_encoding(compress):
+    """
+    Args:
+        compress: "gzip", "zstd", True for the best one available or None / False for none
+
+    Returns:
+        The Content-Encoding to compress requests with, or None.
+    """
+    if not compress:
+        return None
+    if compress is True:
+        return "zstd" if zstandard is not None else "gzip"
+    if compress == "zstd" and zstandard is None:
+        raise(Exception("zstd compression needs the zstandard package, pip install zstandard"))
+    if compress not in ("gzip", "zstd"):
+        raise(Exception(f"unknown compression: '{compress}', use 'gzip' or 'zstd'"))
+    return compress
+
+
+def compression_level(encoding, size):
+    """
+    Returns:
+        The level to compress size bytes with, None if they are better sent as they are.
+    """
+    if size < COMPRESSION_MIN_SIZE:
+        return None
+    for limit, gzipLevel, zstdLevel in COMPRESSION_LEVELS:
+        if limit is None or size <= limit:
+            return gzipLevel if encoding == "gzip" else zstdLevel
+
+
+def compress(data, encoding, level):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def decompress(data, encoding):
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise(Exception(f"unsupported Content-Encoding: '{encoding}'"))
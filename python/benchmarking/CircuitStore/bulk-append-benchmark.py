@@ -0,0 +1,44 @@
+import numpy as np
+import time
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+
+# Builds a hardware efficient ansatz (ry/rz rotation layers and a cx ladder) gate by gate
+# and with the bulk layer builders, for both operation stores.
+
+numOfQubits = 500
+numOfLayers = 200
+
+rng = np.random.default_rng(12345)
+thetas = rng.uniform(0.0, 2 * np.pi, size=(numOfLayers, 2, numOfQubits))
+qubits = np.arange(numOfQubits)
+
+
+def per_gate(circuit):
+    for layer in range(numOfLayers):
+        for q in range(numOfQubits):
+            circuit.ry(thetas[layer, 0, q], q)
+        for q in range(numOfQubits):
+            circuit.rz(thetas[layer, 1, q], q)
+        for q in range(numOfQubits - 1):
+            circuit.cx(q, q + 1)
+
+
+def bulk(circuit):
+    for layer in range(numOfLayers):
+        circuit.ry_layer(thetas[layer, 0], qubits)
+        circuit.rz_layer(thetas[layer, 1], qubits)
+        circuit.cx_pairs(qubits[:-1], qubits[1:])
+
+
+for circuitClass in [QuantumCircuit, CompactQuantumCircuit]:
+    timings = {}
+    for builder in [per_gate, bulk]:
+        circuit = circuitClass(numOfQubits)
+        tstart = time.perf_counter()
+        builder(circuit)
+        timings[builder.__name__] = time.perf_counter() - tstart
+    gates = len(circuit.operations)
+    print(f"{circuitClass.__name__:>22}: {gates} gates  per gate {timings['per_gate']:6.3f}s  "
+          f"bulk {timings['bulk']:6.3f}s  speedup {timings['per_gate'] / timings['bulk']:6.1f}x")
@@ -0,0 +1,52 @@
+import numpy as np
+import time
+import tracemalloc
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+
+# Builds a 1-D transverse field Ising circuit (the shape of QASMBench ising_model_n1000)
+# with the list-of-lists QuantumCircuit and the array-backed CompactQuantumCircuit and
+# compares build time, memory held by the operations and serialization time.
+
+numOfQubits = 1000
+
+
+def build_ising(circuitClass, numberOfSteps):
+    circuit = circuitClass(numOfQubits)
+    for q in range(numOfQubits):
+        circuit.h(q)
+    for step in range(numberOfSteps):
+        for q in range(numOfQubits - 1):
+            circuit.cx(q, q + 1)
+            circuit.rz(0.1 * step, q + 1)
+            circuit.cx(q, q + 1)
+        for q in range(numOfQubits):
+            circuit.rx(0.2, q)
+    circuit.measure_all()
+    return circuit
+
+
+def measure(circuitClass, numberOfSteps):
+    tstart = time.perf_counter()
+    circuit = build_ising(circuitClass, numberOfSteps)
+    buildTime = time.perf_counter() - tstart
+
+    tracemalloc.start()
+    circuit = build_ising(circuitClass, numberOfSteps)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sampler = AutomatskiKomencoNative(host="127.0.0.1", port=0)
+    tstart = time.perf_counter()
+    sampler.serialize_circuit(circuit, topK=20)
+    serializeTime = time.perf_counter() - tstart
+
+    return len(circuit.operations), buildTime, memory, serializeTime
+
+
+for numberOfSteps in [33, 333]:
+    for circuitClass in [QuantumCircuit, CompactQuantumCircuit]:
+        gates, buildTime, memory, serializeTime = measure(circuitClass, numberOfSteps)
+        print(f"{circuitClass.__name__:>22}: {gates:>8} operations  build {buildTime:7.3f}s  "
+              f"memory {memory / 2**20:8.1f}MiB  serialize {serializeTime:7.3f}s")
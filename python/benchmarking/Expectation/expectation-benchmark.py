@@ -0,0 +1,82 @@
+import argparse
+import time
+import numpy as np
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoLocal import StatevectorEngine, AutomatskiKomencoLocalTransport
+from AutomatskiKomencoLocalServer import AutomatskiKomencoLocalServer
+
+# The energy of a --qubits Heisenberg chain (XX + YY + ZZ on neighbours and a Z field) in a
+# layered ry/cx ansatz state, against the local stand-in server simulating with the statevector engine.
+# The serial loop is what native/expectation.py used to do: one measured circuit per Pauli
+# string, counts rounded to --repetitions and a Python loop over the bitstrings.
+# expectation() groups the strings by basis (3 circuits here) and sends them in one batch,
+# with the in-process transport it is exact and runs no circuits at all.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--qubits", type=int, default=12)
+parser.add_argument("--layers", type=int, default=3)
+parser.add_argument("--repetitions", type=int, default=1000)
+parser.add_argument("--latency", type=float, default=0.0)
+args = parser.parse_args()
+
+n = args.qubits
+rng = np.random.default_rng(0)
+circuit = QuantumCircuit(n)
+for layer in range(args.layers):
+    for q in range(n):
+        circuit.ry(rng.uniform(0, 2 * np.pi), q)
+    for q in range(n - 1):
+        circuit.cx(q, q + 1)
+
+def label(paulis):
+    # {qubit: letter} as a label, qubit 0 rightmost
+    return "".join(paulis.get(q, "I") for q in reversed(range(n)))
+
+hamiltonian = {}
+for q in range(n - 1):
+    for letter in "XYZ":
+        hamiltonian[label({q: letter, q + 1: letter})] = 1.0
+for q in range(n):
+    hamiltonian[label({q: "Z"})] = 0.5
+
+server = AutomatskiKomencoLocalServer(latency=args.latency, engine=StatevectorEngine()).start()
+sampler = AutomatskiKomencoNative(server.host, server.port)
+local = AutomatskiKomencoNative(None, None, transport=AutomatskiKomencoLocalTransport())
+
+def serial_energy():
+    energy = 0.0
+    for observable, coefficient in hamiltonian.items():
+        measured = QuantumCircuit(n)
+        measured.operations = list(circuit.operations)
+        for q, letter in enumerate(reversed(observable)):
+            if letter == "X":
+                measured.h(q)
+            elif letter == "Y":
+                measured.sdg(q)
+                measured.h(q)
+        measured.measure_all()
+        measurements = sampler.run(measured, repetitions=args.repetitions, topK=2 ** n)['result']
+        support = [q for q, letter in enumerate(reversed(observable)) if letter != "I"]
+        value = sum(count * (-1) ** sum(int(key[n - 1 - q]) for q in support) for key, count in measurements.items())
+        energy += coefficient * value / sum(measurements.values())
+    return energy
+
+print(f"{n} qubits, {len(hamiltonian)} Pauli strings")
+runs = [("serial", serial_energy),
+        ("expectation", lambda: sampler.expectation(circuit, hamiltonian)),
+        ("expectation exact", lambda: local.expectation(circuit, hamiltonian))]
+energies = {}
+for name, run in runs:
+    requests = server.requests
+    tstart = time.perf_counter()
+    energies[name] = run()
+    elapsed = time.perf_counter() - tstart
+    if name == "serial":
+        serialTime = elapsed
+    print(f"{name:>18}: {elapsed:8.3f}s  {server.requests - requests:4} circuits run  energy {energies[name]: .10f}  ({serialTime / elapsed:.1f}x)")
+
+print("error of the rounded counts:", abs(energies["serial"] - energies["expectation exact"]))
+print("error of expectation():", abs(energies["expectation"] - energies["expectation exact"]))
+server.stop()
@@ -0,0 +1,91 @@
+import glob
+import math
+import time
+import numpy as np
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoMetrics import *
+from AutomatskiKomencoNative import AutomatskiKomencoNative
+from AutomatskiKomencoQASM import load_circuit
+from AutomatskiKomencoLocal import StatevectorEngine
+
+# Scores every QASMBench small/ and medium/ circuit the local statevector engine can run: the
+# ideal top-K distribution is the reference and resultsPerCircuit sampled "device" results are
+# scored against it. The dict loop of KL-Divergence-Example-2.py (plus the same loop for the
+# other metrics) is compared with AutomatskiKomencoMetrics.score.
+
+topK = 64
+shots = 1000
+resultsPerCircuit = 20
+maxQubits = 16
+
+def loop_scores(P_ref, P_device, epsilon=1e-10):
+    # KL-Divergence-Example-2.py, extended with the other metrics, one pair at a time
+    refTotal, deviceTotal = sum(P_ref.values()), sum(P_device.values())
+    P_ref = {state: p / refTotal for state, p in P_ref.items()}
+    P_device = {state: count / deviceTotal for state, count in P_device.items()}
+    all_states = set(P_ref.keys()).union(set(P_device.keys()))
+    kl_div = js_div = overlap = tv = 0.0
+    for state in all_states:
+        p = P_ref.get(state, 0)
+        q = P_device.get(state, 0)
+        m = (p + q) / 2
+        if p > 0:
+            kl_div += p * math.log(p / max(q, epsilon))
+            js_div += p * math.log(p / m) / 2
+        if q > 0:
+            js_div += q * math.log(q / m) / 2
+        overlap += math.sqrt(p * q)
+        tv += abs(p - q) / 2
+    return kl_div, js_div, overlap ** 2, tv
+
+engine = StatevectorEngine(max_qubits=maxQubits)
+client = AutomatskiKomencoNative("localhost", 80)
+rng = np.random.default_rng(12345)
+
+suite = {}
+for filename in sorted(glob.glob("../QASMBench/small/*/*.qasm") + glob.glob("../QASMBench/medium/*/*.qasm")):
+    try:
+        body = client.serialize_circuit(load_circuit(filename), topK)
+        reference = engine.execute(body)["measurements"]
+    except Exception:
+        continue
+    bitstrings = list(reference)
+    probabilities = np.array(list(reference.values()))
+    samples = rng.multinomial(shots, probabilities / probabilities.sum(), size=resultsPerCircuit)
+    results = [{bitstring: int(count) for bitstring, count in zip(bitstrings, row) if count} for row in samples]
+    suite[filename.split("/")[-1][:-5]] = (reference, results)
+
+tstart = time.perf_counter()
+looped = {name: [loop_scores(reference, result) for result in results] for name, (reference, results) in suite.items()}
+loopTime = time.perf_counter() - tstart
+
+tstart = time.perf_counter()
+vectorized = {name: score(reference, results) for name, (reference, results) in suite.items()}
+vectorTime = time.perf_counter() - tstart
+
+difference = max(np.max(np.abs(np.array(looped[name]) - np.stack([vectorized[name][metric] for metric in ["kl", "js", "hellinger_fidelity", "total_variation"]], axis=1)))
+                 for name in suite)
+print(f"{len(suite)} circuits x {resultsPerCircuit} results, topK {topK}, {shots} shots")
+print(f"dict loop (KL, JS, Hellinger, TV):       {loopTime * 1e3:8.2f}ms")
+print(f"AutomatskiKomencoMetrics.score (+ HOP):   {vectorTime * 1e3:8.2f}ms  ({loopTime / vectorTime:.1f}x)")
+print(f"largest difference: {difference:.2e}")
+
+# larger supports and batches, where the per-key Python work of the loop dominates
+print(f"\n{'support':>8} {'results':>8} | {'dict loop':>10} {'score':>10}")
+for support, count in [(256, 100), (4096, 100), (16384, 200)]:
+    bitstrings = [format(i, "020b") for i in rng.choice(2**20, support, replace=False)]
+    reference = dict(zip(bitstrings, rng.dirichlet(np.ones(support))))
+    results = [dict(zip(bitstrings, rng.multinomial(100 * support, list(reference.values())).tolist())) for i in range(count)]
+    tstart = time.perf_counter()
+    [loop_scores(reference, result) for result in results]
+    loopTime = time.perf_counter() - tstart
+    tstart = time.perf_counter()
+    score(reference, results)
+    vectorTime = time.perf_counter() - tstart
+    print(f"{support:>8} {count:>8} | {loopTime * 1e3:>8.1f}ms {vectorTime * 1e3:>8.1f}ms  ({loopTime / vectorTime:.1f}x)")
+
+print(f"\n{'benchmark':>20} {'KL':>8} {'JS':>8} {'fidelity':>9} {'TV':>8} {'HOP':>8}")
+for name, scores in vectorized.items():
+    print(f"{name:>20} " + " ".join(f"{np.mean(scores[metric]):>8.4f}" for metric in ["kl", "js", "hellinger_fidelity", "total_variation"])
+          + f" {np.mean(scores['heavy_output_probability']):>8.4f}")
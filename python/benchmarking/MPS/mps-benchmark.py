@@ -0,0 +1,89 @@
+import argparse
+import time
+import numpy as np
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoQASM import load
+from AutomatskiKomencoLocal import StatevectorEngine
+from AutomatskiKomencoMPS import MPSEngine
+from AutomatskiKomencoExpectation import parse_pauli, statevector_expectations
+
+# The QASMBench Ising circuits that are far too wide for a statevector on the MPS engine, then a
+# transverse-field Ising Trotter chain (rzz + rx layers) that builds up entanglement: at
+# --qubits against the exact statevector for a range of --max-bonds, to see how the reported
+# truncation error relates to the actual error of the probabilities and of the energy, and at
+# --widths with the largest bond dimension to see time and memory.
+# The native QASM reader is used, ising_model_n1000.qasm measures into a creg it never declares.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--qubits", type=int, default=20)
+parser.add_argument("--steps", type=int, default=10)
+parser.add_argument("--max-bonds", type=int, nargs="+", default=[2, 4, 8, 16, 32, 64])
+parser.add_argument("--widths", type=int, nargs="+", default=[100, 500, 1000])
+parser.add_argument("--samples", type=int, default=1000)
+args = parser.parse_args()
+
+def run(engine, body):
+    tstart = time.perf_counter()
+    result = engine.execute(body)
+    return time.perf_counter() - tstart, result
+
+def report(name, body, elapsed, stats):
+    print(f"{name:>24} {body['num_qubits']:>6} {len(body['operations']):>6} {elapsed:>8.2f}s {stats['max_bond']:>5} "
+          f"{stats['truncation_error']:>10.2e} {stats['peak_memory_bytes'] / 2 ** 20:>9.2f}MB {stats['swaps']:>6}")
+
+header = f"{'circuit':>24} {'qubits':>6} {'gates':>6} {'time':>9} {'bond':>5} {'truncation':>10} {'memory':>11} {'swaps':>6}"
+print(header)
+for name in ["ising_model_n500", "ising_model_n1000"]:
+    body = load(f"../QASMBench/large/{name}/{name}.qasm")
+    elapsed, result = run(MPSEngine(samples=args.samples, seed=0), body)
+    report(name, body, elapsed, result["mps"])
+
+def trotter_chain(n, steps, dt=0.2, J=1.0, h=1.0):
+    circuit = QuantumCircuit(n)
+    for q in range(n):
+        circuit.h(q)
+    for step in range(steps):
+        for start in (0, 1):
+            for q in range(start, n - 1, 2):
+                circuit.rzz(2 * J * dt, q, q + 1)
+        for q in range(n):
+            circuit.rx(2 * h * dt, q)
+    circuit.measure_all()
+    return circuit
+
+def energy_terms(n, J=1.0, h=1.0):
+    # H = -J sum Z_q Z_q+1 - h sum X_q
+    label = lambda letters: "".join(letters.get(q, "I") for q in reversed(range(n)))
+    terms = [(label({q: "Z", q + 1: "Z"}), -J) for q in range(n - 1)] + [(label({q: "X"}), -h) for q in range(n)]
+    return [parse_pauli(text, n) for text, coefficient in terms], np.array([coefficient for text, coefficient in terms])
+
+serializer = AutomatskiKomencoNative(host="127.0.0.1", port=0)
+n = args.qubits
+body = serializer.serialize_circuit(trotter_chain(n, args.steps), 20)
+paulis, coefficients = energy_terms(n)
+
+statevector = StatevectorEngine()
+tstart = time.perf_counter()
+exact = statevector.statevector(n, body["operations"])
+probabilities = statevector.probabilities(exact, n, body["measurements"])
+exactEnergy = coefficients @ statevector_expectations(exact, paulis)
+print()
+print(f"trotter chain, {n} qubits, {args.steps} steps: statevector {time.perf_counter() - tstart:.2f}s, energy {exactEnergy:.8f}")
+print(f"{'max bond':>8} {'time':>9} {'truncation':>10} {'fidelity':>10} {'max |dp|':>10} {'|dE|':>10} {'memory':>11}")
+for maxBond in args.max_bonds:
+    engine = MPSEngine(max_bond=maxBond, samples=args.samples, seed=0)
+    elapsed, result = run(engine, body)
+    stats = result["mps"]
+    error = max(abs(p - probabilities[int(key, 2)]) for key, p in result["measurements"].items())
+    energy = coefficients @ engine.expectation(body, paulis)
+    print(f"{maxBond:>8} {elapsed:>8.2f}s {stats['truncation_error']:>10.2e} {stats['fidelity']:>10.6f} "
+          f"{error:>10.2e} {abs(energy - exactEnergy):>10.2e} {stats['peak_memory_bytes'] / 2 ** 20:>9.2f}MB")
+
+print()
+print(header)
+for width in args.widths:
+    body = serializer.serialize_circuit(trotter_chain(width, args.steps), 20)
+    elapsed, result = run(MPSEngine(max_bond=max(args.max_bonds), samples=args.samples, seed=0), body)
+    report("trotter_chain", body, elapsed, result["mps"])
@@ -0,0 +1,36 @@
+import qiskit.qasm2
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoQiskit import *
+from AutomatskiKomencoOptimize import optimize_circuit
+
+# Runs the gate fusion pass over every QASMBench circuit and reports the gate counts and
+# JSON payload sizes before and after, and how long the pass takes.
+
+serializer = AutomatskiKomencoQiskit(host="127.0.0.1", port=0)
+
+print(f"{'benchmark':>24} {'gates':>8} {'fused':>8} {'bytes':>10} {'fused':>10} {'time':>10}")
+for suite in ["small", "medium", "large"]:
+    for filename in sorted(glob.glob(f"./{suite}/*/*.qasm")):
+        name = os.path.basename(filename)[:-5]
+        try:
+            circuit = qiskit.qasm2.load(filename)
+            with contextlib.redirect_stdout(io.StringIO()):
+                body = serializer.serialize_circuit(circuit, topK=20)
+            before = len(json.dumps(body))
+        except Exception as e:
+            print(f"{name:>24} skipped: {e}")
+            continue
+
+        tstart = time.perf_counter()
+        optimized, stats = optimize_circuit(body)
+        elapsed = time.perf_counter() - tstart
+
+        after = len(json.dumps(optimized))
+        print(f"{name:>24} {stats['gates_before']:>8} {stats['gates_after']:>8} {before:>10} {after:>10} {elapsed * 1e3:>8.1f}ms")
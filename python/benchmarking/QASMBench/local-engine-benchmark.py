@@ -0,0 +1,40 @@
+import qiskit.qasm2
+import contextlib
+import glob
+import io
+import os
+import time
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoQiskit import *
+from AutomatskiKomencoLocal import StatevectorEngine
+
+# Runs every QASMBench circuit under small/ and medium/ on the in-process statevector engine
+# and reports the simulation time per circuit. Circuits using operations Komenco does not
+# support (reset, custom gates, ...) are reported as skipped.
+
+repeats = 3
+
+serializer = AutomatskiKomencoQiskit(host="127.0.0.1", port=0)
+engine = StatevectorEngine()
+
+print(f"{'benchmark':>24} {'qubits':>6} {'gates':>6} {'best':>10} {'mean':>10}")
+for suite in ["small", "medium"]:
+    for filename in sorted(glob.glob(f"./{suite}/*/*.qasm")):
+        name = os.path.basename(filename)[:-5]
+        try:
+            circuit = qiskit.qasm2.load(filename)
+            with contextlib.redirect_stdout(io.StringIO()):
+                body = serializer.serialize_circuit(circuit, topK=20)
+
+            timings = []
+            for i in range(repeats):
+                tstart = time.perf_counter()
+                engine.execute(body)
+                timings.append(time.perf_counter() - tstart)
+        except Exception as e:
+            print(f"{name:>24} skipped: {e}")
+            continue
+
+        print(f"{name:>24} {body['num_qubits']:>6} {len(body['operations']):>6} "
+              f"{min(timings) * 1e3:>8.2f}ms {sum(timings) / repeats * 1e3:>8.2f}ms")
@@ -0,0 +1,66 @@
+import contextlib
+import glob
+import io
+import os
+import resource
+import subprocess
+import time
+import sys
+sys.path.append('../../')
+
+# Loads every QASMBench large/ circuit into a Komenco payload with qiskit.qasm2 + serialize_circuit
+# and with the dependency-free AutomatskiKomencoQASM reader. Every load runs in a fresh process so
+# that the import time and the peak memory (max RSS, imports included) are those of a cold start.
+
+def child(loader, filename):
+    tstart = time.perf_counter()
+    if loader == "qiskit":
+        import qiskit.qasm2
+        from AutomatskiKomencoQiskit import AutomatskiKomencoQiskit
+        serializer = AutomatskiKomencoQiskit(host="127.0.0.1", port=0)
+    else:
+        from AutomatskiKomencoQASM import load
+    imported = time.perf_counter()
+
+    try:
+        if loader == "qiskit":
+            circuit = qiskit.qasm2.load(filename)
+            with contextlib.redirect_stdout(io.StringIO()):
+                body = serializer.serialize_circuit(circuit, topK=20)
+        else:
+            body = load(filename, topK=20)
+    except Exception as e:
+        print(f"error {str(e).splitlines()[0]}")
+        return
+    loaded = time.perf_counter()
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"ok {imported - tstart} {loaded - imported} {maxrss} {len(body['operations'])}")
+
+def measure(loader, filename):
+    output = subprocess.run([sys.executable, __file__, loader, filename], capture_output=True, text=True).stdout.split()
+    if not output or output[0] != "ok":
+        return None, " ".join(output[1:])[:40]
+    return [float(value) for value in output[1:]], None
+
+if len(sys.argv) == 3:
+    child(sys.argv[1], sys.argv[2])
+    sys.exit(0)
+
+print(f"{'benchmark':>20} {'gates':>7} | {'qiskit import':>13} {'load':>9} {'rss':>8} | {'native import':>13} {'load':>9} {'rss':>8} | {'load speedup':>12}")
+for filename in sorted(glob.glob("./large/*/*.qasm")):
+    name = os.path.basename(filename)[:-5]
+    native, error = measure("native", filename)
+    if native is None:
+        print(f"{name:>20} native skipped: {error}")
+        continue
+    qiskit, error = measure("qiskit", filename)
+    line = f"{name:>20} {int(native[3]):>7} | "
+    if qiskit is None:
+        line += f"{'skipped: ' + error:>33} | "
+    else:
+        line += f"{qiskit[0] * 1e3:>11.0f}ms {qiskit[1] * 1e3:>7.1f}ms {qiskit[2]:>6.0f}MB | "
+    line += f"{native[0] * 1e3:>11.0f}ms {native[1] * 1e3:>7.1f}ms {native[2]:>6.0f}MB | "
+    if qiskit is not None:
+        line += f"{(qiskit[0] + qiskit[1]) / (native[0] + native[1]):>11.1f}x"
+    print(line)
@@ -0,0 +1,179 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoQASM import load_circuit
+from AutomatskiKomencoTransport import AutomatskiKomencoTransport
+
+# Runs every .qasm under small/, medium/ and large/ against a Komenco server (by default an
+# in-process stand-in running the local statevector engine) with the given concurrency and
+# repeats. Every run records the parse, serialize, network, server and deserialize time, the
+# gate count and the payload size. The runs and their p50/p95/p99 are written as JSON and/or
+# CSV so that client and backend regressions can be tracked between releases.
+#
+#   python qasmbench-runner.py --concurrency 8 --repeats 5 --json results.json --csv results.csv
+#   python qasmbench-runner.py --host 103.212.120.18 --port 80 --suites small --parser qiskit
+
+PHASES = ["parse_ms", "serialize_ms", "network_ms", "server_ms", "deserialize_ms", "total_ms"]
+PERCENTILES = [50, 95, 99]
+
+parser = argparse.ArgumentParser(description="Parallel QASMBench runner with latency/throughput reporting")
+parser.add_argument("--host", default=None, help="Komenco server, without one a local stand-in server is started")
+parser.add_argument("--port", type=int, default=80)
+parser.add_argument("--suites", nargs="+", default=["small", "medium", "large"])
+parser.add_argument("--filter", default=None, help="only run the benchmarks whose name matches this regex")
+parser.add_argument("--concurrency", type=int, default=4)
+parser.add_argument("--repeats", type=int, default=3)
+parser.add_argument("--repetitions", type=int, default=1000)
+parser.add_argument("--topK", type=int, default=20)
+parser.add_argument("--parser", choices=["native", "qiskit"], default="native",
+                    help="read the .qasm with AutomatskiKomencoQASM or qiskit.qasm2")
+parser.add_argument("--binary", action="store_true", help="use the binary wire format")
+parser.add_argument("--compress", default=None, help="gzip or zstd request compression")
+parser.add_argument("--max-qubits", type=int, default=24, help="largest circuit the local stand-in simulates")
+parser.add_argument("--latency", type=float, default=0.0, help="latency the local stand-in adds per request")
+parser.add_argument("--json", default=None, help="write the runs and percentiles to this JSON file")
+parser.add_argument("--csv", default=None, help="write one row per run to this CSV file")
+args = parser.parse_args()
+
+server = None
+if args.host is None:
+    from AutomatskiKomencoLocalServer import AutomatskiKomencoLocalServer
+    from AutomatskiKomencoLocal import StatevectorEngine
+    server = AutomatskiKomencoLocalServer(latency=args.latency, engine=StatevectorEngine(max_qubits=args.max_qubits)).start()
+    host, port = server.host, server.port
+else:
+    host, port = args.host, args.port
+
+transport = AutomatskiKomencoTransport(host, port, pool_size=args.concurrency, binary=args.binary, compress=args.compress)
+
+# the server time of the last response on this thread, from its Server-Timing header
+timings = threading.local()
+
+def remember_timing(response, *hookArgs, **hookKwargs):
+    match = re.search(r"dur=([0-9.]+)", response.headers.get("Server-Timing", ""))
+    timings.server = float(match.group(1)) if match else None
+
+transport.session.hooks["response"].append(remember_timing)
+
+if args.parser == "qiskit":
+    import qiskit.qasm2
+    from AutomatskiKomencoQiskit import AutomatskiKomencoQiskit
+    client = AutomatskiKomencoQiskit(host, port, transport=transport)
+    read = qiskit.qasm2.load
+else:
+    client = AutomatskiKomencoNative(host, port, transport=transport)
+    read = load_circuit
+
+def run(suite, filename, repeat):
+    record = {"benchmark": os.path.basename(filename)[:-5], "suite": suite, "repeat": repeat, "qubits": None,
+              "gates": None, "payload_bytes": None, "error": None}
+    record.update({phase: None for phase in PHASES})
+    try:
+        tstart = time.perf_counter()
+        circuit = read(filename)
+        tparsed = time.perf_counter()
+        body = client.serialize_circuit(circuit, args.topK)
+        tserialized = time.perf_counter()
+        record["qubits"] = body["num_qubits"]
+        record["gates"] = len(body["operations"])
+        record["payload_bytes"] = len(json.dumps(body))
+
+        timings.server = None
+        struct = client.post(body)
+        tposted = time.perf_counter()
+        client.check_error(struct)
+        client.build_result(body, struct, args.repetitions, tposted - tserialized)
+        tdeserialized = time.perf_counter()
+
+        record["parse_ms"] = (tparsed - tstart) * 1e3
+        record["serialize_ms"] = (tserialized - tparsed) * 1e3
+        record["server_ms"] = timings.server
+        roundTrip = (tposted - tserialized) * 1e3
+        record["network_ms"] = roundTrip - timings.server if timings.server is not None else roundTrip
+        record["deserialize_ms"] = (tdeserialized - tposted) * 1e3
+        record["total_ms"] = (tdeserialized - tstart) * 1e3
+    except Exception as e:
+        record["error"] = str(e).splitlines()[0] if str(e) else type(e).__name__
+    return record
+
+def percentiles(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    stats = {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    stats["mean"] = float(np.mean(values))
+    return stats
+
+def summarize(records):
+    ok = [record for record in records if record["error"] is None]
+    return {phase: percentiles([record[phase] for record in ok]) for phase in PHASES}
+
+tasks = []
+for suite in args.suites:
+    for filename in sorted(glob.glob(f"./{suite}/*/*.qasm")):
+        if args.filter is None or re.search(args.filter, os.path.basename(filename)):
+            tasks.extend((suite, filename, repeat) for repeat in range(args.repeats))
+
+tstart = time.perf_counter()
+with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+    records = list(executor.map(lambda task: run(*task), tasks))
+wallTime = time.perf_counter() - tstart
+
+if server is not None:
+    server.stop()
+transport.close()
+
+completed = [record for record in records if record["error"] is None]
+benchmarks = {}
+for record in records:
+    benchmarks.setdefault(record["benchmark"], []).append(record)
+
+print(f"{'benchmark':>24} {'qubits':>6} {'gates':>7} {'bytes':>9} {'ok':>5} | " + " ".join(f"{phase[:-3] + ' p50':>16}" for phase in PHASES))
+report = {}
+for name, runs in benchmarks.items():
+    summary = summarize(runs)
+    first = runs[0]
+    failures = [run for run in runs if run["error"] is not None]
+    report[name] = {"suite": first["suite"], "qubits": first["qubits"], "gates": first["gates"],
+                    "payload_bytes": first["payload_bytes"], "runs": len(runs), "errors": len(failures),
+                    "error": failures[0]["error"] if failures else None, "phases": summary}
+    if len(failures) == len(runs):
+        print(f"{name:>24} failed: {failures[0]['error'][:80]}")
+        continue
+    cells = " ".join(f"{summary[phase]['p50']:>14.2f}ms" if summary[phase] else f"{'-':>16}" for phase in PHASES)
+    print(f"{name:>24} {first['qubits']:>6} {first['gates']:>7} {first['payload_bytes']:>9} {len(runs) - len(failures):>2}/{len(runs):<2} | {cells}")
+
+overall = summarize(records)
+print(f"\n{len(completed)}/{len(records)} runs completed in {wallTime:.2f}s, {len(completed) / wallTime:.1f} circuits/s at concurrency {args.concurrency}")
+for phase in PHASES:
+    if overall[phase]:
+        print(f"{phase[:-3]:>12}: " + " ".join(f"p{p} {overall[phase][f'p{p}']:>9.2f}ms" for p in PERCENTILES))
+
+if args.json:
+    with open(args.json, "w") as file:
+        json.dump({
+            "config": vars(args),
+            "wall_time_s": wallTime,
+            "throughput_per_s": len(completed) / wallTime,
+            "completed": len(completed),
+            "failed": len(records) - len(completed),
+            "summary": overall,
+            "benchmarks": report,
+            "runs": records,
+        }, file, indent=2)
+
+if args.csv:
+    with open(args.csv, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(records[0].keys()) if records else ["benchmark"])
+        writer.writeheader()
+        writer.writerows(records)
@@ -0,0 +1,81 @@
+import qiskit.qasm2
+import contextlib
+import glob
+import io
+import os
+import time
+import warnings
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoQiskit import *
+
+# the serializer still unpacks CircuitInstruction tuples
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+# Times the qubit index lookup of the Qiskit serializer on the QASMBench large circuits:
+# the old scan over circuit.qregs for every qubit argument against the table built once per circuit.
+# Each circuit is also rebuilt with one register per qubit, where the scan is O(gates x registers).
+
+def scan_qindex(circ, name, index):
+    # the lookup the serializer used to do for every qubit argument
+    ret = 0
+    for reg in circ.qregs:
+        if name != reg.name:
+            ret += reg.size
+        else:
+            return ret + index
+    return ret + index
+
+def scan_qubits(circuit):
+    qubits = []
+    for instr, qargs, cargs in circuit.data:
+        qubits.append([scan_qindex(circuit, qarg._register.name, qarg._index) for qarg in qargs])
+    return qubits
+
+def table_qubits(circuit):
+    qindex = {qubit: index for index, qubit in enumerate(circuit.qubits)}
+    qubits = []
+    for instr, qargs, cargs in circuit.data:
+        qubits.append([qindex[qarg] for qarg in qargs])
+    return qubits
+
+def best_of(function, circuit, repeats=3):
+    best = None
+    for _ in range(repeats):
+        tstart = time.perf_counter()
+        result = function(circuit)
+        elapsed = time.perf_counter() - tstart
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def split_registers(circuit):
+    split = qiskit.QuantumCircuit(*[qiskit.QuantumRegister(1, f"q{i}") for i in range(circuit.num_qubits)], *circuit.cregs)
+    return split.compose(circuit)
+
+serializer = AutomatskiKomencoQiskit(host="127.0.0.1", port=0)
+
+print(f"{'benchmark':>24} {'gates':>8} {'qregs':>6} {'scan':>10} {'table':>10} {'speedup':>8} {'serialize':>10}")
+for filename in sorted(glob.glob("./large/*/*.qasm")):
+    name = os.path.basename(filename)[:-5]
+    try:
+        circuit = qiskit.qasm2.load(filename)
+    except Exception as e:
+        print(f"{name:>24} skipped: {e}")
+        continue
+
+    for variant, circuit in [("", circuit), ("/split", split_registers(circuit))]:
+        scanTime, scanned = best_of(scan_qubits, circuit)
+        tableTime, tabled = best_of(table_qubits, circuit)
+        if scanned != tabled:
+            raise(Exception(f"qubit indices of {name}{variant} differ"))
+
+        tstart = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                serializer.serialize_circuit(circuit, topK=20)
+            except Exception:
+                pass
+        serializeTime = time.perf_counter() - tstart
+
+        print(f"{name + variant:>24} {len(circuit.data):>8} {len(circuit.qregs):>6} {scanTime * 1e3:>8.1f}ms {tableTime * 1e3:>8.1f}ms "
+              f"{scanTime / tableTime:>7.1f}x {serializeTime * 1e3:>8.1f}ms")
@@ -0,0 +1,46 @@
+import time
+import tracemalloc
+import numpy as np
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoBraket import *
+
+# Compares deserializing a server response into a GateModelQuantumTaskResult with a per-shot
+# measurements list (what the Braket client used to do) against AutomatskiKomencoBraketResult,
+# which keeps the counts and only expands the measurements array when it is read.
+
+numberOfQubits = 30
+topK = 20
+
+rng = np.random.default_rng(12345)
+probabilities = rng.dirichlet(np.ones(topK))
+response = {"measurements": {"".join(str(bit) for bit in rng.integers(0, 2, numberOfQubits)): float(p) for p in probabilities}}
+measuredQubits = list(range(numberOfQubits))
+
+def per_shot(response_data, repetitions):
+    # what deserialize_result used to do before building the result
+    measurements = []
+    for key, value in response_data['measurements'].items():
+        measurements.extend([[int(bit) for bit in key]] * round(value * repetitions))
+    return np.array(measurements)
+
+def measure(function):
+    tracemalloc.start()
+    tstart = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - tstart
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+print(f"{'repetitions':>12} | {'per-shot':>10} {'peak':>10} | {'counts':>10} {'peak':>10} | {'+measurements':>13} {'peak':>10}")
+for repetitions in [10**3, 10**4, 10**5, 10**6]:
+    reference, referenceTime, referencePeak = measure(lambda: per_shot(response, repetitions))
+    result, resultTime, resultPeak = measure(lambda: AutomatskiKomencoBraket.deserialize_result(response, measuredQubits, repetitions, 0))
+    expanded, expandTime, expandPeak = measure(lambda: result.measurements)
+    if not np.array_equal(expanded, reference):
+        raise(Exception("the measurements differ"))
+    del reference, result, expanded
+
+    print(f"{repetitions:>12} | {referenceTime * 1e3:>8.1f}ms {referencePeak:>8.2f}MB | {resultTime * 1e3:>8.2f}ms {resultPeak:>8.3f}MB | "
+          f"{expandTime * 1e3:>11.1f}ms {expandPeak:>8.2f}MB")
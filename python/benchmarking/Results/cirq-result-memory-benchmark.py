@@ -0,0 +1,54 @@
+import time
+import tracemalloc
+import numpy as np
+import cirq
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoCirq import *
+
+# Compares the memory and time of deserializing a server response into the per-shot
+# cirq.ResultDict the Cirq client used to build against the histogram backed
+# AutomatskiKomencoCirqResult, for topK=20 bitstrings of 30 qubits.
+
+numberOfQubits = 30
+topK = 20
+
+rng = np.random.default_rng(12345)
+probabilities = rng.dirichlet(np.ones(topK))
+response = {"measurements": {"".join(str(bit) for bit in rng.integers(0, 2, numberOfQubits)): float(p) for p in probabilities}}
+
+def per_shot(response_data, repetitions):
+    # what deserialize_result used to do
+    measurement_results = []
+    for bitstring, prob in response_data['measurements'].items():
+        bit_array = np.array([int(bit) for bit in bitstring[::-1]], dtype=np.int32)
+        measurement_results.extend([bit_array] * int(prob * repetitions))
+    return cirq.ResultDict(params=cirq.ParamResolver({}), measurements={'result': np.array(measurement_results)})
+
+def measure(function):
+    tracemalloc.start()
+    tstart = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - tstart
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+print(f"{'repetitions':>12} | {'per-shot':>10} {'peak':>10} | {'histogram':>10} {'peak':>10} | {'+histogram()':>12} | {'+measurements':>13} {'peak':>10}")
+for repetitions in [10**3, 10**4, 10**5, 10**6, 10**7]:
+    reference, referenceTime, referencePeak = measure(lambda: per_shot(response, repetitions))
+    result, resultTime, resultPeak = measure(lambda: AutomatskiKomencoCirq.deserialize_result(response, repetitions, 0))
+
+    tstart = time.perf_counter()
+    histogram = result.histogram(key='result')
+    histogramTime = time.perf_counter() - tstart
+    if histogram != reference.histogram(key='result'):
+        raise(Exception("the histograms differ"))
+
+    expanded, expandTime, expandPeak = measure(lambda: result.measurements['result'])
+    if not np.array_equal(expanded, reference.measurements['result']):
+        raise(Exception("the expanded measurements differ"))
+    del reference, result, expanded
+
+    print(f"{repetitions:>12} | {referenceTime * 1e3:>8.1f}ms {referencePeak:>8.2f}MB | {resultTime * 1e3:>8.2f}ms {resultPeak:>8.3f}MB | "
+          f"{histogramTime * 1e3:>10.2f}ms | {expandTime * 1e3:>11.1f}ms {expandPeak:>8.2f}MB")
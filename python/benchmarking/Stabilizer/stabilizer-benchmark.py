@@ -0,0 +1,100 @@
+import qiskit.qasm2
+import argparse
+import glob
+import os
+import random
+import time
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoQiskit import AutomatskiKomencoQiskit
+from AutomatskiKomencoLocal import StatevectorEngine
+from AutomatskiKomencoStabilizer import StabilizerEngine, is_clifford
+
+# The Clifford-only QASMBench circuits (GHZ, cat states, Bernstein-Vazirani, ...) on the dense
+# statevector engine and on the stabilizer tableau, which must return the same distribution,
+# then GHZ, Bernstein-Vazirani and random Clifford circuits (randomCircuit restricted to
+# h/s/sdg/x/y/z/cx/cy/cz/swap/iswap/dcx) far wider than a statevector can hold.
+
+CLIFFORD = {"h": 1, "s": 1, "sdg": 1, "x": 1, "y": 1, "z": 1,
+            "cx": 2, "cy": 2, "cz": 2, "swap": 2, "iswap": 2, "dcx": 2}
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--max-qubits", type=int, default=24, help="the widest circuit given to the statevector engine")
+parser.add_argument("--widths", type=int, nargs="+", default=[100, 500, 1000, 2000])
+parser.add_argument("--repeats", type=int, default=3)
+args = parser.parse_args()
+
+serializer = AutomatskiKomencoQiskit(host="127.0.0.1", port=0)
+nativeSerializer = AutomatskiKomencoNative(host="127.0.0.1", port=0)
+statevector = StatevectorEngine()
+stabilizer = StabilizerEngine(fallback=False)
+
+def best(engine, body):
+    timings = []
+    for i in range(args.repeats):
+        tstart = time.perf_counter()
+        result = engine.execute(body)
+        timings.append(time.perf_counter() - tstart)
+    return min(timings), result["measurements"]
+
+def same(a, b):
+    return set(a) == set(b) and all(abs(a[key] - b[key]) < 1e-9 for key in a)
+
+print(f"{'benchmark':>24} {'qubits':>6} {'gates':>6} {'statevector':>12} {'stabilizer':>12} {'speedup':>8} same")
+for filename in sorted(glob.glob("../QASMBench/*/*/*.qasm")):
+    name = os.path.basename(filename)[:-5]
+    try:
+        body = serializer.serialize_circuit(qiskit.qasm2.load(filename), topK=20)
+    except Exception:
+        continue
+    if not is_clifford(body["operations"]) or len(body["measurements"]) == 0:
+        continue
+
+    stabilizerTime, stabilizerResult = best(stabilizer, body)
+    if body["num_qubits"] > args.max_qubits:
+        print(f"{name:>24} {body['num_qubits']:>6} {len(body['operations']):>6} {'-':>12} {stabilizerTime * 1e3:>10.2f}ms")
+        continue
+    statevectorTime, statevectorResult = best(statevector, body)
+    print(f"{name:>24} {body['num_qubits']:>6} {len(body['operations']):>6} {statevectorTime * 1e3:>10.2f}ms "
+          f"{stabilizerTime * 1e3:>10.2f}ms {statevectorTime / stabilizerTime:>7.1f}x {same(statevectorResult, stabilizerResult)}")
+
+def ghz(n):
+    circuit = QuantumCircuit(n)
+    circuit.h(0)
+    for q in range(1, n):
+        circuit.cx(0, q)
+    circuit.measure_all()
+    return circuit
+
+def bernstein_vazirani(n):
+    # the secret is every other qubit, the last qubit is the oracle's ancilla
+    circuit = QuantumCircuit(n)
+    circuit.x(n - 1)
+    for q in range(n):
+        circuit.h(q)
+    for q in range(0, n - 1, 2):
+        circuit.cx(q, n - 1)
+    for q in range(n - 1):
+        circuit.h(q)
+    circuit.measure(list(range(n - 1)))
+    return circuit
+
+def random_clifford(n, numberOfOperations, measured=500):
+    # almost every measured bit is free, more than 1074 of them would underflow the probabilities
+    circuit = QuantumCircuit(n)
+    gates = list(CLIFFORD)
+    for i in range(numberOfOperations):
+        gate = random.choice(gates)
+        getattr(circuit, gate)(*random.sample(range(n), CLIFFORD[gate]))
+    circuit.measure(list(range(min(n, measured))))
+    return circuit
+
+random.seed(0)
+print()
+print(f"{'circuit':>24} {'qubits':>6} {'gates':>6} {'stabilizer':>12} outcomes")
+for n in args.widths:
+    for name, circuit in [("ghz", ghz(n)), ("bernstein_vazirani", bernstein_vazirani(n)), ("random_clifford", random_clifford(n, 10 * n))]:
+        body = nativeSerializer.serialize_circuit(circuit, 20)
+        stabilizerTime, result = best(stabilizer, body)
+        print(f"{name:>24} {n:>6} {len(body['operations']):>6} {stabilizerTime * 1e3:>10.2f}ms {len(result)}")
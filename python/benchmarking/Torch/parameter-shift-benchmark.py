@@ -0,0 +1,79 @@
+import argparse
+import time
+import numpy as np
+import torch
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoTorch import QuantumLayer
+from AutomatskiKomencoHybrid import angle_encoding
+from AutomatskiKomencoLocal import StatevectorEngine
+from AutomatskiKomencoLocalServer import AutomatskiKomencoLocalServer
+
+# One training step (forward and backward) of a --qubits angle-encoded layer on a batch of
+# --batch-size inputs, against the local stand-in server simulating with the statevector engine.
+# The serial step is what a hand written parameter-shift loop does: one blocking run per
+# circuit, the forward circuits and then the 2 * qubits shifted ones per sample.
+# QuantumLayer sends all of them in one dispatch from the forward pass, with run_many or as a
+# single /api/komenco/batch request. --duplicates makes that share of the rows repeat another one.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--qubits", type=int, default=8)
+parser.add_argument("--batch-size", type=int, default=64)
+parser.add_argument("--duplicates", type=float, default=0.25)
+parser.add_argument("--latency", type=float, default=0.0)
+args = parser.parse_args()
+
+server = AutomatskiKomencoLocalServer(latency=args.latency, engine=StatevectorEngine()).start()
+sampler = AutomatskiKomencoNative(server.host, server.port)
+circuit = angle_encoding(args.qubits, "ry")
+
+torch.manual_seed(0)
+x = torch.rand(args.batch_size, args.qubits) * np.pi
+repeated = int(args.duplicates * args.batch_size)
+if repeated:
+    x[-repeated:] = x[:repeated]
+weights = torch.randn(args.qubits)
+
+# -<Z> of every qubit, Z on qubit j is the label with a Z j letters from the right
+labels = ["I" * (args.qubits - 1 - j) + "Z" + "I" * j for j in range(args.qubits)]
+
+def mean_readout(values):
+    return -sampler.expectation(circuit.bind(values.tolist()), labels)
+
+def serial_step(x):
+    # the forward circuits, then the shifted pairs, one request each
+    outputs = np.array([mean_readout(row) for row in x.numpy()])
+    gradient = np.zeros_like(x.numpy())
+    for i, row in enumerate(x.numpy()):
+        for p in range(args.qubits):
+            plus, minus = row.copy(), row.copy()
+            plus[p] += np.pi / 2
+            minus[p] -= np.pi / 2
+            gradient[i, p] = weights.numpy() @ ((mean_readout(plus) - mean_readout(minus)) / 2)
+    loss = float((torch.as_tensor(outputs, dtype=torch.float32) @ weights).sum())
+    return loss, torch.as_tensor(gradient, dtype=torch.float32)
+
+def layer_step(layer, x):
+    inputs = x.clone().requires_grad_(True)
+    loss = (layer(inputs) @ weights).sum()
+    loss.backward()
+    return float(loss.detach()), inputs.grad
+
+print(f"batch {args.batch_size} x {args.qubits} qubits, {repeated} repeated rows, "
+      f"{args.batch_size * (1 + 2 * args.qubits)} circuits per step")
+steps = [("serial", serial_step),
+         ("QuantumLayer run_many", lambda x: layer_step(QuantumLayer(circuit, sampler, readout="mean"), x)),
+         ("QuantumLayer batch", lambda x: layer_step(QuantumLayer(circuit, sampler, readout="mean", dispatch="batch"), x))]
+results = {}
+for name, step in steps:
+    requests = server.requests
+    tstart = time.perf_counter()
+    results[name] = step(x)
+    elapsed = time.perf_counter() - tstart
+    if name == "serial":
+        serialTime = elapsed
+    print(f"{name:>24}: {elapsed:8.3f}s  {server.requests - requests:6} circuits run  ({serialTime / elapsed:.1f}x)")
+
+print("same gradient:", all(torch.allclose(results["serial"][1], gradient, atol=1e-5) for loss, gradient in results.values()))
+server.stop()
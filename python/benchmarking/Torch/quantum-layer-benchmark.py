@@ -0,0 +1,72 @@
+import argparse
+import time
+import torch
+import torch.nn as nn
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoTorch import QuantumLayer
+from AutomatskiKomencoHybrid import angle_encoding
+from AutomatskiKomencoLocalServer import AutomatskiKomencoLocalServer
+
+# One MNIST-sized epoch (1000 images of 1 patch x 16 qubits, batches of 64) through the quantum
+# layer of pytorch-quantum/mnist, against the local stand-in server with --latency seconds per
+# request. The serial layer is what the example used to do (a fresh circuit per patch, .item()
+# per angle and a blocking run per sample), QuantumLayer binds the whole batch at once and
+# sends it with run_many or as one /api/komenco/batch request. The stand-in sleeps --latency for
+# every circuit, also inside a batch, so run_many wins when the server work dominates and the
+# batch when the per-request overhead does (try --latency 0).
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--images", type=int, default=1000)
+parser.add_argument("--batch-size", type=int, default=64)
+parser.add_argument("--latency", type=float, default=0.02)
+args = parser.parse_args()
+
+numQubits = 16
+
+class SerialQuantumLayer(nn.Module):
+    def __init__(self, num_qubits, sampler):
+        super().__init__()
+        self.num_qubits = num_qubits
+        self.sampler = sampler
+
+    def forward(self, x):
+        batch_size, num_patches, num_qubits = x.size()
+        output = []
+        for i in range(batch_size):
+            patch_outputs = []
+            for p in range(num_patches):
+                circuit = QuantumCircuit(self.num_qubits)
+                for j in range(self.num_qubits):
+                    circuit.rx(x[i, p, j].item(), j)
+                circuit.measure_all()
+                measurements = self.sampler.run(circuit, repetitions=1000, topK=20)['result']
+                state_with_highest_probability = max(measurements, key=measurements.get)
+                patch_outputs.append([1 if char == '1' else -1 for char in state_with_highest_probability[::-1]])
+            output.append(patch_outputs)
+        return torch.tensor(output, dtype=torch.float32)
+
+server = AutomatskiKomencoLocalServer(latency=args.latency).start()
+sampler = AutomatskiKomencoNative(server.host, server.port)
+images = torch.rand(args.images, 1, numQubits) * torch.pi
+batches = torch.split(images, args.batch_size)
+
+layers = [
+    ("serial (before)", SerialQuantumLayer(numQubits, sampler)),
+    ("QuantumLayer run_many", QuantumLayer(angle_encoding(numQubits, "rx"), sampler)),
+    ("QuantumLayer batch", QuantumLayer(angle_encoding(numQubits, "rx"), sampler, dispatch="batch")),
+]
+
+print(f"{args.images} images, batches of {args.batch_size}, {args.latency * 1e3:.0f}ms per circuit")
+outputs = {}
+for name, layer in layers:
+    tstart = time.perf_counter()
+    outputs[name] = torch.cat([layer(batch) for batch in batches])
+    elapsed = time.perf_counter() - tstart
+    if name == layers[0][0]:
+        serialTime = elapsed
+    print(f"{name:>24}: {elapsed:8.2f}s  {args.images / elapsed:8.1f} images/s  ({serialTime / elapsed:.1f}x)")
+
+print("same outputs:", all(torch.equal(outputs[layers[0][0]], output) for output in outputs.values()))
+server.stop()
@@ -0,0 +1,64 @@
+import requests
+import numpy as np
+import time
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoTransport import AutomatskiKomencoTransport
+from AutomatskiKomencoLocalServer import AutomatskiKomencoLocalServer
+
+# Compares the per-request latency of the old bare requests.post (a new TCP connection
+# per circuit) against the pooled keep-alive transport, using a local stand-in server.
+
+numberOfRequests = 2000
+numOfQubits = 5
+
+server = AutomatskiKomencoLocalServer().start()
+
+circuit = QuantumCircuit(numOfQubits)
+circuit.h(0)
+for i in range(numOfQubits - 1):
+    circuit.cx(i, i + 1)
+circuit.measure_all()
+
+sampler = AutomatskiKomencoNative(host=server.host, port=server.port)
+body = sampler.serialize_circuit(circuit, topK=20)
+url = f'http://{server.host}:{server.port}/api/komenco'
+
+
+def bare_post(body):
+    response = requests.post(url, json=body)
+    response.close()
+    return response.json()
+
+
+def measure(post, body):
+    latencies = np.empty(numberOfRequests)
+    for i in range(numberOfRequests):
+        tstart = time.perf_counter()
+        post(body)
+        latencies[i] = time.perf_counter() - tstart
+    return latencies * 1e6
+
+
+def report(name, latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name:>10}: mean {latencies.mean():8.1f}us  p50 {p50:8.1f}us  p95 {p95:8.1f}us  p99 {p99:8.1f}us")
+
+
+transport = AutomatskiKomencoTransport(server.host, server.port)
+
+# warm up both paths
+measure(bare_post, body)
+measure(transport.post, body)
+
+bare = measure(bare_post, body)
+pooled = measure(transport.post, body)
+
+print(f"{numberOfRequests} requests of a {numOfQubits} qubit circuit against {url}")
+report("bare", bare)
+report("pooled", pooled)
+print(f"speedup (mean): {bare.mean() / pooled.mean():.2f}x")
+
+transport.close()
+server.stop()
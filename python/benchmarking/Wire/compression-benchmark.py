@@ -0,0 +1,69 @@
+import glob
+import json
+import os
+import time
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoQASM import load
+from AutomatskiKomencoTransport import AutomatskiKomencoTransport
+from AutomatskiKomencoLocalServer import AutomatskiKomencoLocalServer
+from AutomatskiKomencoWire import zstandard, compression_level, compress
+
+# Request body compression over the QASMBench suite: JSON bytes against gzip (and zstd when
+# zstandard is installed) at the level picked for each payload size, the time compressing
+# takes, and the end to end latency through the local stand-in server on a simulated
+# 10 Mbit/s link with and without compression.
+
+bandwidth = 10e6 / 8
+encodings = ["gzip"] + (["zstd"] if zstandard is not None else [])
+
+server = AutomatskiKomencoLocalServer(bandwidth=bandwidth).start()
+plain = AutomatskiKomencoTransport(server.host, server.port)
+compressed = {encoding: AutomatskiKomencoTransport(server.host, server.port, compress=encoding) for encoding in encodings}
+
+header = f"{'benchmark':>24} {'gates':>7} {'json bytes':>11}"
+for encoding in encodings:
+    header += f" {encoding + ' bytes':>11} {'ratio':>6} {'time':>8}"
+header += f" | {'plain':>9}" + "".join(f" {encoding:>9}" for encoding in encodings)
+print(header)
+
+totals = {"json": 0, "plain": 0.0}
+for suite in ["small", "medium", "large"]:
+    for filename in sorted(glob.glob(f"../QASMBench/{suite}/*/*.qasm")):
+        name = os.path.basename(filename)[:-5]
+        try:
+            body = load(filename, topK=20)
+        except Exception as e:
+            print(f"{name:>24} skipped: {str(e).splitlines()[0][:60]}")
+            continue
+
+        data = json.dumps(body).encode("utf-8")
+        line = f"{name:>24} {len(body['operations']):>7} {len(data):>11}"
+        totals["json"] += len(data)
+        for encoding in encodings:
+            level = compression_level(encoding, len(data))
+            tstart = time.perf_counter()
+            packed = compress(data, encoding, level) if level is not None else data
+            elapsed = time.perf_counter() - tstart
+            totals[encoding] = totals.get(encoding, 0) + len(packed)
+            line += f" {len(packed):>11} {len(data) / len(packed):>5.1f}x {elapsed * 1e3:>6.2f}ms"
+
+        tstart = time.perf_counter()
+        plain.post(body)
+        elapsed = time.perf_counter() - tstart
+        totals["plain"] += elapsed
+        line += f" | {elapsed * 1e3:>7.1f}ms"
+        for encoding in encodings:
+            tstart = time.perf_counter()
+            compressed[encoding].post(body)
+            elapsed = time.perf_counter() - tstart
+            totals[encoding + " latency"] = totals.get(encoding + " latency", 0.0) + elapsed
+            line += f" {elapsed * 1e3:>7.1f}ms"
+        print(line)
+
+server.stop()
+
+print(f"total json bytes {totals['json']}, latency {totals['plain']:.2f}s")
+for encoding in encodings:
+    print(f"total {encoding} bytes {totals[encoding]} ({totals['json'] / totals[encoding]:.1f}x smaller), "
+          f"latency {totals[encoding + ' latency']:.2f}s ({totals['plain'] / totals[encoding + ' latency']:.1f}x faster)")
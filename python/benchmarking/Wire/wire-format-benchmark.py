@@ -0,0 +1,81 @@
+import gc
+import json
+import random
+import time
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoWire import encode_circuit, decode_circuit, encode_result, decode_result
+from AutomatskiKomencoTransport import AutomatskiKomencoTransport
+from AutomatskiKomencoLocalServer import AutomatskiKomencoLocalServer
+
+# Compares the JSON payloads with the binary wire format: bytes and encode/decode time for
+# circuits and results of growing size, then full round trips through the local stand-in
+# server with a JSON and a binary transport.
+
+random.seed(12345)
+repeats = 3
+
+def best_of(function):
+    # like timeit, without the collector walking the objects every decoder creates
+    best = None
+    for i in range(repeats):
+        gc.disable()
+        try:
+            tstart = time.perf_counter()
+            value = function()
+            elapsed = time.perf_counter() - tstart
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+def random_body(numberOfQubits, numberOfOperations):
+    circuit = QuantumCircuit(numberOfQubits)
+    circuit.randomCircuit(numberOfOperations, [q for q in range(numberOfQubits)])
+    circuit.measure_all()
+    operations = [{"gate": gate, "params": list(params), "qubits": list(qubits)} for gate, params, qubits in circuit.operations if gate != "measure"]
+    return {"num_qubits": numberOfQubits, "operations": operations, "measurements": list(range(numberOfQubits)), "topK": 20}
+
+def random_result(numberOfQubits, topK):
+    bitstrings = {format(random.getrandbits(numberOfQubits), f"0{numberOfQubits}b") for i in range(topK)}
+    return {"measurements": {bitstring: random.random() / topK for bitstring in bitstrings}}
+
+print("circuits")
+print(f"{'gates':>8} | {'json bytes':>11} {'encode':>9} {'decode':>9} | {'binary bytes':>12} {'encode':>9} {'decode':>9}")
+for numberOfOperations in [10**3, 10**4, 10**5]:
+    body = random_body(30, numberOfOperations)
+    jsonEncode, data = best_of(lambda: json.dumps(body).encode("utf-8"))
+    jsonDecode, decoded = best_of(lambda: json.loads(data))
+    binaryEncode, packed = best_of(lambda: encode_circuit(body))
+    binaryDecode, unpacked = best_of(lambda: decode_circuit(packed)[0])
+    if unpacked["operations"] != decoded["operations"]:
+        raise(Exception("the decoded circuits differ"))
+    print(f"{numberOfOperations:>8} | {len(data):>11} {jsonEncode * 1e3:>7.1f}ms {jsonDecode * 1e3:>7.1f}ms | "
+          f"{len(packed):>12} {binaryEncode * 1e3:>7.1f}ms {binaryDecode * 1e3:>7.1f}ms")
+
+print("results")
+print(f"{'topK':>8} | {'json bytes':>11} {'encode':>9} {'decode':>9} | {'binary bytes':>12} {'encode':>9} {'decode':>9}")
+for topK in [20, 10**3, 10**4, 10**5]:
+    result = random_result(40, topK)
+    jsonEncode, data = best_of(lambda: json.dumps(result).encode("utf-8"))
+    jsonDecode, decoded = best_of(lambda: json.loads(data))
+    binaryEncode, packed = best_of(lambda: encode_result(result))
+    binaryDecode, unpacked = best_of(lambda: decode_result(packed)[0])
+    if unpacked != decoded:
+        raise(Exception("the decoded results differ"))
+    print(f"{topK:>8} | {len(data):>11} {jsonEncode * 1e3:>7.1f}ms {jsonDecode * 1e3:>7.1f}ms | "
+          f"{len(packed):>12} {binaryEncode * 1e3:>7.2f}ms {binaryDecode * 1e3:>7.2f}ms")
+
+print("round trips through the local stand-in server")
+server = AutomatskiKomencoLocalServer().start()
+transports = {"json": AutomatskiKomencoTransport(server.host, server.port),
+              "binary": AutomatskiKomencoTransport(server.host, server.port, binary=True)}
+print(f"{'gates':>8} | {'json':>9} {'binary':>9} {'speedup':>8}")
+for numberOfOperations in [10**3, 10**4, 10**5]:
+    body = random_body(30, numberOfOperations)
+    timings = {}
+    for name, transport in transports.items():
+        timings[name], struct = best_of(lambda: transport.post(body))
+    print(f"{numberOfOperations:>8} | {timings['json'] * 1e3:>7.1f}ms {timings['binary'] * 1e3:>7.1f}ms {timings['json'] / timings['binary']:>7.1f}x")
+server.stop()
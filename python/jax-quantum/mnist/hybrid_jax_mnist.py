@@ -0,0 +1,112 @@
+import jax
+import jax.numpy as jnp
+import optax
+import tensorflow_datasets as tfds
+from jax import random
+from jax import jit
+from jax.scipy.special import logsumexp
+
+import sys
+sys.path.append('../../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoJax import QuantumLayer
+from AutomatskiKomencoHybrid import angle_encoding
+
+# Run the Circuit using Automatski' Quantum Simulators and Quantum Computers
+sampler = AutomatskiKomencoNative(host="103.212.120.18", port=80)
+
+# standard_jax_mnist.py with a quantum layer in the middle: 784 -> 8 -> 8 qubits -> 10.
+# The quantum layer is called inside jit, every batch is one dispatch forward and (with all the
+# parameter-shifted circuits) one dispatch for the gradient
+num_qubits = 8
+quantum_layer = QuantumLayer(angle_encoding(num_qubits, "ry"), sampler, readout="mean", repetitions=1000)
+
+# Load the MNIST dataset
+def load_mnist():
+    ds_builder = tfds.builder('mnist')
+    ds_builder.download_and_prepare()
+    train_ds = tfds.as_numpy(ds_builder.as_dataset(split='train', batch_size=-1))
+    test_ds = tfds.as_numpy(ds_builder.as_dataset(split='test', batch_size=-1))
+    train_images, train_labels = train_ds['image'], train_ds['label']
+    test_images, test_labels = test_ds['image'], test_ds['label']
+    train_images = jnp.float32(train_images) / 255.0
+    test_images = jnp.float32(test_images) / 255.0
+    return train_images, train_labels, test_images, test_labels
+
+train_images, train_labels, test_images, test_labels = load_mnist()
+
+# every image costs circuits, use 1000 training and 100 test images like the pytorch example
+train_images, train_labels = train_images[:1000], train_labels[:1000]
+test_images, test_labels = test_images[:100], test_labels[:100]
+
+# Initialize parameters
+def init_params(key):
+    keys = random.split(key, 2)
+    params = {
+        'W1': random.normal(keys[0], (784, num_qubits)) * 0.01,
+        'b1': jnp.zeros(num_qubits),
+        'W2': random.normal(keys[1], (num_qubits, 10)) * 0.1,
+        'b2': jnp.zeros(10),
+    }
+    return params
+
+# Define the model
+def forward(params, x):
+    x = x.reshape(-1, 784)
+    # the angles of the ry gates
+    x = jnp.pi * jnp.tanh(jnp.dot(x, params['W1']) + params['b1'])
+    x = quantum_layer(x)
+    x = jnp.dot(x, params['W2']) + params['b2']
+    return x
+
+# Define the loss function
+def cross_entropy_loss(params, x, y):
+    logits = forward(params, x)
+    one_hot = jax.nn.one_hot(y, num_classes=10)
+    log_probs = logits - logsumexp(logits, axis=1, keepdims=True)
+    return -jnp.mean(jnp.sum(one_hot * log_probs, axis=1))
+
+# Define the accuracy function
+def accuracy(params, x, y):
+    logits = forward(params, x)
+    predictions = jnp.argmax(logits, axis=1)
+    return jnp.mean(predictions == y)
+
+# Training step
+@jit
+def update(params, opt_state, x, y):
+    loss, grads = jax.value_and_grad(cross_entropy_loss)(params, x, y)
+    updates, opt_state = optimizer.update(grads, opt_state)
+    params = optax.apply_updates(params, updates)
+    return params, opt_state, loss
+
+# Initialize parameters and optimizer
+key = random.PRNGKey(0)
+params = init_params(key)
+optimizer = optax.chain(
+    optax.clip_by_global_norm(1.0),  # Gradient clipping
+    optax.adam(learning_rate=0.01)
+)
+opt_state = optimizer.init(params)
+
+# Training loop
+n_epochs = 10
+batch_size = 64
+num_batches = train_images.shape[0] // batch_size
+
+for epoch in range(n_epochs):
+    for i in range(num_batches):
+        batch_start = i * batch_size
+        batch_end = (i + 1) * batch_size
+        x_batch = train_images[batch_start:batch_end]
+        y_batch = train_labels[batch_start:batch_end]
+        params, opt_state, loss = update(params, opt_state, x_batch, y_batch)
+
+    test_acc = accuracy(params, test_images, test_labels)
+    print(f'Epoch {epoch + 1}, Loss: {loss:.4f}, Test Accuracy: {test_acc * 100:.2f}%')
+
+# Final evaluation
+final_train_acc = accuracy(params, train_images, train_labels)
+final_test_acc = accuracy(params, test_images, test_labels)
+print(f'Final Train Accuracy: {final_train_acc * 100:.2f}%')
+print(f'Final Test Accuracy: {final_test_acc * 100:.2f}%')
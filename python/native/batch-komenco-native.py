@@ -0,0 +1,31 @@
+import sys
+sys.path.append('../')
+from AutomatskiKomencoNative import *
+import numpy as np
+import random
+
+seed = 12345
+random.seed(seed)
+np.random.seed(seed)
+
+totalQubits = 5
+numberOfCircuits = 100
+numberOfOperations = 20
+
+# Create many small random circuits
+circuits = []
+for i in range(numberOfCircuits):
+    circuit = QuantumCircuit(totalQubits)
+    circuit.randomCircuit(numberOfOperations, [q for q in range(totalQubits)])
+    circuit.measure_all()
+    circuits.append(circuit)
+
+# Run all the circuits in a single request using Automatski' Quantum Simulators and Quantum Computers
+sampler = AutomatskiKomencoNative(host="103.212.120.18", port=80)
+
+# If the server does not support batches the circuits are sent one by one
+results = sampler.run_batch(circuits, repetitions=1000, topK=20)
+
+for i, results_i in enumerate(results):
+    measurements = results_i['result']
+    print(f"circuit {i}: {measurements}")
@@ -1,32 +1,31 @@
-import matplotlib.pyplot as plt 
 import sys
 sys.path.append('../')
 from AutomatskiKomencoNative import *
+from AutomatskiKomencoLocal import AutomatskiKomencoLocalTransport
 
-repetitions = 1000
-
-# Create a sample quantum circuit to create a 3 Qubit GHZ State 
+# Create a sample quantum circuit to create a 3 Qubit GHZ State, no measurements are needed
 circuit = QuantumCircuit(3)
 circuit.h(0)
 circuit.cx(0, 1)
 circuit.cx(0, 2)
-circuit.measure_all()
 
-# Run the Circuit using Automatski' Quantum Simulators and Quantum Computers 
+# Run the Circuit using Automatski' Quantum Simulators and Quantum Computers
 sampler = AutomatskiKomencoNative(host="103.212.120.18", port=80)
 
-# Run the circuit and get results
-results = sampler.run(circuit, repetitions=repetitions, topK=20)
-# Extract and count the measurement results
-measurements = results['result']
-print(measurements)
+# Pauli strings, the rightmost letter acts on qubit 0 like in the result bitstrings
+observables = ["ZZI", "IZZ", "ZIZ", "XXX", "YYX", "ZII"]
+
+# All the strings are measured in one batch, one circuit per group of strings sharing a basis
+expectations = sampler.expectation(circuit, observables)
+for observable, expectation in zip(observables, expectations):
+    print(f"<{observable}> = {expectation:.6f}")
 
-labels = [int(label, 2) for label in measurements.keys()]
-counts = np.array(list(measurements.values()))
-states = np.array(labels).astype(float)
-probs = counts / repetitions 
-#expectation = np.array([np.sum(np.multiply(probs, states))])
-expectation = np.sum(np.multiply(probs, states))
+# A weighted sum of Pauli strings is a single observable, e.g. a small Hamiltonian
+hamiltonian = {"ZZI": -1.0, "IZZ": -1.0, "XII": 0.5, "IXI": 0.5, "IIX": 0.5}
+print("Energy")
+print(sampler.expectation(circuit, hamiltonian))
 
-print("Expectation")
-print(expectation)
+# With the in-process engine the values are computed exactly from the statevector
+local = AutomatskiKomencoNative(host=None, port=None, transport=AutomatskiKomencoLocalTransport())
+print("Exact")
+print(local.expectation(circuit, observables))
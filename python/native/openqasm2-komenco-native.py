@@ -0,0 +1,30 @@
+import sys
+sys.path.append('../')
+from AutomatskiKomencoNative import *
+from AutomatskiKomencoQASM import load, loads_circuit
+
+program = '''
+    OPENQASM 2.0;
+    include "qelib1.inc";
+    qreg q[2];
+    creg c[2];
+
+    h q[0];
+    cx q[0], q[1];
+
+    measure q -> c;
+'''
+
+# Read OpenQASM 2 without Qiskit, straight into a native QuantumCircuit
+circuit = loads_circuit(program)
+
+# Run the Circuit using Automatski' Quantum Simulators and Quantum Computers
+sampler = AutomatskiKomencoNative(host="103.212.120.18", port=80)
+
+results = sampler.run(circuit, repetitions=1000, topK=20)
+print(results['result'])
+
+# Files can also be read straight into the payload the server expects and run as is
+body = load("../benchmarking/QASMBench/small/grover_n2/grover_n2.qasm", topK=20)
+results = sampler.run(body, repetitions=1000, topK=20)
+print(results['result'])
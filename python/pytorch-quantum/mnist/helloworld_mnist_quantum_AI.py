@@ -9,58 +9,20 @@ from torch.utils.data import DataLoader, Subset
 import sys
 sys.path.append('../../')
 from AutomatskiKomencoNative import *
+from AutomatskiKomencoTorch import QuantumLayer
+from AutomatskiKomencoHybrid import angle_encoding
 
 # Run the Circuit using Automatski' Quantum Simulators and Quantum Computers 
 sampler = AutomatskiKomencoNative(host="103.212.120.18", port=80) # 
 
-# Define the QuantumLayer and HybridModel classes
-class QuantumLayer(nn.Module):
-    def __init__(self, num_qubits, num_layers):
-        super(QuantumLayer, self).__init__()
-        self.num_qubits = num_qubits
-        self.num_layers = num_layers
-
-    def forward(self, x):
-        # Quantum part (Placeholder comments, omitted due to lack of details)
-        # x should be of shape (batch_size, num_patches, num_qubits)
-        batch_size, num_patches, num_qubits = x.size()
-        output = []
-
-        for i in range(batch_size):
-            patch_outputs = []
-            for p in range(num_patches):
-                self.circuit = QuantumCircuit(self.num_qubits)
-
-                # Convert input to angles for rotation gates
-                for j in range(self.num_qubits):
-                    self.circuit.rx(x[i, p, j].item(), j)
-
-                self.circuit.measure_all()
-
-                # Run the circuit and get results
-                results = sampler.run(self.circuit, repetitions=1000, topK=20)
-
-                # Extract and count the measurement results
-                measurements = results['result']
-
-                # Find the key with the highest value (count)
-                state_with_highest_probability = max(measurements, key=measurements.get)
-
-                numerical_state_array = [1 if char == '1' else -1 for char in state_with_highest_probability[::-1]]
-
-                patch_outputs.append(numerical_state_array)
-
-            output.append(patch_outputs)
-
-        return torch.tensor(output, dtype=torch.float32)
-
+# Define the HybridModel class, the QuantumLayer runs the whole batch of patches at once
 class HybridModel(nn.Module):
     def __init__(self, patch_size=18):
         super(HybridModel, self).__init__()
         self.patch_size = patch_size
         self.num_patches = (32 // patch_size) ** 2
         self.fc1 = nn.Linear(patch_size * patch_size, 16)
-        self.quantum_layer = QuantumLayer(num_qubits=16, num_layers=1)  # Example with 16 qubits
+        self.quantum_layer = QuantumLayer(angle_encoding(16, "rx"), sampler, readout="mean", dispatch="batch")  # Example with 16 qubits
         self.fc2 = nn.Linear(16 * self.num_patches, 10)  # 10 classes for MNIST
 
     def forward(self, x):
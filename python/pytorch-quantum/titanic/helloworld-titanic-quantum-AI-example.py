@@ -8,6 +8,8 @@ from sklearn.preprocessing import StandardScaler
 import sys
 sys.path.append('../../')
 from AutomatskiKomencoNative import *
+from AutomatskiKomencoTorch import QuantumLayer
+from AutomatskiKomencoHybrid import angle_encoding
 
 
 # Load the Titanic dataset
@@ -48,59 +50,12 @@ y_test = torch.tensor(y_test, dtype=torch.long)
 # Run the Circuit using Automatski' Quantum Simulators and Quantum Computers
 sampler = AutomatskiKomencoNative(host="103.212.120.18", port=80)
 
-class QuantumLayer(nn.Module):
-    def __init__(self, num_qubits, num_layers):
-        super(QuantumLayer, self).__init__()
-        self.num_qubits = num_qubits
-        self.num_layers = num_layers
-        
-        
-    def forward(self, x):
-        # Quantum part (Placeholder comments, omitted due to lack of details)
-        # x should be of shape (batch_size, num_qubits)
-        batch_size = x.size(0)
-        output = []
-        
-        
-        for i in range(batch_size):
-            # Example of applying quantum operations
-            #self.circuit.h(0)  # Apply Hadamard gate
-            #self.circuit.cx(0, 1)  # Apply CNOT gate
-            
-            self.circuit = QuantumCircuit(self.num_qubits)
-            
-            # Convert input to angles for rotation gates
-            for j in range(self.num_qubits):
-                self.circuit.rx(x[i, j].item(), j)
-            
-            
-            
-            self.circuit.measure_all()
-           
-            # Run the circuit and get results
-            results = sampler.run(self.circuit, repetitions=1000, topK=20)
-
-            # Extract and count the measurement results
-            measurements = results['result']
-            #print(measurements)
-            
-            # Find the key with the highest value (count)
-            state_with_highest_probability = max(measurements, key=measurements.get)
-            
-            #print(state_with_highest_probability)
-            numerical_state_array = [1 if char == '1' else -1 for char in state_with_highest_probability[::-1]]  #reverse the state_with_highest_probability string
-            
-            output.append(numerical_state_array)
-        
-        #print(output)
-        
-        return torch.tensor(output, dtype=torch.float32)
 
 class HybridModel(nn.Module):
     def __init__(self):
         super(HybridModel, self).__init__()
         self.fc1 = nn.Linear(X_train.shape[1], 8)
-        self.quantum_layer = QuantumLayer(num_qubits=8, num_layers=1)  # Example with 8 qubits
+        self.quantum_layer = QuantumLayer(angle_encoding(8, "rx"), sampler, readout="mean", dispatch="batch")  # Example with 8 qubits
         self.fc2 = nn.Linear(8, 2)  # Binary classification
         
     def forward(self, x):